@@ -29,16 +29,37 @@ class Settings(BaseSettings):
     SUPABASE_URL: str = "https://your-project.supabase.co"
     SUPABASE_KEY: str = "your-supabase-anon-key"
     SUPABASE_SERVICE_KEY: Optional[str] = None
+    # Optional direct Postgres DSN (Supavisor session pooler, port 5432) for hot read paths
+    SUPABASE_DB_URL: Optional[str] = None
+    SUPABASE_DB_POOL_MIN: int = 1
+    SUPABASE_DB_POOL_MAX: int = 5
     
     # OpenAI Configuration
     OPENAI_API_KEY: str = "your-openai-api-key"
     OPENAI_MODEL: str = "gpt-4o-mini"
     OPENAI_EMBEDDING_MODEL: str = "text-embedding-3-small"
+    OPENAI_EMBED_CONCURRENCY: int = 5  # Parallel embedding batch requests
+    OPENAI_BATCH_POLL_INTERVAL: int = 0  # Seconds between Batch API job checks (0 = don't poll from the server)
+    OPENAI_MAX_REQUESTS_PER_MINUTE: int = 3500  # Shared client-side limit for all OpenAI calls
+    
+    # Embedding cache (in-memory LRU; set EMBED_CACHE_DIR to persist across restarts)
+    EMBED_CACHE_SIZE: int = 4096  # ~3 KB per 1536-dim float16 vector
+    EMBED_CACHE_DIR: Optional[str] = None
+    
+    # Semantic cache for RAG similarity search (cosine similarity threshold for a hit)
+    RAG_SEARCH_CACHE_SIZE: int = 256
+    RAG_SEARCH_CACHE_THRESHOLD: float = 0.95
+    
+    # Cache for generated RAG answers, keyed by question and top source chunks
+    RAG_ANSWER_CACHE_SIZE: int = 512
+    RAG_ANSWER_CACHE_TTL: int = 300  # seconds
     
     # Vimeo Configuration (Optional)
     VIMEO_ACCESS_TOKEN: Optional[str] = None
     
     # JWT Configuration
+    # Supabase project JWT secret; when set, access tokens are verified locally
+    # instead of calling Supabase Auth on every request
     JWT_SECRET: Optional[str] = None
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRATION_HOURS: int = 24
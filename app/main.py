@@ -74,32 +74,48 @@ async def lifespan(app: FastAPI):
         logger.warning(f"Error checking/generating assessments on startup: {str(e)}")
         # Don't fail startup if assessment generation fails
     
-    # Start cache cleanup task
-    async def cache_cleanup_loop():
-        while True:
-            await asyncio.sleep(300)  # Run every 5 minutes
-            await cache.cleanup_expired()
+    # Expired cache entries are dropped lazily by the cache itself (no sweep task)
     
-    cleanup_task = asyncio.create_task(cache_cleanup_loop())
+    # Ingest finished OpenAI Batch API question jobs (opt-in)
+    background_tasks = []
+    if settings.OPENAI_BATCH_POLL_INTERVAL > 0:
+        from app.services.topic_question_service import topic_question_service
+        
+        async def batch_poll_loop():
+            while True:
+                await asyncio.sleep(settings.OPENAI_BATCH_POLL_INTERVAL)
+                await asyncio.to_thread(topic_question_service.poll_question_batches)
+        
+        background_tasks.append(asyncio.create_task(batch_poll_loop()))
     
     try:
         yield
     except asyncio.CancelledError:
         # Handle cancellation during hot reload gracefully
         # This is expected when uvicorn reloads on file changes
-        cleanup_task.cancel()
+        for task in background_tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        # Don't re-raise - allow graceful shutdown during reload
+    
+    # Shutdown
+    for task in background_tasks:
+        task.cancel()
         try:
-            await cleanup_task
+            await task
         except asyncio.CancelledError:
             pass
-        # Don't re-raise - allow graceful shutdown during reload
     
-    # Shutdown
-    cleanup_task.cancel()
-    try:
-        await cleanup_task
-    except asyncio.CancelledError:
-        pass
+    # Write any queued background inserts before exiting
+    from app.services.background_writer import background_writer
+    await asyncio.to_thread(background_writer.stop)
+    
+    # Close direct Postgres connections (if the pool was used)
+    from app.services.pg_pool import pg_pool
+    pg_pool.close()
     
 
 
@@ -222,6 +238,18 @@ app.add_exception_handler(HTTPException, http_exception_handler)
 app.add_exception_handler(Exception, global_exception_handler)
 
 
+# Cache metrics endpoint
+@app.get("/metrics", tags=["Health"])
+async def metrics():
+    """
+    Cache metrics for tuning TTLs
+    
+    Returns:
+        Entry counts plus per-entity hits, misses, evictions and hit rate
+    """
+    return {"cache": cache.stats()}
+
+
 # Health check endpoint
 @app.get("/health", tags=["Health"])
 async def health_check():
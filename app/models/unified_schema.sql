@@ -186,6 +186,8 @@ CREATE INDEX IF NOT EXISTS idx_skill_assessment_questions_topic ON skill_assessm
 CREATE INDEX IF NOT EXISTS idx_skill_assessment_questions_source_type ON skill_assessment_questions(source_type);
 CREATE INDEX IF NOT EXISTS idx_skill_assessment_questions_assessment_id ON skill_assessment_questions(assessment_id);
 CREATE INDEX IF NOT EXISTS idx_skill_assessment_questions_created_at ON skill_assessment_questions(created_at);
+-- Keyset pagination of a topic's questions (newest first)
+CREATE INDEX IF NOT EXISTS idx_skill_assessment_questions_topic_created_at ON skill_assessment_questions(topic, created_at DESC, id DESC);
 
 -- ===================================================================
 -- TABLE 6: Responses
@@ -246,6 +248,29 @@ CREATE INDEX IF NOT EXISTS idx_results_user_id ON results(user_id);
 CREATE INDEX IF NOT EXISTS idx_results_assessment_id ON results(assessment_id);
 CREATE INDEX IF NOT EXISTS idx_results_passed ON results(passed);
 
+-- ===================================================================
+-- TABLE 8: Batch Jobs
+-- ===================================================================
+-- OpenAI Batch API question generation jobs awaiting ingestion
+-- ===================================================================
+CREATE TABLE IF NOT EXISTS batch_jobs (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    batch_id TEXT NOT NULL UNIQUE, -- OpenAI batch ID
+    input_file_id TEXT,
+    output_file_id TEXT,
+    status TEXT NOT NULL, -- Last seen OpenAI batch status, or 'ingesting' while a poller stores the output
+    request_count INTEGER DEFAULT 0,
+    inserted_count INTEGER DEFAULT 0,
+    requests JSONB, -- custom_id -> question metadata (topic, difficulty, ...)
+    completed_at TIMESTAMP WITH TIME ZONE, -- Set once results are ingested
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+COMMENT ON TABLE batch_jobs IS 'OpenAI Batch API question generation jobs';
+
+CREATE INDEX IF NOT EXISTS idx_batch_jobs_pending ON batch_jobs(created_at) WHERE completed_at IS NULL;
+
 -- ===================================================================
 -- PART 2: RAG SYSTEM TABLES (Documentation Only)
 -- ===================================================================
@@ -310,6 +335,168 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- ===================================================================
+-- DISTINCT SOURCES FUNCTION
+-- ===================================================================
+-- Returns one row per source in an embeddings table so the assessment
+-- generator does not have to download every chunk row to deduplicate.
+-- Only the known embeddings tables/columns are accepted.
+-- ===================================================================
+CREATE OR REPLACE FUNCTION stream_distinct_ids(
+    p_table TEXT,
+    p_id_col TEXT,
+    p_title_col TEXT
+)
+RETURNS TABLE (source_id TEXT, source_title TEXT) AS $$
+BEGIN
+    IF NOT (
+        (p_table = 'video_embeddings' AND p_id_col = 'video_id' AND p_title_col = 'video_title') OR
+        (p_table = 'pdf_embeddings' AND p_id_col = 'pdf_id' AND p_title_col = 'pdf_title')
+    ) THEN
+        RAISE EXCEPTION 'Unsupported source table/columns: %.%, %', p_table, p_id_col, p_title_col;
+    END IF;
+
+    RETURN QUERY EXECUTE format(
+        'SELECT DISTINCT ON (%1$I) %1$I::TEXT, %2$I::TEXT FROM %3$I WHERE %1$I IS NOT NULL ORDER BY %1$I',
+        p_id_col, p_title_col, p_table
+    );
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- ===================================================================
+-- SOURCE DIFFICULTY FUNCTION
+-- ===================================================================
+-- Classifies each source as easy/medium/hard from its first p_chunk_limit
+-- chunks (by chunk_id, then id - the same chunks get_chunks_for_source loads
+-- with CHUNKS_PER_SOURCE), mirroring
+-- AssessmentGenerator.determine_difficulty_from_chunks:
+--   avg chunk length < 200 and < 3 technical terms  -> easy
+--   avg chunk length > 500 or  > 8 technical terms  -> hard
+--   otherwise                                       -> medium
+-- (technical terms are counted once per chunk they appear in)
+-- ===================================================================
+DROP FUNCTION IF EXISTS difficulty_for_sources(TEXT, TEXT[]);
+CREATE OR REPLACE FUNCTION difficulty_for_sources(
+    p_source_type TEXT,
+    p_source_ids TEXT[],
+    p_chunk_limit INTEGER DEFAULT 30
+)
+RETURNS TABLE (source_id TEXT, difficulty TEXT) AS $$
+DECLARE
+    v_table TEXT;
+    v_id_col TEXT;
+BEGIN
+    IF p_source_type = 'video' THEN
+        v_table := 'video_embeddings';
+        v_id_col := 'video_id';
+    ELSIF p_source_type = 'pdf' THEN
+        v_table := 'pdf_embeddings';
+        v_id_col := 'pdf_id';
+    ELSE
+        RAISE EXCEPTION 'Unsupported source type: %', p_source_type;
+    END IF;
+
+    RETURN QUERY EXECUTE format(
+        'SELECT s.source_id,
+                CASE
+                    WHEN s.avg_length < 200 AND s.tech_count < 3 THEN ''easy''
+                    WHEN s.avg_length > 500 OR s.tech_count > 8 THEN ''hard''
+                    ELSE ''medium''
+                END
+         FROM (
+             SELECT e.%1$I::TEXT AS source_id,
+                    AVG(LENGTH(COALESCE(e.content, ''''))) AS avg_length,
+                    SUM((
+                        SELECT COUNT(*)
+                        FROM unnest(ARRAY[''function'', ''class'', ''method'', ''algorithm'', ''implementation'',
+                                          ''complexity'', ''optimization'', ''architecture'', ''pattern'']) AS t(term)
+                        WHERE strpos(LOWER(COALESCE(e.content, '''')), t.term) > 0
+                    )) AS tech_count
+             FROM (
+                 SELECT c.%1$I, c.content,
+                        ROW_NUMBER() OVER (PARTITION BY c.%1$I ORDER BY c.chunk_id, c.id) AS rn
+                 FROM %2$I c
+                 WHERE c.%1$I::TEXT = ANY($1)
+             ) e
+             WHERE e.rn <= $2
+             GROUP BY e.%1$I
+         ) s',
+        v_id_col, v_table
+    ) USING p_source_ids, p_chunk_limit;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- ===================================================================
+-- OPTIONAL: SOURCE FILTER FOR match_unified_embeddings
+-- ===================================================================
+-- match_unified_embeddings is owned by the RAG project. The RAG service
+-- first calls it with an extra filter_source_id argument so a single
+-- video/PDF can be pruned in SQL instead of after the top-N ranking.
+-- To enable this, add the parameter to the existing function and its WHERE:
+--
+--   CREATE OR REPLACE FUNCTION match_unified_embeddings(
+--       query_embedding vector,
+--       match_threshold FLOAT,
+--       match_count INT,
+--       source_type TEXT DEFAULT NULL,
+--       filter_source_id TEXT DEFAULT NULL
+--   ) ...
+--   WHERE ... AND (filter_source_id IS NULL OR source_id = filter_source_id)
+--
+-- Drop the old signature afterwards so PostgREST doesn't see two overloads.
+-- Without the parameter the service falls back to filtering in Python.
+-- ===================================================================
+
+-- ===================================================================
+-- OPTIONAL: HNSW SIMILARITY SEARCH FOR questions
+-- ===================================================================
+-- SupabaseService.find_similar_questions(_batch) call match_questions and
+-- match_questions_batch on the legacy questions table (embedding vector).
+-- Without an ANN index every call is a sequential scan over all
+-- embeddings. Ordering by the <=> operator lets pgvector use the HNSW
+-- index; the threshold is applied to the top matches afterwards so the
+-- index stays usable. Run this where the questions table exists:
+--
+--   CREATE INDEX IF NOT EXISTS idx_questions_embedding_hnsw
+--       ON questions USING hnsw (embedding vector_cosine_ops)
+--       WITH (m = 16, ef_construction = 64);
+--
+--   CREATE OR REPLACE FUNCTION match_questions(
+--       query_embedding vector,
+--       match_threshold FLOAT,
+--       match_count INT
+--   )
+--   RETURNS TABLE (id UUID, question_text TEXT, similarity FLOAT) AS $$
+--       SELECT m.id, m.question_text, m.similarity
+--       FROM (
+--           SELECT q.id, q.question_text, 1 - (q.embedding <=> query_embedding) AS similarity
+--           FROM questions q
+--           ORDER BY q.embedding <=> query_embedding
+--           LIMIT match_count
+--       ) m
+--       WHERE m.similarity > match_threshold;
+--   $$ LANGUAGE sql STABLE;
+--
+--   -- Several query embeddings in one round-trip (JSON array of vectors);
+--   -- query_index is the zero-based position of the query embedding
+--   CREATE OR REPLACE FUNCTION match_questions_batch(
+--       query_embeddings JSONB,
+--       match_threshold FLOAT,
+--       match_count INT
+--   )
+--   RETURNS TABLE (query_index INT, id UUID, question_text TEXT, similarity FLOAT) AS $$
+--       SELECT (e.ord - 1)::INT, m.id, m.question_text, m.similarity
+--       FROM jsonb_array_elements(query_embeddings) WITH ORDINALITY AS e(vec, ord)
+--       CROSS JOIN LATERAL (
+--           SELECT q.id, q.question_text, 1 - (q.embedding <=> (e.vec::TEXT)::vector) AS similarity
+--           FROM questions q
+--           ORDER BY q.embedding <=> (e.vec::TEXT)::vector
+--           LIMIT match_count
+--       ) m
+--       WHERE m.similarity > match_threshold;
+--   $$ LANGUAGE sql STABLE;
+-- ===================================================================
+
 -- ===================================================================
 -- TRIGGERS FOR AUTO-UPDATE TIMESTAMPS
 -- ===================================================================
@@ -349,6 +536,12 @@ CREATE TRIGGER update_courses_updated_at
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at_column();
 
+DROP TRIGGER IF EXISTS update_batch_jobs_updated_at ON batch_jobs;
+CREATE TRIGGER update_batch_jobs_updated_at
+    BEFORE UPDATE ON batch_jobs
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
 -- ===================================================================
 -- PART 4: DEFAULT DATA AND MIGRATIONS
 -- ===================================================================
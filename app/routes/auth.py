@@ -3,6 +3,7 @@ FastAPI routes for authentication using Supabase
 """
 
 from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi.security import HTTPAuthorizationCredentials
 from typing import Optional
 from pydantic import BaseModel, EmailStr
 from uuid import UUID
@@ -10,7 +11,7 @@ from uuid import UUID
 from app.services.supabase_service import supabase_service
 from app.utils.logger import logger
 from app.utils.error_handler import AppException
-from app.utils.auth import get_current_user
+from app.utils.auth import get_current_user, resolve_email_verified, security
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -63,7 +64,7 @@ async def login(request: LoginRequest):
         
         # Get or create user profile
         user_id = UUID(response.user.id)
-        profile = supabase_service.get_profile(user_id)
+        profile = await supabase_service.aget_profile(user_id)
         
         if not profile:
             # Create profile if it doesn't exist
@@ -293,9 +294,7 @@ async def register(request: RegisterRequest):
         error_type = type(e).__name__
         error_msg = str(e)
         logger.error(f"[REGISTER] Unexpected exception: {error_type}: {error_msg}")
-        logger.error(f"[REGISTER] Full error details: {repr(e)}")
-        import traceback
-        logger.error(f"[REGISTER] Traceback: {traceback.format_exc()}")
+        logger.exception(f"[REGISTER] Full error details: {repr(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Registration failed: {error_msg}"
@@ -304,7 +303,8 @@ async def register(request: RegisterRequest):
 
 @router.get("/me")
 async def get_current_user_info(
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     """
     Get current user information
@@ -313,6 +313,7 @@ async def get_current_user_info(
         "id": current_user.get("id"),
         "email": current_user.get("email"),
         "role": current_user.get("role"),
-        "email_verified": current_user.get("email_verified", False)
+        # Locally verified tokens don't carry it; looked up only for this endpoint
+        "email_verified": resolve_email_verified(current_user, credentials.credentials)
     }
 
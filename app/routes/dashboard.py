@@ -3,11 +3,13 @@ Unified Dashboard API endpoints for Skill Assessment frontend
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from typing import List, Optional, Dict, Any
 from uuid import UUID
 from datetime import datetime, timedelta
 from pydantic import BaseModel, Field
 import json
+from postgrest.types import ReturnMethod
 
 from app.services.supabase_service import supabase_service
 from app.services.topic_question_service import topic_question_service
@@ -473,9 +475,7 @@ async def get_assessment_questions(assessment_id: str):
                     logger.error("❌ Could not get test user. Attempt creation will fail.")
                     logger.error("   Please ensure auth.users has at least one user, then run the SQL in profile_service.py")
             except Exception as e:
-                logger.error(f"❌ Error getting test user: {str(e)}")
-                import traceback
-                logger.error(traceback.format_exc())
+                logger.exception(f"❌ Error getting test user: {str(e)}")
             
             # Only create attempt if we have a user_id (required by schema)
             if system_user_id:
@@ -514,9 +514,7 @@ async def get_assessment_questions(assessment_id: str):
                         except Exception as verify_error:
                             logger.error(f"❌ Error verifying attempt: {str(verify_error)}")
                 except Exception as insert_error:
-                    logger.error(f"❌ Error inserting attempt: {str(insert_error)}")
-                    import traceback
-                    logger.error(traceback.format_exc())
+                    logger.exception(f"❌ Error inserting attempt: {str(insert_error)}")
                     attempt_id = None
             else:
                 logger.error("❌ No user_id available - cannot create attempt. Submission will fail.")
@@ -525,9 +523,7 @@ async def get_assessment_questions(assessment_id: str):
                 # Still return questions, but attempt_id will be None
                 attempt_id = None
         except Exception as e:
-            logger.error(f"Could not create attempt: {str(e)}")
-            import traceback
-            logger.error(traceback.format_exc())
+            logger.exception(f"Could not create attempt: {str(e)}")
             # Continue without attempt - frontend will handle this
             attempt = None
             attempt_id = None
@@ -659,6 +655,8 @@ async def start_assessment(
                 match_count=10
             )
             
+            # Stored synchronously: the IDs go to the client and are referenced by
+            # responses (FK), so the rows must exist before they are handed out
             if result.get("success") and result.get("question_ids"):
                 questions_response = client.table("skill_assessment_questions")\
                     .select("*")\
@@ -818,6 +816,8 @@ async def submit_assessment(
         max_score = len(request.answers)
         correct_count = 0
         results_data = []
+        response_rows = []
+        attempt_id_str = str(request.attempt_id)
         
         for answer in request.answers:
             question_id = str(answer.get("question_id"))
@@ -839,27 +839,20 @@ async def submit_assessment(
                 "is_correct": is_correct,
                 "explanation": question_data.get("explanation", "No explanation available.")
             })
-        
-        percentage_score = round((total_score / max_score * 100), 2) if max_score > 0 else 0
-        
-        # Save responses
-        for answer in request.answers:
-            question_id = str(answer.get("question_id"))
-            user_answer = answer.get("answer", "").strip().upper()  # Normalize to uppercase
-            question_data = questions_dict.get(question_id, {})
-            correct_answer = question_data.get("correct_answer", "").strip().upper()
-            is_correct = user_answer == correct_answer
             
-            response_data = {
-                "attempt_id": str(request.attempt_id),
+            response_rows.append({
+                "attempt_id": attempt_id_str,
                 "question_id": question_id,
                 "answer_text": user_answer,
                 "score": 1 if is_correct else 0,
                 "max_score": 1,
                 "status": "scored"
-            }
-            
-            client.table("responses").insert(response_data).execute()
+            })
+        
+        percentage_score = round((total_score / max_score * 100), 2) if max_score > 0 else 0
+        
+        # Save all responses in one multi-row insert
+        supabase_service.create_responses_bulk(response_rows, return_rows=False)
         
         # Update attempt
         update_data = {
@@ -871,7 +864,7 @@ async def submit_assessment(
         }
         
         client.table("attempts")\
-            .update(update_data)\
+            .update(update_data, returning=ReturnMethod.minimal)\
             .eq("id", str(request.attempt_id))\
             .execute()
         
@@ -928,7 +921,7 @@ async def submit_assessment(
                 result_data_db["overall_feedback"] = feedback_message
             
             try:
-                client.table("results").insert(result_data_db).execute()
+                client.table("results").insert(result_data_db, returning=ReturnMethod.minimal).execute()
             except Exception as e:
                 logger.error(f"Could not create result: {str(e)}")
                 # Continue anyway - result is still returned to frontend
@@ -1144,6 +1137,93 @@ async def get_attempt_result(attempt_id: str):
         )
 
 
+@router.get("/attempts/{attempt_id}/feedback/stream")
+async def stream_attempt_feedback(attempt_id: str):
+    """
+    Stream personalized feedback for a completed attempt as plain text
+    
+    Stored feedback is returned in one chunk; otherwise tokens are streamed
+    as the LLM generates them and the final text is saved on the result.
+    """
+    client = supabase_service.get_client()
+    if not client:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database service unavailable"
+        )
+    
+    try:
+        attempt_response = client.table("attempts")\
+            .select("id, total_score, max_score, percentage_score, results(id, total_score, max_score, percentage_score, passed, overall_feedback), assessments(title, skill_domain)")\
+            .eq("id", attempt_id)\
+            .limit(1)\
+            .execute()
+    except Exception as e:
+        logger.error(f"Error fetching attempt for feedback stream: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching attempt: {str(e)}"
+        )
+    
+    if not attempt_response.data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Attempt not found: {attempt_id}"
+        )
+    
+    attempt = attempt_response.data[0]
+    result = attempt.get("results")
+    if isinstance(result, list):
+        result = result[0] if result else None
+    
+    stored_feedback = result.get("overall_feedback") if result else None
+    if stored_feedback:
+        return StreamingResponse(iter([stored_feedback]), media_type="text/plain; charset=utf-8")
+    
+    source = result or attempt
+    percentage = float(source.get("percentage_score") or 0)
+    assessment = attempt.get("assessments")
+    if isinstance(assessment, list):
+        assessment = assessment[0] if assessment else None
+    skill_domain = (assessment.get("skill_domain") or assessment.get("title")) if assessment else None
+    
+    try:
+        responses_response = client.table("responses")\
+            .select("score")\
+            .eq("attempt_id", attempt_id)\
+            .execute()
+        responses = responses_response.data or []
+    except Exception as e:
+        logger.warning(f"Could not fetch responses for feedback stream: {str(e)}")
+        responses = []
+    results_data = [{"is_correct": (r.get("score") or 0) > 0} for r in responses]
+    
+    async def feedback_chunks():
+        parts = []
+        async for chunk in feedback_service.stream_feedback(
+            score=float(source.get("total_score") or 0),
+            max_score=float(source.get("max_score") or 0),
+            percentage=percentage,
+            passed=source.get("passed", percentage >= 60),
+            results=results_data,
+            skill_domain=skill_domain
+        ):
+            parts.append(chunk)
+            yield chunk
+        
+        # Persist the generated feedback so later result fetches reuse it
+        if result and result.get("id") and parts:
+            try:
+                client.table("results")\
+                    .update({"overall_feedback": "".join(parts).strip()})\
+                    .eq("id", result.get("id"))\
+                    .execute()
+            except Exception as e:
+                logger.warning(f"Could not update feedback in database: {str(e)}")
+    
+    return StreamingResponse(feedback_chunks(), media_type="text/plain; charset=utf-8")
+
+
 @router.get("/getProgress")
 async def get_progress():
     """
@@ -3,13 +3,90 @@ Service for automatically generating assessments from existing embeddings
 Reads video_embeddings and pdf_embeddings, generates questions, and creates assessments
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from threading import Lock
 from uuid import UUID, uuid4
-from datetime import datetime
+from datetime import datetime, timezone
+from supabase import Client
 from app.services.supabase_service import supabase_service
 from app.services.topic_question_service import topic_question_service
 from app.utils.logger import logger
-import json
+import orjson
+import re
+
+
+# Technical indicators used to estimate content difficulty
+_TECH_RE = re.compile(
+    r"function|class|method|algorithm|implementation|complexity|optimization|architecture|pattern",
+    re.IGNORECASE
+)
+
+# Rows per page when scanning embedding tables for distinct sources
+# (matches PostgREST's default max-rows, so a short page reliably means the end)
+SOURCE_PAGE_SIZE = 1000
+
+# Chunks fetched per source for question generation
+CHUNKS_PER_SOURCE = 30
+
+# Maximum number of (source_type, source_id, limit) chunk lists kept in memory
+CHUNK_CACHE_SIZE = 256
+
+# Rows per question INSERT; PostgREST accepts large array payloads in one POST
+QUESTION_INSERT_BATCH_SIZE = 1000
+
+# Common skill domains matched against source names
+SKILL_KEYWORDS = {
+    "react": "React",
+    "javascript": "JavaScript",
+    "typescript": "TypeScript",
+    "python": "Python",
+    "java": "Java",
+    "problem": "Problem Solving",
+    "communication": "Communication",
+    "teamwork": "Teamwork",
+    "collaboration": "Communication & Collaboration"
+}
+
+# Single alternation over the keywords; longer keywords sharing a prefix
+# ("javascript" vs "java") are listed first so they win at the same position
+_SKILL_RE = re.compile(
+    "(" + "|".join(re.escape(keyword) for keyword in SKILL_KEYWORDS) + ")",
+    re.IGNORECASE
+)
+
+
+def _leading_chunks(chunks: List[Dict[str, Any]], count: int) -> List[Dict[str, Any]]:
+    """Return the first `count` chunks, reusing the list itself when it is already short enough"""
+    return chunks if len(chunks) <= count else chunks[:count]
+
+
+def _difficulty_split(num_questions: int) -> Tuple[int, int, int]:
+    """Split a question count into (easy, medium, hard), e.g. 10 -> 3/4/3"""
+    easy = num_questions // 3
+    hard = num_questions // 3
+    medium = num_questions - easy - hard
+    return easy, medium, hard
+
+
+@lru_cache(maxsize=1024)
+def _topic_for_source_name(source_name: str) -> str:
+    """Resolve a topic from a source name (cached, source names repeat across runs)"""
+    # Try to match keywords
+    match = _SKILL_RE.search(source_name)
+    if match:
+        return SKILL_KEYWORDS[match.group(1).lower()]
+    
+    # Fallback: extract from title or use generic
+    if " " in source_name:
+        # Use first significant word
+        words = source_name.split()
+        if len(words) > 0:
+            return words[0].title()
+    
+    return source_name[:30] if source_name else "General"
 
 
 class AssessmentGenerator:
@@ -18,12 +95,97 @@ class AssessmentGenerator:
     def __init__(self):
         """Initialize assessment generator"""
         self.client = None
+        # Difficulty results keyed by a cheap fingerprint of the chunk texts
+        self._difficulty_cache: Dict[Tuple[Tuple[int, str], ...], str] = {}
+        # Flipped off after the first failed call so later scans go straight to paging
+        self._distinct_rpc_available = True
+        self._difficulty_rpc_available = True
+        # LRU of fetched chunks; chunks are stable within a run, so retries skip the round-trip
+        self._chunk_cache: "OrderedDict[Tuple[str, str, int], List[Dict[str, Any]]]" = OrderedDict()
+        self._chunk_cache_lock = Lock()
         self._initialize_client()
     
     def _initialize_client(self):
         """Initialize Supabase client"""
         self.client = supabase_service.get_client()
     
+    def _require_client(self) -> Client:
+        """
+        Resolve the Supabase client once per run, raising if it is unavailable
+        
+        The per-method client checks are not repeated on the hot paths; callers
+        entering the generation pipeline validate the client here instead.
+        """
+        if self.client is None:
+            self._initialize_client()
+        if self.client is None:
+            raise Exception("Supabase client not initialized. Please configure SUPABASE_URL and SUPABASE_KEY in .env file.")
+        return self.client
+    
+    def _fetch_distinct_sources(self, table: str, id_col: str, title_col: str) -> Dict[str, Optional[str]]:
+        """
+        Get distinct source IDs and titles from an embeddings table
+        
+        Uses the stream_distinct_ids RPC (DISTINCT computed server-side) and falls
+        back to paged scans that keep only the ID -> title mapping, so memory is
+        bounded by the number of sources rather than the number of chunks. Both
+        are paged by SOURCE_PAGE_SIZE over a stable order, so PostgREST's
+        max-rows cap never truncates the result and no rows are skipped.
+        
+        Args:
+            table: Embeddings table name
+            id_col: Source ID column
+            title_col: Source title column
+        
+        Returns:
+            Dictionary of source ID -> title, in first-seen order
+        """
+        if self._distinct_rpc_available:
+            try:
+                sources: Dict[str, Optional[str]] = {}
+                offset = 0
+                while True:
+                    # The function orders by source ID, so offset pages are stable
+                    response = self.client.rpc(
+                        "stream_distinct_ids",
+                        {"p_table": table, "p_id_col": id_col, "p_title_col": title_col}
+                    ).range(offset, offset + SOURCE_PAGE_SIZE - 1).execute()
+                    
+                    rows = response.data or []
+                    for row in rows:
+                        if row.get("source_id"):
+                            sources[row["source_id"]] = row.get("source_title")
+                    
+                    if len(rows) < SOURCE_PAGE_SIZE:
+                        return sources
+                    offset += SOURCE_PAGE_SIZE
+            except Exception as rpc_error:
+                logger.warning(f"RPC stream_distinct_ids unavailable, paging {table} instead: {str(rpc_error)[:100]}")
+                self._distinct_rpc_available = False
+        
+        sources: Dict[str, Optional[str]] = {}
+        offset = 0
+        while True:
+            # Offset paging is only deterministic over a total order
+            response = self.client.table(table)\
+                .select(f"{id_col}, {title_col}")\
+                .order(id_col)\
+                .order("id")\
+                .range(offset, offset + SOURCE_PAGE_SIZE - 1)\
+                .execute()
+            
+            rows = response.data or []
+            for row in rows:
+                source_id = row.get(id_col)
+                if source_id and source_id not in sources:
+                    sources[source_id] = row.get(title_col)
+            
+            if len(rows) < SOURCE_PAGE_SIZE:
+                break
+            offset += SOURCE_PAGE_SIZE
+        
+        return sources
+    
     def get_all_video_sources(self) -> List[Dict[str, Any]]:
         """
         Get all unique video sources from video_embeddings table
@@ -32,31 +194,20 @@ class AssessmentGenerator:
             List of unique video sources with metadata
         """
         try:
-            if not self.client:
-                logger.error("Supabase client not available")
-                return []
-            
             # Get distinct video IDs and titles
-            response = self.client.table("video_embeddings")\
-                .select("video_id, video_title")\
-                .execute()
-            
-            if not response.data:
-                return []
+            videos = self._fetch_distinct_sources("video_embeddings", "video_id", "video_title")
             
-            # Get unique video sources
-            unique_videos = {}
-            for row in response.data:
-                video_id = row.get("video_id")
-                if video_id and video_id not in unique_videos:
-                    unique_videos[video_id] = {
-                        "video_id": video_id,
-                        "video_title": row.get("video_title", f"Video {video_id}"),
-                        "source_type": "video"
-                    }
+            unique_videos = [
+                {
+                    "video_id": video_id,
+                    "video_title": video_title or f"Video {video_id}",
+                    "source_type": "video"
+                }
+                for video_id, video_title in videos.items()
+            ]
             
             logger.info(f"Found {len(unique_videos)} unique video sources")
-            return list(unique_videos.values())
+            return unique_videos
             
         except Exception as e:
             logger.error(f"Error getting video sources: {str(e)}")
@@ -70,38 +221,28 @@ class AssessmentGenerator:
             List of unique PDF sources with metadata
         """
         try:
-            if not self.client:
-                logger.error("Supabase client not available")
-                return []
-            
             # Get distinct document IDs and names
             # Note: Actual column names are pdf_id and pdf_title (not document_id/document_name)
             logger.info("Querying pdf_embeddings table...")
-            response = self.client.table("pdf_embeddings")\
-                .select("pdf_id, pdf_title")\
-                .execute()
-            
-            logger.info(f"PDF embeddings query returned {len(response.data) if response.data else 0} rows")
+            pdfs = self._fetch_distinct_sources("pdf_embeddings", "pdf_id", "pdf_title")
             
-            if not response.data:
+            if not pdfs:
                 logger.warning("No data in pdf_embeddings table")
                 return []
             
-            # Get unique PDF sources
-            unique_pdfs = {}
-            for row in response.data:
-                doc_id = row.get("pdf_id")
-                if doc_id and doc_id not in unique_pdfs:
-                    unique_pdfs[doc_id] = {
-                        "document_id": doc_id,  # Keep for compatibility
-                        "pdf_id": doc_id,
-                        "document_name": row.get("pdf_title", f"Document {doc_id}"),  # Keep for compatibility
-                        "pdf_title": row.get("pdf_title", f"Document {doc_id}"),
-                        "source_type": "pdf"
-                    }
+            unique_pdfs = []
+            for doc_id, pdf_title in pdfs.items():
+                title = pdf_title or f"Document {doc_id}"
+                unique_pdfs.append({
+                    "document_id": doc_id,  # Keep for compatibility
+                    "pdf_id": doc_id,
+                    "document_name": title,  # Keep for compatibility
+                    "pdf_title": title,
+                    "source_type": "pdf"
+                })
             
             logger.info(f"Found {len(unique_pdfs)} unique PDF sources")
-            return list(unique_pdfs.values())
+            return unique_pdfs
             
         except Exception as e:
             logger.error(f"Error getting PDF sources: {str(e)}")
@@ -109,7 +250,7 @@ class AssessmentGenerator:
     
     def get_chunks_for_source(self, source_id: str, source_type: str, limit: int = 20) -> List[Dict[str, Any]]:
         """
-        Get text chunks for a specific video or PDF source
+        Get text chunks for a specific video or PDF source (LRU-cached)
         
         Args:
             source_id: Video ID or document ID
@@ -119,15 +260,35 @@ class AssessmentGenerator:
         Returns:
             List of chunks with text content
         """
+        cache_key = (source_type, str(source_id), limit)
+        with self._chunk_cache_lock:
+            cached = self._chunk_cache.get(cache_key)
+            if cached is not None:
+                self._chunk_cache.move_to_end(cache_key)
+                return cached
+        
+        chunks = self._fetch_chunks_for_source(source_id, source_type, limit)
+        
+        # Empty results are not cached so transient failures are retried
+        if chunks:
+            with self._chunk_cache_lock:
+                self._chunk_cache[cache_key] = chunks
+                self._chunk_cache.move_to_end(cache_key)
+                while len(self._chunk_cache) > CHUNK_CACHE_SIZE:
+                    self._chunk_cache.popitem(last=False)
+        
+        return chunks
+    
+    def _fetch_chunks_for_source(self, source_id: str, source_type: str, limit: int) -> List[Dict[str, Any]]:
+        """Fetch text chunks for a source from Supabase (see get_chunks_for_source)"""
         try:
-            if not self.client:
-                return []
-            
             if source_type == "video":
                 # Note: Actual column name is 'content' not 'chunk_text'
                 response = self.client.table("video_embeddings")\
                     .select("id, content, chunk_id, video_title")\
                     .eq("video_id", source_id)\
+                    .order("chunk_id")\
+                    .order("id")\
                     .limit(limit)\
                     .execute()
                 
@@ -146,6 +307,8 @@ class AssessmentGenerator:
                 response = self.client.table("pdf_embeddings")\
                     .select("id, content, chunk_id, pdf_title, page_number")\
                     .eq("pdf_id", source_id)\
+                    .order("chunk_id")\
+                    .order("id")\
                     .limit(limit)\
                     .execute()
                 
@@ -178,26 +341,73 @@ class AssessmentGenerator:
         if not chunks:
             return "medium"
         
+        fingerprint = tuple(
+            (len(chunk.get("chunk_text", "")), chunk.get("chunk_text", "")[:64])
+            for chunk in chunks
+        )
+        cached = self._difficulty_cache.get(fingerprint)
+        if cached is not None:
+            return cached
+        
         # Simple heuristic: count technical terms, length, complexity
+        # (lengths are O(1) per chunk, so the average is always computed in full)
         total_length = sum(len(chunk.get("chunk_text", "")) for chunk in chunks)
         avg_length = total_length / len(chunks) if chunks else 0
         
-        # Count technical indicators
-        technical_terms = ["function", "class", "method", "algorithm", "implementation", 
-                          "complexity", "optimization", "architecture", "pattern"]
-        tech_count = sum(
-            1 for chunk in chunks 
-            for term in technical_terms 
-            if term.lower() in chunk.get("chunk_text", "").lower()
-        )
+        # Count technical indicators (distinct terms per chunk) with one regex scan per chunk.
+        # Long content is "hard" regardless of terms, and once more than 8 terms are seen
+        # the answer cannot change, so the scan stops as soon as the result is decided.
+        tech_count = 0
+        if avg_length <= 500:
+            for chunk in chunks:
+                tech_count += len({match.lower() for match in _TECH_RE.findall(chunk.get("chunk_text", ""))})
+                if tech_count > 8:
+                    break
         
         # Determine difficulty
         if avg_length < 200 and tech_count < 3:
-            return "easy"
+            difficulty = "easy"
         elif avg_length > 500 or tech_count > 8:
-            return "hard"
+            difficulty = "hard"
         else:
-            return "medium"
+            difficulty = "medium"
+        
+        self._difficulty_cache[fingerprint] = difficulty
+        return difficulty
+    
+    def get_difficulties_for_sources(self, source_type: str, source_ids: List[str]) -> Dict[str, str]:
+        """
+        Get precomputed difficulty levels for many sources in one RPC
+        
+        The difficulty_for_sources SQL function applies the same heuristic as
+        determine_difficulty_from_chunks inside Postgres, to the same first
+        CHUNKS_PER_SOURCE chunks (by chunk_id) that get_chunks_for_source loads,
+        so chunk text does not have to be scanned in Python.
+        
+        Args:
+            source_type: 'video' or 'pdf'
+            source_ids: Source IDs to classify
+        
+        Returns:
+            Dictionary of source ID -> difficulty (empty if the RPC is unavailable)
+        """
+        if not source_ids or not self._difficulty_rpc_available:
+            return {}
+        
+        try:
+            response = self.client.rpc(
+                "difficulty_for_sources",
+                {"p_source_type": source_type, "p_source_ids": source_ids, "p_chunk_limit": CHUNKS_PER_SOURCE}
+            ).execute()
+            return {
+                row["source_id"]: row["difficulty"]
+                for row in response.data or []
+                if row.get("source_id") and row.get("difficulty")
+            }
+        except Exception as e:
+            logger.warning(f"RPC difficulty_for_sources unavailable, computing difficulty in Python: {str(e)[:100]}")
+            self._difficulty_rpc_available = False
+            return {}
     
     def extract_topic_from_source(self, source_name: str, source_type: str) -> str:
         """
@@ -210,34 +420,44 @@ class AssessmentGenerator:
         Returns:
             Extracted topic/skill domain
         """
-        # Common skill domains
-        skill_keywords = {
-            "react": "React",
-            "javascript": "JavaScript",
-            "typescript": "TypeScript",
-            "python": "Python",
-            "java": "Java",
-            "problem": "Problem Solving",
-            "communication": "Communication",
-            "teamwork": "Teamwork",
-            "collaboration": "Communication & Collaboration"
-        }
+        return _topic_for_source_name(source_name or "")
+    
+    def _insert_questions(
+        self,
+        records: List[Dict[str, Any]],
+        batch_size: int = QUESTION_INSERT_BATCH_SIZE
+    ) -> List[Optional[str]]:
+        """
+        Insert question rows into skill_assessment_questions in large batches
         
-        source_lower = source_name.lower()
+        Args:
+            records: Question rows to insert
+            batch_size: Maximum rows per INSERT request
         
-        # Try to match keywords
-        for keyword, skill in skill_keywords.items():
-            if keyword in source_lower:
-                return skill
+        Returns:
+            Inserted question IDs aligned with records (None where a batch failed)
+        """
+        inserted_ids: List[Optional[str]] = []
         
-        # Fallback: extract from title or use generic
-        if " " in source_name:
-            # Use first significant word
-            words = source_name.split()
-            if len(words) > 0:
-                return words[0].title()
+        for i in range(0, len(records), batch_size):
+            batch = records[i:i + batch_size]
+            batch_ids: List[Optional[str]] = []
+            try:
+                logger.info(f"Inserting batch {i//batch_size + 1} with {len(batch)} questions...")
+                response = self.client.table('skill_assessment_questions').insert(batch).execute()
+                if response.data:
+                    batch_ids = [q.get('id') for q in response.data]
+                    logger.info(f"✅ Successfully inserted {len(batch_ids)} questions. IDs: {batch_ids[:3]}...")
+                else:
+                    logger.warning(f"⚠️  Insert response has no data for batch {i//batch_size + 1}")
+            except Exception as e:
+                logger.exception(f"❌ Error inserting questions batch {i//batch_size + 1}: {str(e)}")
+            
+            # Keep positions aligned with the input rows
+            batch_ids.extend([None] * (len(batch) - len(batch_ids)))
+            inserted_ids.extend(batch_ids[:len(batch)])
         
-        return source_name[:30] if source_name else "General"
+        return inserted_ids
     
     def generate_questions_from_chunks(
         self,
@@ -267,9 +487,9 @@ class AssessmentGenerator:
             difficulty = self.determine_difficulty_from_chunks(chunks)
             
             # Generate questions with mixed difficulty levels
-            easy_count = num_questions // 3
-            medium_count = (num_questions * 2) // 3
-            hard_count = num_questions - easy_count - medium_count
+            easy_count, medium_count, hard_count = _difficulty_split(num_questions)
+            easy_chunks = _leading_chunks(chunks, 10)
+            medium_chunks = _leading_chunks(chunks, 20)
             
             all_questions = []
             
@@ -277,7 +497,7 @@ class AssessmentGenerator:
             if easy_count > 0:
                 easy_questions = topic_question_service.generate_questions_from_embeddings(
                     topic=topic,
-                    chunks=chunks[:10],
+                    chunks=easy_chunks,
                     num_questions=easy_count,
                     question_type="mcq",
                     difficulty="easy"
@@ -288,7 +508,7 @@ class AssessmentGenerator:
             if medium_count > 0:
                 medium_questions = topic_question_service.generate_questions_from_embeddings(
                     topic=topic,
-                    chunks=chunks[:20] if len(chunks) > 20 else chunks,
+                    chunks=medium_chunks,
                     num_questions=medium_count,
                     question_type="mcq",
                     difficulty="medium"
@@ -325,31 +545,7 @@ class AssessmentGenerator:
                 })
             
             # Store questions using Supabase client
-            if not self.client:
-                return {
-                    "success": False,
-                    "error": "Supabase client not available"
-                }
-            
-            # Insert questions in batches
-            batch_size = 50
-            inserted_ids = []
-            
-            for i in range(0, len(questions_to_store), batch_size):
-                batch = questions_to_store[i:i + batch_size]
-                try:
-                    logger.info(f"Inserting batch {i//batch_size + 1} with {len(batch)} questions...")
-                    response = self.client.table('skill_assessment_questions').insert(batch).execute()
-                    if response.data:
-                        batch_ids = [q.get('id') for q in response.data]
-                        inserted_ids.extend(batch_ids)
-                        logger.info(f"✅ Successfully inserted {len(batch_ids)} questions. IDs: {batch_ids[:3]}...")
-                    else:
-                        logger.warning(f"⚠️  Insert response has no data for batch {i//batch_size + 1}")
-                except Exception as e:
-                    logger.error(f"❌ Error inserting questions batch {i//batch_size + 1}: {str(e)}")
-                    import traceback
-                    logger.error(traceback.format_exc())
+            inserted_ids = [qid for qid in self._insert_questions(questions_to_store) if qid]
             
             return {
                 "success": len(inserted_ids) > 0,
@@ -371,7 +567,10 @@ class AssessmentGenerator:
         source_id: str,
         source_name: str,
         source_type: str,
-        num_questions: int = 10
+        num_questions: int = 10,
+        store: bool = True,
+        difficulty: Optional[str] = None,
+        chunks: Optional[List[Dict[str, Any]]] = None
     ) -> Dict[str, Any]:
         """
         Generate questions for a specific video or PDF source
@@ -381,13 +580,19 @@ class AssessmentGenerator:
             source_name: Video title or document name
             source_type: 'video' or 'pdf'
             num_questions: Number of questions to generate (default 10)
+            store: Insert the questions now; when False the unstored rows are
+                returned under "records" so callers can batch inserts across sources
+            difficulty: Precomputed difficulty (see get_difficulties_for_sources);
+                derived from the chunks when not provided
+            chunks: Already-fetched chunks for this source (fetched when not provided)
         
         Returns:
             Dictionary with success status and generated questions
         """
         try:
             # Get chunks for this source
-            chunks = self.get_chunks_for_source(source_id, source_type, limit=30)
+            if chunks is None:
+                chunks = self.get_chunks_for_source(source_id, source_type, limit=CHUNKS_PER_SOURCE)
             
             if not chunks:
                 logger.warning(f"No chunks found for {source_type} {source_id}")
@@ -400,13 +605,14 @@ class AssessmentGenerator:
             topic = self.extract_topic_from_source(source_name, source_type)
             
             # Determine difficulty
-            difficulty = self.determine_difficulty_from_chunks(chunks)
+            if not difficulty:
+                difficulty = self.determine_difficulty_from_chunks(chunks)
             
             # Generate questions with mixed difficulty levels
             # Generate 3 easy, 4 medium, 3 hard questions
-            easy_count = num_questions // 3
-            medium_count = (num_questions * 2) // 3
-            hard_count = num_questions - easy_count - medium_count
+            easy_count, medium_count, hard_count = _difficulty_split(num_questions)
+            easy_chunks = _leading_chunks(chunks, 10)  # Use simpler chunks
+            medium_chunks = _leading_chunks(chunks, 20)  # Use more chunks
             
             all_questions = []
             
@@ -414,7 +620,7 @@ class AssessmentGenerator:
             if easy_count > 0:
                 easy_questions = topic_question_service.generate_questions_from_embeddings(
                     topic=topic,
-                    chunks=chunks[:10],  # Use simpler chunks
+                    chunks=easy_chunks,
                     num_questions=easy_count,
                     question_type="mcq",
                     difficulty="easy"
@@ -425,7 +631,7 @@ class AssessmentGenerator:
             if medium_count > 0:
                 medium_questions = topic_question_service.generate_questions_from_embeddings(
                     topic=topic,
-                    chunks=chunks[:20],  # Use more chunks
+                    chunks=medium_chunks,
                     num_questions=medium_count,
                     question_type="mcq",
                     difficulty="medium"
@@ -462,33 +668,19 @@ class AssessmentGenerator:
                     # Note: source_type and source_id are NOT stored as per user requirements
                 })
             
-            # Store questions directly using Supabase client
-            if not self.client:
-                logger.error("Supabase client not available for storing questions")
+            if not store:
                 return {
-                    "success": False,
-                    "error": "Supabase client not available"
+                    "success": True,
+                    "topic": topic,
+                    "source_name": source_name,
+                    "source_type": source_type,
+                    "questions": all_questions,
+                    "records": questions_to_store,
+                    "difficulty": difficulty
                 }
             
-            # Insert questions in batches
-            batch_size = 50
-            inserted_ids = []
-            
-            for i in range(0, len(questions_to_store), batch_size):
-                batch = questions_to_store[i:i + batch_size]
-                try:
-                    logger.info(f"Inserting batch {i//batch_size + 1} with {len(batch)} questions...")
-                    response = self.client.table('skill_assessment_questions').insert(batch).execute()
-                    if response.data:
-                        batch_ids = [q.get('id') for q in response.data]
-                        inserted_ids.extend(batch_ids)
-                        logger.info(f"✅ Successfully inserted {len(batch_ids)} questions. IDs: {batch_ids[:3]}...")
-                    else:
-                        logger.warning(f"⚠️  Insert response has no data for batch {i//batch_size + 1}")
-                except Exception as e:
-                    logger.error(f"❌ Error inserting questions batch {i//batch_size + 1}: {str(e)}")
-                    import traceback
-                    logger.error(traceback.format_exc())
+            # Store questions directly using Supabase client
+            inserted_ids = [qid for qid in self._insert_questions(questions_to_store) if qid]
             
             store_result = {
                 "success": len(inserted_ids) > 0,
@@ -521,16 +713,17 @@ class AssessmentGenerator:
                 "error": str(e)
             }
     
-    def create_assessment_from_questions(
+    def build_assessment_record(
         self,
         topic: str,
         source_name: str,
         question_ids: List[str],
         difficulty: str,
-        question_count: int
-    ) -> Optional[Dict[str, Any]]:
+        question_count: int,
+        published_at: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
-        Create an assessment entry in the assessments table
+        Build an assessment row for the assessments table (not inserted)
         
         Args:
             topic: Skill domain/topic
@@ -538,63 +731,109 @@ class AssessmentGenerator:
             question_ids: List of question UUIDs
             difficulty: Average difficulty level
             question_count: Total number of questions
+            published_at: ISO timestamp shared by a batch (defaults to now, UTC)
         
         Returns:
-            Created assessment record or None
+            Assessment record ready for insertion
+        """
+        # Calculate duration (1.5 minutes per question)
+        duration_minutes = int(question_count * 1.5)
+        
+        # Create description
+        description = f"Assessment based on {source_name}. Test your knowledge with {question_count} multiple-choice questions."
+        
+        # Create blueprint (JSON structure)
+        easy_count, medium_count, hard_count = _difficulty_split(question_count)
+        blueprint = {
+            "question_distribution": {
+                "easy": easy_count,
+                "medium": medium_count,
+                "hard": hard_count
+            },
+            "total_questions": question_count,
+            "question_ids": question_ids
+        }
+        
+        # Create assessment record
+        return {
+            "title": f"{topic} Assessment",
+            "description": description,
+            "skill_domain": topic,
+            "difficulty": difficulty,
+            "question_count": question_count,
+            "duration_minutes": duration_minutes,
+            "passing_score": 70,
+            "status": "published",
+            # assessments.blueprint is a TEXT column, so it still has to be serialized
+            "blueprint": orjson.dumps(blueprint).decode(),
+            "created_by": None,  # No user in no-auth mode
+            "published_at": published_at or datetime.now(timezone.utc).isoformat()
+        }
+    
+    def create_assessments_bulk(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Insert many assessment rows in a single request
+        
+        Args:
+            records: Assessment records built by build_assessment_record
+        
+        Returns:
+            Created assessment records in input order (empty list on failure)
         """
+        if not records:
+            return []
+        
         try:
-            if not self.client:
-                logger.error("Supabase client not available")
-                return None
-            
-            # Calculate duration (1.5 minutes per question)
-            duration_minutes = int(question_count * 1.5)
-            
-            # Create description
-            description = f"Assessment based on {source_name}. Test your knowledge with {question_count} multiple-choice questions."
-            
-            # Create blueprint (JSON structure)
-            blueprint = {
-                "question_distribution": {
-                    "easy": question_count // 3,
-                    "medium": (question_count * 2) // 3,
-                    "hard": question_count - (question_count // 3) - ((question_count * 2) // 3)
-                },
-                "total_questions": question_count,
-                "question_ids": question_ids
-            }
-            
-            # Create assessment record
-            assessment_data = {
-                "title": f"{topic} Assessment",
-                "description": description,
-                "skill_domain": topic,
-                "difficulty": difficulty,
-                "question_count": question_count,
-                "duration_minutes": duration_minutes,
-                "passing_score": 70,
-                "status": "published",
-                "blueprint": json.dumps(blueprint),
-                "created_by": None,  # No user in no-auth mode
-                "published_at": datetime.utcnow().isoformat()
-            }
-            
-            logger.info(f"Inserting assessment: {assessment_data.get('title')}")
-            response = self.client.table("assessments").insert(assessment_data).execute()
+            logger.info(f"Inserting {len(records)} assessments")
+            response = self.client.table("assessments").insert(records).execute()
             
             if response.data:
-                assessment = response.data[0]
-                assessment_id = assessment.get('id')
-                logger.info(f"✅ Created assessment: {assessment_id} for topic: {topic}")
-                return assessment
+                logger.info(f"✅ Created {len(response.data)} assessments")
+                return response.data
             else:
                 logger.error(f"❌ Assessment insert response has no data")
-                logger.error(f"   Assessment data: {assessment_data}")
-                return None
+                logger.error(f"   Assessment titles: {[r.get('title') for r in records]}")
+                return []
             
         except Exception as e:
-            logger.error(f"Error creating assessment: {str(e)}")
+            logger.error(f"Error creating assessments: {str(e)}")
+            return []
+    
+    def create_assessment_from_questions(
+        self,
+        topic: str,
+        source_name: str,
+        question_ids: List[str],
+        difficulty: str,
+        question_count: int
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Create an assessment entry in the assessments table
+        
+        Args:
+            topic: Skill domain/topic
+            source_name: Original source name (video title or document name)
+            question_ids: List of question UUIDs
+            difficulty: Average difficulty level
+            question_count: Total number of questions
+        
+        Returns:
+            Created assessment record or None
+        """
+        record = self.build_assessment_record(
+            topic=topic,
+            source_name=source_name,
+            question_ids=question_ids,
+            difficulty=difficulty,
+            question_count=question_count
+        )
+        created = self.create_assessments_bulk([record])
+        if not created:
             return None
+        
+        assessment = created[0]
+        logger.info(f"✅ Created assessment: {assessment.get('id')} for topic: {topic}")
+        return assessment
     
     def generate_all_assessments(self) -> Dict[str, Any]:
         """
@@ -603,7 +842,7 @@ class AssessmentGenerator:
         This function:
         1. Reads all video and PDF sources
         2. Generates questions for each source
-        3. Creates assessment entries
+        3. Creates assessment entries (one bulk insert for all sources)
         4. Stores everything in Supabase
         
         Returns:
@@ -611,6 +850,7 @@ class AssessmentGenerator:
         """
         try:
             logger.info("Starting assessment generation from existing embeddings")
+            self._require_client()
             
             # Get all sources
             video_sources = self.get_all_video_sources()
@@ -628,35 +868,82 @@ class AssessmentGenerator:
             
             logger.info(f"Found {len(all_sources)} total sources ({len(video_sources)} videos, {len(pdf_sources)} PDFs)")
             
+            # Classify all sources server-side up front (falls back to per-source Python)
+            difficulties = {
+                **self.get_difficulties_for_sources("video", [v["video_id"] for v in video_sources]),
+                **self.get_difficulties_for_sources("pdf", [p["pdf_id"] for p in pdf_sources])
+            }
+            
             generated_assessments = []
             failed_sources = []
-            
-            # Process each source
-            for source in all_sources:
-                # Handle both old and new column names
-                source_id = source.get("video_id") or source.get("document_id") or source.get("pdf_id")
-                source_name = source.get("video_title") or source.get("document_name") or source.get("pdf_title", "Unknown")
-                source_type = source.get("source_type", "unknown")
-                
-                logger.info(f"Processing {source_type}: {source_name} (ID: {source_id})")
-                
-                # Generate questions
-                result = self.generate_questions_for_source(
-                    source_id=source_id,
-                    source_name=source_name,
-                    source_type=source_type,
-                    num_questions=10
+            generated_sources = []
+            question_records = []
+            
+            # Handle both old and new column names
+            resolved_sources = [
+                (
+                    source.get("video_id") or source.get("document_id") or source.get("pdf_id"),
+                    source.get("video_title") or source.get("document_name") or source.get("pdf_title", "Unknown"),
+                    source.get("source_type", "unknown")
+                )
+                for source in all_sources
+            ]
+            
+            # Process each source (questions are inserted for all sources at once below).
+            # The next source's chunks are fetched in the background while the LLM
+            # generates questions for the current one.
+            with ThreadPoolExecutor(max_workers=1) as prefetcher:
+                first_id, _, first_type = resolved_sources[0]
+                next_chunks = prefetcher.submit(
+                    self.get_chunks_for_source, first_id, first_type, CHUNKS_PER_SOURCE
                 )
                 
-                if not result.get("success"):
-                    logger.warning(f"Failed to generate questions for {source_name}: {result.get('error')}")
-                    failed_sources.append({
-                        "source": source_name,
-                        "error": result.get("error")
-                    })
-                    continue
+                for index, (source_id, source_name, source_type) in enumerate(resolved_sources):
+                    chunks = next_chunks.result()
+                    if index + 1 < len(resolved_sources):
+                        upcoming_id, _, upcoming_type = resolved_sources[index + 1]
+                        next_chunks = prefetcher.submit(
+                            self.get_chunks_for_source, upcoming_id, upcoming_type, CHUNKS_PER_SOURCE
+                        )
+                    
+                    logger.info(f"Processing {source_type}: {source_name} (ID: {source_id})")
+                    
+                    # Generate questions
+                    result = self.generate_questions_for_source(
+                        source_id=source_id,
+                        source_name=source_name,
+                        source_type=source_type,
+                        num_questions=10,
+                        store=False,
+                        difficulty=difficulties.get(source_id),
+                        chunks=chunks
+                    )
+                    
+                    if not result.get("success"):
+                        logger.warning(f"Failed to generate questions for {source_name}: {result.get('error')}")
+                        failed_sources.append({
+                            "source": source_name,
+                            "error": result.get("error")
+                        })
+                        continue
+                    
+                    records = result.get("records", [])
+                    generated_sources.append((source_name, result, len(records)))
+                    question_records.extend(records)
+            
+            # Insert questions across all sources; IDs come back aligned with the input rows
+            inserted_ids = self._insert_questions(question_records) if question_records else []
+            
+            pending_records = []
+            pending_sources = []
+            offset = 0
+            # Every assessment from this run shares one publish timestamp
+            published_at = datetime.now(timezone.utc).isoformat()
+            
+            for source_name, result, record_count in generated_sources:
+                question_ids = [qid for qid in inserted_ids[offset:offset + record_count] if qid]
+                offset += record_count
                 
-                question_ids = result.get("question_ids", [])
                 topic = result.get("topic")
                 difficulty = result.get("difficulty", "medium")
                 question_count = len(result.get("questions", []))
@@ -669,28 +956,37 @@ class AssessmentGenerator:
                     })
                     continue
                 
-                # Create assessment
-                assessment = self.create_assessment_from_questions(
+                # Queue assessment for the bulk insert below
+                pending_records.append(self.build_assessment_record(
                     topic=topic,
                     source_name=source_name,
                     question_ids=question_ids,
                     difficulty=difficulty,
-                    question_count=question_count
-                )
-                
-                if assessment:
+                    question_count=question_count,
+                    published_at=published_at
+                ))
+                pending_sources.append({
+                    "topic": topic,
+                    "source": source_name,
+                    "question_count": question_count
+                })
+            
+            # Create all assessments in one request; PostgREST returns rows in input order
+            created = self.create_assessments_bulk(pending_records)
+            
+            if len(created) == len(pending_sources):
+                for assessment, pending in zip(created, pending_sources):
                     generated_assessments.append({
                         "assessment_id": assessment.get("id"),
                         "title": assessment.get("title"),
-                        "topic": topic,
-                        "source": source_name,
-                        "question_count": question_count
+                        **pending
                     })
                     logger.info(f"✅ Created assessment: {assessment.get('title')}")
-                else:
-                    logger.warning(f"Failed to create assessment for {source_name}")
+            else:
+                for pending in pending_sources:
+                    logger.warning(f"Failed to create assessment for {pending['source']}")
                     failed_sources.append({
-                        "source": source_name,
+                        "source": pending["source"],
                         "error": "Assessment creation failed"
                     })
             
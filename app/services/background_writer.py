@@ -0,0 +1,127 @@
+"""
+Background writer for fire-and-forget Supabase inserts
+Rows are queued by request handlers and written in multi-row batches off the critical path
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from threading import Thread, Lock
+import queue
+import time
+from postgrest.types import ReturnMethod
+from app.services.supabase_service import supabase_service
+from app.utils.logger import logger
+
+# Flush a table once it has this many rows queued, or after the delay below
+BATCH_MAX_ROWS = 32
+BATCH_MAX_DELAY = 0.2  # seconds
+
+_STOP = object()
+
+
+class BackgroundWriter:
+    """Queue-backed worker thread that batches inserts per table"""
+    
+    def __init__(self, max_rows: int = BATCH_MAX_ROWS, max_delay: float = BATCH_MAX_DELAY):
+        """
+        Initialize background writer
+        
+        Args:
+            max_rows: Rows per table that trigger an immediate flush
+            max_delay: Maximum seconds a row waits before being written
+        """
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[Thread] = None
+        self._lock = Lock()
+    
+    def _ensure_started(self) -> None:
+        """Start the worker thread on first use"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = Thread(target=self._run, name="background-writer", daemon=True)
+                self._thread.start()
+    
+    def enqueue(
+        self,
+        table: str,
+        row: Dict[str, Any],
+        prepare: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> None:
+        """
+        Queue a row for insertion
+        
+        Args:
+            table: Target table name
+            row: Row data (all rows for a table must share the same keys)
+            prepare: Optional callback run on the worker thread just before
+                the insert, e.g. to fill in an expensive column
+        """
+        self._ensure_started()
+        self._queue.put((table, row, prepare))
+    
+    def stop(self, timeout: float = 5.0) -> None:
+        """Flush pending rows and stop the worker thread"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+    
+    def _run(self) -> None:
+        """Worker loop: collect rows until a batch is full or old enough, then flush"""
+        pending: Dict[str, List[Tuple[Dict[str, Any], Optional[Callable]]]] = {}
+        deadline: Optional[float] = None
+        
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            
+            if item is _STOP:
+                self._flush(pending)
+                return
+            
+            if item is not None:
+                table, row, prepare = item
+                pending.setdefault(table, []).append((row, prepare))
+                if deadline is None:
+                    deadline = time.monotonic() + self.max_delay
+            
+            full = any(len(rows) >= self.max_rows for rows in pending.values())
+            if pending and (full or time.monotonic() >= deadline):
+                self._flush(pending)
+                pending = {}
+                deadline = None
+    
+    def _flush(self, pending: Dict[str, List[Tuple[Dict[str, Any], Optional[Callable]]]]) -> None:
+        """Insert all pending rows, one multi-row insert per table"""
+        if not pending:
+            return
+        
+        client = supabase_service.get_client()
+        if not client:
+            logger.error(f"Supabase client not available, dropping {sum(map(len, pending.values()))} queued rows")
+            return
+        
+        for table, items in pending.items():
+            rows = []
+            for row, prepare in items:
+                if prepare is not None:
+                    try:
+                        prepare(row)
+                    except Exception as e:
+                        logger.warning(f"Error preparing row for {table}: {str(e)}")
+                rows.append(row)
+            try:
+                # Nobody reads the inserted rows back - skip the representation
+                client.table(table).insert(rows, returning=ReturnMethod.minimal).execute()
+            except Exception as e:
+                logger.error(f"Error writing {len(rows)} queued rows to {table}: {str(e)}")
+
+
+# Global writer instance
+background_writer = BackgroundWriter()
@@ -3,10 +3,137 @@ Embedding service for generating query embeddings only
 Uses OpenAI embeddings API for topic search (does not store new embeddings)
 """
 
-from typing import List, Optional
-from openai import OpenAI
+from typing import Dict, List, Optional, Tuple
+import asyncio
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+import hashlib
+import sqlite3
+import time
+import struct
 from app.config import settings
+from app.services.openai_client import get_openai_client, get_async_openai_client, retry_delay, MAX_RETRY_ATTEMPTS
 from app.utils.logger import logger
+from app.utils.rate_limit import openai_limiter
+
+# text-embedding-3-small supports up to 8191 tokens
+# Roughly 1 token = 4 characters, so ~32k characters
+MAX_EMBEDDING_CHARS = 30000
+
+# Per-request limits for the embeddings endpoint
+MAX_BATCH_ITEMS = 2048
+MAX_BATCH_TOKENS = 250000
+
+
+def _estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+def _pack_vector(embedding: List[float]) -> bytes:
+    """Encode an embedding as little-endian float16 (2 bytes per dimension)"""
+    return struct.pack(f"<{len(embedding)}e", *embedding)
+
+
+def _unpack_vector(data: bytes) -> List[float]:
+    """Decode a float16 embedding produced by _pack_vector"""
+    return list(struct.unpack(f"<{len(data) // 2}e", data))
+
+
+class EmbeddingCache:
+    """
+    LRU cache of embeddings keyed on (model, sha256(text)), optionally persisted to sqlite
+    
+    Vectors are stored as float16 bytes, which is a quarter of the size of a
+    list of Python floats and well within the precision that matters for
+    cosine similarity; they are decoded back to lists on read.
+    """
+    
+    def __init__(self, max_size: int, cache_dir: Optional[str] = None):
+        """
+        Initialize embedding cache
+        
+        Args:
+            max_size: Maximum number of embeddings kept in memory
+            cache_dir: Directory for the persistent sqlite store (None disables persistence)
+        """
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if cache_dir:
+            self._open_store(cache_dir)
+    
+    def _open_store(self, cache_dir: str) -> None:
+        """Open (or create) the sqlite store; fall back to memory-only on failure"""
+        try:
+            path = Path(cache_dir)
+            path.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path / "embeddings.sqlite"), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings_f16 (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+        except Exception as e:
+            logger.warning(f"Embedding disk cache unavailable, using memory only: {str(e)}")
+            self._db = None
+    
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        """Build cache key from model name and text digest"""
+        return f"{model}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+    
+    def get(self, key: str) -> Optional[List[float]]:
+        """Get embedding from memory, then from the disk store"""
+        with self._lock:
+            packed = self._entries.get(key)
+            if packed is not None:
+                self._entries.move_to_end(key)
+                return _unpack_vector(packed)
+            
+            if self._db is None:
+                return None
+            try:
+                row = self._db.execute(
+                    "SELECT vector FROM embeddings_f16 WHERE key = ?", (key,)
+                ).fetchone()
+            except Exception as e:
+                logger.warning(f"Embedding disk cache read failed: {str(e)}")
+                return None
+            if not row:
+                return None
+            
+            packed = bytes(row[0])
+            self._remember(key, packed)
+            return _unpack_vector(packed)
+    
+    def set(self, key: str, embedding: List[float]) -> None:
+        """Store embedding in memory and in the disk store"""
+        packed = _pack_vector(embedding)
+        with self._lock:
+            self._remember(key, packed)
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings_f16 (key, vector) VALUES (?, ?)",
+                    (key, packed)
+                )
+                self._db.commit()
+            except Exception as e:
+                logger.warning(f"Embedding disk cache write failed: {str(e)}")
+    
+    def _remember(self, key: str, packed: bytes) -> None:
+        """Insert into the in-memory LRU, evicting the oldest entries (lock held)"""
+        self._entries[key] = packed
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+# Shared embedding cache, so every EmbeddingService instance and caller hits the same entries
+embedding_cache = EmbeddingCache(settings.EMBED_CACHE_SIZE, settings.EMBED_CACHE_DIR)
 
 
 class EmbeddingService:
@@ -15,114 +142,220 @@ class EmbeddingService:
     def __init__(self):
         """Initialize embedding service"""
         self.client = None
+        self.async_client = None
+        self._cache = embedding_cache
         self._initialize_openai_client()
     
     def _initialize_openai_client(self):
-        """Initialize OpenAI client"""
-        try:
-            if settings.OPENAI_API_KEY and "your-openai" not in settings.OPENAI_API_KEY:
-                self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-            else:
-                logger.warning("OpenAI API key not configured. Embedding features will not work.")
-                self.client = None
-        except Exception as e:
-            logger.error(f"Error initializing OpenAI client: {str(e)}")
-            self.client = None
+        """Attach the shared sync and async OpenAI clients"""
+        client = get_openai_client()
+        async_client = get_async_openai_client()
+        if not client or not async_client:
+            logger.warning("OpenAI API key not configured. Embedding features will not work.")
+            return
+        # Retries are handled by _call_with_retry / _acall_with_retry;
+        # with_options keeps the shared connection pool
+        self.client = client.with_options(max_retries=0)
+        self.async_client = async_client.with_options(max_retries=0)
+    
+    def _call_with_retry(self, **kwargs):
+        """Call embeddings.create, retrying rate limits and transient errors with backoff"""
+        for attempt in range(MAX_RETRY_ATTEMPTS):
+            try:
+                openai_limiter.acquire()
+                return self.client.embeddings.create(**kwargs)
+            except Exception as e:
+                delay = retry_delay(e, attempt)
+                if delay is None or attempt == MAX_RETRY_ATTEMPTS - 1:
+                    raise
+                logger.warning(f"Embedding request failed ({str(e)}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+    
+    async def _acall_with_retry(self, **kwargs):
+        """Async variant of _call_with_retry"""
+        for attempt in range(MAX_RETRY_ATTEMPTS):
+            try:
+                await openai_limiter.acquire_async()
+                return await self.async_client.embeddings.create(**kwargs)
+            except Exception as e:
+                delay = retry_delay(e, attempt)
+                if delay is None or attempt == MAX_RETRY_ATTEMPTS - 1:
+                    raise
+                logger.warning(f"Embedding request failed ({str(e)}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+    
+    @staticmethod
+    def _prepare(text: Optional[str]) -> Optional[str]:
+        """
+        Normalize a text for embedding (None if it is empty)
+        
+        The result is both what is sent to OpenAI and what the cache key is
+        built from, so the two can't disagree.
+        """
+        if not text:
+            return None
+        text = text.strip()
+        if not text:
+            return None
+        # Truncate very long texts (OpenAI has token limits)
+        return text[:MAX_EMBEDDING_CHARS]
+    
+    def _plan(self, texts: List[str], batch_size: int):
+        """
+        Resolve cached embeddings and pack the remaining texts into batches
+        
+        Args:
+            texts: Texts to embed
+            batch_size: Maximum number of texts per batch (capped at MAX_BATCH_ITEMS)
+        
+        Returns:
+            Tuple of (embeddings with cache hits filled in, cache keys by index,
+            list of (original indices, texts to send) batches)
+        """
+        model = settings.OPENAI_EMBEDDING_MODEL
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        cache_keys: Dict[int, str] = {}
+        pending: List[Tuple[int, str]] = []
+        
+        # Single validation/truncation pre-pass; empty slots simply stay None
+        prepared = [(idx, self._prepare(text)) for idx, text in enumerate(texts)]
+        for idx, text in prepared:
+            if text is None:
+                continue
+            cache_key = EmbeddingCache.make_key(model, text)
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                embeddings[idx] = cached
+                continue
+            cache_keys[idx] = cache_key
+            pending.append((idx, text))
+        
+        # Sort by length so each batch holds similarly sized inputs, then
+        # greedily pack batches up to the item and token budgets
+        pending.sort(key=lambda item: len(item[1]))
+        batches = []
+        max_items = min(batch_size, MAX_BATCH_ITEMS)
+        cur_indices: List[int] = []
+        cur_texts: List[str] = []
+        cur_tokens = 0
+        for idx, text in pending:
+            est = _estimate_tokens(text)
+            if cur_texts and (cur_tokens + est > MAX_BATCH_TOKENS or len(cur_texts) >= max_items):
+                batches.append((cur_indices, cur_texts))
+                cur_indices, cur_texts, cur_tokens = [], [], 0
+            cur_indices.append(idx)
+            cur_texts.append(text)
+            cur_tokens += est
+        if cur_texts:
+            batches.append((cur_indices, cur_texts))
+        
+        return embeddings, cache_keys, batches
+    
+    def _collect(self, batches, responses, embeddings: List[Optional[List[float]]], cache_keys: Dict[int, str]) -> None:
+        """Map batch responses back to original positions and populate the cache"""
+        for (valid_indices, _), response in zip(batches, responses):
+            if isinstance(response, Exception):
+                logger.error(f"Error in batch embedding generation: {str(response)}")
+                continue
+            for original_idx, embedding_data in zip(valid_indices, response.data):
+                embeddings[original_idx] = embedding_data.embedding
+                self._cache.set(cache_keys[original_idx], embedding_data.embedding)
     
     def generate_embedding(self, text: str) -> Optional[List[float]]:
         """
         Generate embedding for a single text
         
+        Results are memoized on (model, sha256(text)), so repeated queries
+        skip the OpenAI round-trip.
+        
         Args:
             text: Text to embed
         
         Returns:
             Embedding vector or None
         """
+        if self._prepare(text) is None:
+            logger.warning("Empty text provided for embedding")
+            return None
+        
+        return self.generate_embeddings_batch_sync([text])[0]
+    
+    def generate_embeddings_batch_sync(self, texts: List[str], batch_size: int = MAX_BATCH_ITEMS) -> List[Optional[List[float]]]:
+        """
+        Blocking variant of generate_embeddings_batch for synchronous callers
+        
+        Uses the same cache, packing and retry logic; batches are sent one
+        after another (a single text is a single request).
+        
+        Args:
+            texts: List of texts to embed
+            batch_size: Maximum number of texts per batch (capped at MAX_BATCH_ITEMS)
+        
+        Returns:
+            List of embedding vectors (None for failed embeddings)
+        """
         try:
             if not self.client:
                 logger.error("OpenAI client not initialized")
-                return None
-            
-            # Ensure text is not empty
-            if not text or not text.strip():
-                logger.warning("Empty text provided for embedding")
-                return None
-            
-            # Truncate very long texts (OpenAI has token limits)
-            # text-embedding-3-small supports up to 8191 tokens
-            # Roughly 1 token = 4 characters, so ~32k characters
-            max_chars = 30000
-            if len(text) > max_chars:
-                text = text[:max_chars]
-                logger.warning(f"Text truncated to {max_chars} characters for embedding")
+                return [None] * len(texts)
             
-            response = self.client.embeddings.create(
-                model=settings.OPENAI_EMBEDDING_MODEL,
-                input=text
-            )
+            embeddings, cache_keys, batches = self._plan(texts, batch_size)
+            responses = []
+            for _, batch_texts in batches:
+                try:
+                    responses.append(self._call_with_retry(
+                        model=settings.OPENAI_EMBEDDING_MODEL,
+                        input=batch_texts
+                    ))
+                except Exception as e:
+                    responses.append(e)
             
-            return response.data[0].embedding
+            self._collect(batches, responses, embeddings, cache_keys)
+            return embeddings
             
         except Exception as e:
-            logger.error(f"Error generating embedding: {str(e)}")
-            return None
+            logger.error(f"Error generating embeddings: {str(e)}")
+            return [None] * len(texts)
     
-    def generate_embeddings_batch(self, texts: List[str], batch_size: int = 100) -> List[Optional[List[float]]]:
+    async def generate_embeddings_batch(self, texts: List[str], batch_size: int = MAX_BATCH_ITEMS) -> List[Optional[List[float]]]:
         """
-        Generate embeddings for multiple texts in batches
+        Generate embeddings for multiple texts in concurrent batches
+        
+        Cached texts are served locally; the rest are packed up to
+        MAX_BATCH_TOKENS (estimated) and sent in parallel (bounded by
+        OPENAI_EMBED_CONCURRENCY). Results are reassembled in input order.
         
         Args:
             texts: List of texts to embed
-            batch_size: Number of texts to process per batch
+            batch_size: Maximum number of texts per batch (capped at MAX_BATCH_ITEMS)
         
         Returns:
             List of embedding vectors (None for failed embeddings)
         """
         try:
-            if not self.client:
+            if not self.async_client:
                 logger.error("OpenAI client not initialized")
                 return [None] * len(texts)
             
-            embeddings = []
+            embeddings, cache_keys, batches = self._plan(texts, batch_size)
+            if not batches:
+                return embeddings
             
-            # Process in batches
-            for i in range(0, len(texts), batch_size):
-                batch = texts[i:i + batch_size]
-                
-                # Filter out empty texts
-                valid_texts = []
-                valid_indices = []
-                for idx, text in enumerate(batch):
-                    if text and text.strip():
-                        # Truncate if needed
-                        if len(text) > 30000:
-                            text = text[:30000]
-                        valid_texts.append(text)
-                        valid_indices.append(idx)
-                
-                if not valid_texts:
-                    embeddings.extend([None] * len(batch))
-                    continue
-                
-                try:
-                    response = self.client.embeddings.create(
+            semaphore = asyncio.Semaphore(max(1, settings.OPENAI_EMBED_CONCURRENCY))
+            
+            async def embed_batch(batch_texts: List[str]):
+                async with semaphore:
+                    return await self._acall_with_retry(
                         model=settings.OPENAI_EMBEDDING_MODEL,
-                        input=valid_texts
+                        input=batch_texts
                     )
-                    
-                    # Map embeddings back to original positions
-                    batch_embeddings = [None] * len(batch)
-                    for idx, embedding_data in enumerate(response.data):
-                        original_idx = valid_indices[idx]
-                        batch_embeddings[original_idx] = embedding_data.embedding
-                    
-                    embeddings.extend(batch_embeddings)
-                    
-                except Exception as e:
-                    logger.error(f"Error in batch embedding generation: {str(e)}")
-                    embeddings.extend([None] * len(batch))
             
+            responses = await asyncio.gather(
+                *(embed_batch(batch_texts) for _, batch_texts in batches),
+                return_exceptions=True
+            )
+            
+            self._collect(batches, responses, embeddings, cache_keys)
             return embeddings
             
         except Exception as e:
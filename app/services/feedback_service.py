@@ -3,10 +3,94 @@ Feedback generation service using OpenAI API
 Generates personalized, motivational feedback for assessment results
 """
 
-from typing import Dict, Any, Optional, List
-from openai import OpenAI
+from typing import Dict, Any, Optional, List, Sequence, AsyncIterator
+from bisect import bisect_right
+from dataclasses import dataclass
 from app.config import settings
+from app.services.openai_client import get_openai_client, get_async_openai_client
+from app.utils.cache import cache
 from app.utils.logger import logger
+from app.utils.rate_limit import openai_limiter
+
+# Rule-based fallback feedback, indexed by bisect over ascending percentage thresholds
+_FALLBACK_THRESHOLDS = (60, 70, 80, 90)
+_FALLBACK_TEMPLATES = (
+    " Great effort{skill_context}! Every assessment is a learning opportunity. Review the areas where you struggled, focus on understanding the concepts, and keep practicing. You'll get even better results next time!",
+    " Nice work{skill_context}! You're improving and getting closer to mastery. Review the questions you missed, focus on those topics, and keep practicing. You're on the right path!",
+    " Good effort{skill_context}! You're making solid progress. Focus on reviewing the areas where you had difficulty, and with continued practice, you'll see even better results next time!",
+    " Great job{skill_context}! You're showing strong comprehension and are on the right track. Keep practicing and you'll master this skill completely soon!",
+    " Outstanding work{skill_context}! You've demonstrated excellent understanding and mastery. Keep up this fantastic performance and continue challenging yourself with more advanced topics!",
+)
+_FALLBACK_NO_SKILL = tuple(template.format(skill_context="") for template in _FALLBACK_TEMPLATES)
+
+# Prompt for LLM feedback generation
+_FEEDBACK_SYSTEM_PROMPT = "You are a supportive and encouraging educational assistant. Generate personalized, positive feedback for students based on their assessment performance. Always maintain an uplifting and motivational tone."
+_FEEDBACK_SYSTEM_MESSAGE = {"role": "system", "content": _FEEDBACK_SYSTEM_PROMPT}
+
+_FEEDBACK_PROMPT_TEMPLATE = """Generate a short, personalized, and motivational feedback message for a student who just completed an assessment{skill_context}.
+
+Assessment Results:
+- Score: {score:.1f} out of {max_score:.1f}
+- Percentage: {percentage:.1f}%
+- Status: {status}
+- Correct Answers: {correct} out of {total} questions
+- Accuracy: {accuracy:.1f}%
+
+Requirements:
+1. Start with a motivational message (e.g., "Great job!", "You're improving fast!", "Excellent work!")
+2. Provide positive reinforcement for their performance
+3. If accuracy is below 70%, gently suggest areas to focus on
+4. Always end with encouragement to continue learning
+5. Keep the tone positive, supportive, and student-friendly - never discouraging
+6. Maximum 3-4 sentences
+7. Use emojis sparingly (1-2 max) if appropriate
+
+Generate only the feedback message, no additional text:"""
+
+# LLM feedback is reused for results that land in the same score band
+FEEDBACK_BUCKET_SIZE = 2
+FEEDBACK_CACHE_TTL = 3600  # 1 hour
+
+
+@dataclass(slots=True, frozen=True)
+class TopicStats:
+    """Summary of correctness across an attempt's questions"""
+    total: int = 0
+    correct: int = 0
+    accuracy: float = 0.0
+
+
+def _bucket(value: float) -> int:
+    """Round a percentage to the feedback cache granularity"""
+    return int(round(value / FEEDBACK_BUCKET_SIZE)) * FEEDBACK_BUCKET_SIZE
+
+
+def _feedback_cache_key(
+    percentage: float,
+    passed: bool,
+    topic_analysis: TopicStats,
+    skill_domain: Optional[str]
+) -> str:
+    """Build the score-band cache key for LLM feedback"""
+    return (
+        f"feedback:{skill_domain or ''}:{int(bool(passed))}:{_bucket(percentage)}:"
+        f"{_bucket(topic_analysis.accuracy)}:{topic_analysis.correct}:{topic_analysis.total}"
+    )
+
+
+def _is_boundary_result(percentage: float, results: List[Dict[str, Any]]) -> bool:
+    """Check whether the rule-based message is enough (0%, 100% or no results)"""
+    return not results or percentage <= 0.0 or percentage >= 100.0
+
+
+def _clean_feedback(feedback: str) -> str:
+    """Strip whitespace and surrounding quotes from generated feedback"""
+    feedback = feedback.strip()
+    if feedback.startswith('"') and feedback.endswith('"'):
+        feedback = feedback[1:-1]
+    if feedback.startswith("'") and feedback.endswith("'"):
+        feedback = feedback[1:-1]
+    return feedback
 
 
 class FeedbackService:
@@ -15,19 +99,15 @@ class FeedbackService:
     def __init__(self):
         """Initialize feedback service"""
         self.client = None
+        self.async_client = None
         self._initialize_openai_client()
     
     def _initialize_openai_client(self):
-        """Initialize OpenAI client"""
-        try:
-            if settings.OPENAI_API_KEY and "your-openai" not in settings.OPENAI_API_KEY:
-                self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-            else:
-                logger.warning("OpenAI API key not configured. Feedback generation will use fallback messages.")
-                self.client = None
-        except Exception as e:
-            logger.error(f"Error initializing OpenAI client: {str(e)}")
-            self.client = None
+        """Attach the shared sync and async OpenAI clients"""
+        self.client = get_openai_client()
+        self.async_client = get_async_openai_client()
+        if not self.client:
+            logger.warning("OpenAI API key not configured. Feedback generation will use fallback messages.")
     
     def generate_feedback(
         self,
@@ -53,10 +133,18 @@ class FeedbackService:
             Personalized feedback message
         """
         # Analyze topic-wise performance if results are available
-        topic_analysis = self._analyze_topic_performance(results)
+        is_correct = [bool(r.get("is_correct", False)) for r in results] if results else []
+        topic_analysis = self._analyze_correctness(is_correct)
         
-        # Generate feedback using OpenAI if available
-        if self.client:
+        # Generate feedback using OpenAI if available (boundary scores and
+        # empty attempts get a deterministic message, no LLM call needed)
+        if self.client and not _is_boundary_result(percentage, results):
+            # The prompt is determined by a small keyspace, so cache per score band
+            cache_key = _feedback_cache_key(percentage, passed, topic_analysis, skill_domain)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+            
             try:
                 feedback = self._generate_llm_feedback(
                     score=score,
@@ -67,6 +155,7 @@ class FeedbackService:
                     skill_domain=skill_domain
                 )
                 if feedback and len(feedback.strip()) > 0:
+                    cache.set(cache_key, feedback, ttl_seconds=FEEDBACK_CACHE_TTL)
                     return feedback
                 else:
                     logger.warning("OpenAI returned empty feedback. Using fallback.")
@@ -84,26 +173,113 @@ class FeedbackService:
         )
         return fallback_feedback
     
-    def _analyze_topic_performance(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    async def stream_feedback(
+        self,
+        score: float,
+        max_score: float,
+        percentage: float,
+        passed: bool,
+        results: List[Dict[str, Any]],
+        skill_domain: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream personalized feedback as it is generated
+        
+        Yields LLM tokens as they arrive; cached feedback and the rule-based
+        fallback are yielded as a single chunk.
+        
+        Args:
+            score: Total score achieved
+            max_score: Maximum possible score
+            percentage: Percentage score
+            passed: Whether the assessment was passed
+            results: List of detailed question results
+            skill_domain: Skill/topic name (optional)
+        
+        Yields:
+            Feedback text fragments
+        """
+        is_correct = [bool(r.get("is_correct", False)) for r in results] if results else []
+        topic_analysis = self._analyze_correctness(is_correct)
+        
+        if self.async_client and not _is_boundary_result(percentage, results):
+            cache_key = _feedback_cache_key(percentage, passed, topic_analysis, skill_domain)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+            
+            parts: List[str] = []
+            completed = False
+            try:
+                await openai_limiter.acquire_async()
+                stream = await self.async_client.chat.completions.create(
+                    model=settings.OPENAI_MODEL,
+                    messages=self._build_feedback_messages(
+                        score=score,
+                        max_score=max_score,
+                        percentage=percentage,
+                        passed=passed,
+                        topic_analysis=topic_analysis,
+                        skill_domain=skill_domain
+                    ),
+                    temperature=0.7,
+                    max_tokens=200,
+                    stream=True
+                )
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+                completed = True
+            except Exception as e:
+                logger.warning(f"OpenAI feedback streaming failed: {str(e)}. Using fallback.")
+            
+            feedback = _clean_feedback("".join(parts))
+            if feedback:
+                # A stream cut off mid-message is sent as is but never cached
+                if completed:
+                    cache.set(cache_key, feedback, ttl_seconds=FEEDBACK_CACHE_TTL)
+                return
+            if parts:
+                # Tokens were already sent; don't append a second message
+                return
+        
+        yield self._generate_fallback_feedback(
+            score=score,
+            max_score=max_score,
+            percentage=percentage,
+            passed=passed,
+            topic_analysis=topic_analysis,
+            skill_domain=skill_domain
+        )
+    
+    def _analyze_topic_performance(self, results: List[Dict[str, Any]]) -> TopicStats:
         """Analyze performance by topic/question type"""
         if not results:
-            return {}
+            return TopicStats()
+        return self._analyze_correctness([bool(r.get("is_correct", False)) for r in results])
+    
+    def _analyze_correctness(self, is_correct: Sequence[bool]) -> TopicStats:
+        """
+        Analyze performance from a flat sequence of per-question correctness flags
         
-        total = len(results)
-        correct = sum(1 for r in results if r.get("is_correct", False))
-        accuracy = (correct / total * 100) if total > 0 else 0
+        Args:
+            is_correct: One boolean per question
         
-        # Identify strong and weak areas
-        # For now, we'll use overall accuracy, but this can be extended
-        # to analyze by question difficulty or topic if that data is available
+        Returns:
+            TopicStats (all zeros if there are no questions)
+        """
+        total = len(is_correct)
+        if total == 0:
+            return TopicStats()
         
-        return {
-            "total_questions": total,
-            "correct_answers": correct,
-            "accuracy": accuracy,
-            "strong_areas": [],  # Can be extended with topic analysis
-            "weak_areas": []     # Can be extended with topic analysis
-        }
+        # sum() over bools runs in C, no per-item generator frames
+        correct = sum(is_correct)
+        return TopicStats(total=total, correct=correct, accuracy=correct / total * 100)
     
     def _generate_llm_feedback(
         self,
@@ -111,7 +287,7 @@ class FeedbackService:
         max_score: float,
         percentage: float,
         passed: bool,
-        topic_analysis: Dict[str, Any],
+        topic_analysis: TopicStats,
         skill_domain: Optional[str] = None
     ) -> Optional[str]:
         """Generate feedback using OpenAI API"""
@@ -119,82 +295,64 @@ class FeedbackService:
             return None
         
         try:
-            # Build prompt for feedback generation
-            skill_context = f" in {skill_domain}" if skill_domain else ""
-            accuracy = topic_analysis.get("accuracy", 0)
-            correct = topic_analysis.get("correct_answers", 0)
-            total = topic_analysis.get("total_questions", 0)
-            
-            prompt = f"""Generate a short, personalized, and motivational feedback message for a student who just completed an assessment{skill_context}.
-
-Assessment Results:
-- Score: {score:.1f} out of {max_score:.1f}
-- Percentage: {percentage:.1f}%
-- Status: {'Passed' if passed else 'Needs Improvement'}
-- Correct Answers: {correct} out of {total} questions
-- Accuracy: {accuracy:.1f}%
-
-Requirements:
-1. Start with a motivational message (e.g., "Great job!", "You're improving fast!", "Excellent work!")
-2. Provide positive reinforcement for their performance
-3. If accuracy is below 70%, gently suggest areas to focus on
-4. Always end with encouragement to continue learning
-5. Keep the tone positive, supportive, and student-friendly - never discouraging
-6. Maximum 3-4 sentences
-7. Use emojis sparingly (1-2 max) if appropriate
-
-Generate only the feedback message, no additional text:"""
-
+            openai_limiter.acquire()
             response = self.client.chat.completions.create(
                 model=settings.OPENAI_MODEL,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a supportive and encouraging educational assistant. Generate personalized, positive feedback for students based on their assessment performance. Always maintain an uplifting and motivational tone."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
+                messages=self._build_feedback_messages(
+                    score=score,
+                    max_score=max_score,
+                    percentage=percentage,
+                    passed=passed,
+                    topic_analysis=topic_analysis,
+                    skill_domain=skill_domain
+                ),
                 temperature=0.7,
                 max_tokens=200
             )
             
-            feedback = response.choices[0].message.content.strip()
-            
-            # Clean up feedback (remove quotes if present)
-            if feedback.startswith('"') and feedback.endswith('"'):
-                feedback = feedback[1:-1]
-            if feedback.startswith("'") and feedback.endswith("'"):
-                feedback = feedback[1:-1]
-            
-            return feedback
+            return _clean_feedback(response.choices[0].message.content)
             
         except Exception as e:
             logger.error(f"Error generating LLM feedback: {str(e)}")
             return None
     
+    def _build_feedback_messages(
+        self,
+        score: float,
+        max_score: float,
+        percentage: float,
+        passed: bool,
+        topic_analysis: TopicStats,
+        skill_domain: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        """Build the chat messages for feedback generation"""
+        prompt = _FEEDBACK_PROMPT_TEMPLATE.format(
+            skill_context=f" in {skill_domain}" if skill_domain else "",
+            score=score,
+            max_score=max_score,
+            percentage=percentage,
+            status="Passed" if passed else "Needs Improvement",
+            correct=topic_analysis.correct,
+            total=topic_analysis.total,
+            accuracy=topic_analysis.accuracy
+        )
+        
+        return [
+            _FEEDBACK_SYSTEM_MESSAGE,
+            {"role": "user", "content": prompt}
+        ]
+    
     def _generate_fallback_feedback(
         self,
         score: float,
         max_score: float,
         percentage: float,
         passed: bool,
-        topic_analysis: Dict[str, Any],
+        topic_analysis: TopicStats,
         skill_domain: Optional[str] = None
     ) -> str:
         """Generate fallback feedback using rule-based approach"""
-        skill_context = f" in {skill_domain}" if skill_domain else ""
-        
-        if percentage >= 90:
-            return f" Outstanding work{skill_context}! You've demonstrated excellent understanding and mastery. Keep up this fantastic performance and continue challenging yourself with more advanced topics!"
-        elif percentage >= 80:
-            return f" Great job{skill_context}! You're showing strong comprehension and are on the right track. Keep practicing and you'll master this skill completely soon!"
-        elif percentage >= 70:
-            return f" Good effort{skill_context}! You're making solid progress. Focus on reviewing the areas where you had difficulty, and with continued practice, you'll see even better results next time!"
-        elif percentage >= 60:
-            return f" Nice work{skill_context}! You're improving and getting closer to mastery. Review the questions you missed, focus on those topics, and keep practicing. You're on the right path!"
-        else:
-            return f" Great effort{skill_context}! Every assessment is a learning opportunity. Review the areas where you struggled, focus on understanding the concepts, and keep practicing. You'll get even better results next time!"
-
+        index = bisect_right(_FALLBACK_THRESHOLDS, percentage)
+        if not skill_domain:
+            return _FALLBACK_NO_SKILL[index]
+        return _FALLBACK_TEMPLATES[index].format(skill_context=f" in {skill_domain}")
@@ -0,0 +1,94 @@
+"""
+Shared OpenAI clients
+One sync and one async client per process, so all services reuse the same connection pools
+"""
+
+from functools import lru_cache
+from typing import Optional
+import importlib.util
+import random
+import httpx
+from openai import OpenAI, AsyncOpenAI, APIConnectionError, APIStatusError, RateLimitError
+from app.config import settings
+from app.utils.logger import logger
+
+# Connection pool limits for the underlying HTTP clients
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+# Multiplex concurrent requests over HTTP/2 when the optional h2 package is installed
+HTTP2_ENABLED = importlib.util.find_spec("h2") is not None
+
+# Retry policy for transient OpenAI failures (429 / 5xx / connection errors)
+MAX_RETRY_ATTEMPTS = 5
+MAX_RETRY_DELAY = 30.0
+
+
+def retry_delay(error: Exception, attempt: int) -> Optional[float]:
+    """
+    Get the delay before retrying a failed OpenAI call
+    
+    Args:
+        error: Exception raised by the OpenAI client
+        attempt: Zero-based attempt number that failed
+    
+    Returns:
+        Seconds to wait, or None if the error is not retryable
+    """
+    if isinstance(error, APIStatusError):
+        if not isinstance(error, RateLimitError) and error.status_code < 500:
+            return None
+        retry_after = error.response.headers.get("retry-after") if error.response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), MAX_RETRY_DELAY)
+            except ValueError:
+                pass
+    elif not isinstance(error, APIConnectionError):
+        return None
+    return min(2 ** attempt + random.random() * 0.5, MAX_RETRY_DELAY)
+
+
+def _api_key_configured() -> bool:
+    """Check that a real OpenAI API key is set"""
+    return bool(settings.OPENAI_API_KEY) and "your-openai" not in settings.OPENAI_API_KEY
+
+
+@lru_cache(maxsize=1)
+def get_openai_client() -> Optional[OpenAI]:
+    """
+    Get the shared sync OpenAI client
+    
+    Returns:
+        OpenAI client or None if the API key is not configured
+    """
+    if not _api_key_configured():
+        return None
+    try:
+        return OpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=httpx.Client(http2=HTTP2_ENABLED, timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+        )
+    except Exception as e:
+        logger.error(f"Error initializing OpenAI client: {str(e)}")
+        return None
+
+
+@lru_cache(maxsize=1)
+def get_async_openai_client() -> Optional[AsyncOpenAI]:
+    """
+    Get the shared async OpenAI client
+    
+    Returns:
+        AsyncOpenAI client or None if the API key is not configured
+    """
+    if not _api_key_configured():
+        return None
+    try:
+        return AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=httpx.AsyncClient(http2=HTTP2_ENABLED, timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+        )
+    except Exception as e:
+        logger.error(f"Error initializing async OpenAI client: {str(e)}")
+        return None
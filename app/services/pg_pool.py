@@ -0,0 +1,127 @@
+"""
+Direct Postgres connection pool for hot read paths
+Bypasses the PostgREST HTTP/JSON layer when SUPABASE_DB_URL is configured
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+from threading import Lock
+import time
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+from app.config import settings
+from app.utils.logger import logger
+
+# Connections older than this are closed instead of being reused
+CONNECTION_MAX_AGE = 1800  # seconds
+# After a failure to connect, don't retry the pool for this long
+RETRY_AFTER_FAILURE = 60  # seconds
+
+
+class PostgresPool:
+    """Lazily created psycopg2 pool; every failure falls back to PostgREST"""
+    
+    def __init__(self, dsn: Optional[str]):
+        """
+        Initialize pool wrapper
+        
+        Args:
+            dsn: Postgres connection string (None disables direct queries)
+        """
+        self.dsn = dsn
+        self._pool: Optional[ThreadedConnectionPool] = None
+        self._lock = Lock()
+        self._opened_at: Dict[int, float] = {}
+        self._failed_at: Optional[float] = None
+    
+    @property
+    def enabled(self) -> bool:
+        """Whether direct queries can be attempted"""
+        if not self.dsn:
+            return False
+        return self._failed_at is None or time.monotonic() - self._failed_at > RETRY_AFTER_FAILURE
+    
+    def _get_pool(self) -> Optional[ThreadedConnectionPool]:
+        """Create the pool on first use"""
+        if self._pool is not None:
+            return self._pool
+        with self._lock:
+            if self._pool is None:
+                try:
+                    self._pool = ThreadedConnectionPool(
+                        settings.SUPABASE_DB_POOL_MIN,
+                        settings.SUPABASE_DB_POOL_MAX,
+                        dsn=self.dsn,
+                        connect_timeout=5
+                    )
+                    self._failed_at = None
+                    logger.info("Direct Postgres pool initialized")
+                except Exception as e:
+                    self._failed_at = time.monotonic()
+                    logger.warning(f"Direct Postgres pool unavailable, using PostgREST: {str(e)}")
+            return self._pool
+    
+    def fetch_json(self, sql: str, params: Sequence[Any] = ()) -> Optional[List[Dict[str, Any]]]:
+        """
+        Run a query whose single column is a JSON object per row
+        
+        Selecting row_to_json(...) keeps values in the same JSON form
+        PostgREST returns (UUIDs and timestamps as strings).
+        
+        Args:
+            sql: Query returning one json column
+            params: Query parameters
+        
+        Returns:
+            List of row dicts, or None if the pool is unavailable or the query failed
+        """
+        if not self.enabled:
+            return None
+        pool = self._get_pool()
+        if pool is None:
+            return None
+        
+        conn = None
+        broken = False
+        try:
+            conn = pool.getconn()
+            opened = self._opened_at.setdefault(id(conn), time.monotonic())
+            if conn.closed or time.monotonic() - opened > CONNECTION_MAX_AGE:
+                # Recycle old or dead connections before use
+                pool.putconn(conn, close=True)
+                self._opened_at.pop(id(conn), None)
+                conn = pool.getconn()
+                self._opened_at[id(conn)] = time.monotonic()
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                rows = [row[0] for row in cur.fetchall()]
+            conn.rollback()  # Read-only; end the implicit transaction
+            return rows
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            broken = True
+            logger.warning(f"Direct Postgres connection error, using PostgREST: {str(e)[:100]}")
+            return None
+        except Exception as e:
+            logger.warning(f"Direct Postgres query failed, using PostgREST: {str(e)[:100]}")
+            if conn is not None:
+                try:
+                    conn.rollback()
+                except Exception:
+                    broken = True
+            return None
+        finally:
+            if conn is not None:
+                if broken:
+                    self._opened_at.pop(id(conn), None)
+                pool.putconn(conn, close=broken)
+    
+    def close(self) -> None:
+        """Close all pooled connections"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+                self._opened_at.clear()
+
+
+# Global pool instance
+pg_pool = PostgresPool(settings.SUPABASE_DB_URL)
@@ -4,6 +4,7 @@ Service for managing user profiles - simplified for single test user
 
 from typing import Optional
 from uuid import UUID
+from threading import Lock
 from app.services.supabase_service import supabase_service
 from app.utils.logger import logger
 
@@ -12,20 +13,55 @@ TEST_USER_EMAIL = "test_user@skillcapital.ai"
 TEST_USER_NAME = "Skill Capital Test User"
 TEST_USER_ROLE = "student"
 
+# The test user is immutable at runtime, so it is resolved once per process
+_cached_test_user_id: Optional[UUID] = None
+_test_user_lock = Lock()
+
+
+def invalidate_test_user_cache() -> None:
+    """Forget the cached test user ID so the next lookup resolves it again"""
+    global _cached_test_user_id
+    with _test_user_lock:
+        _cached_test_user_id = None
+
 
 def ensure_default_test_user() -> Optional[UUID]:
     """
     Ensure the single default test user profile exists in the database.
     This is the ONLY user used for all Skill Assessment operations.
     
+    The UUID is cached once the test user row is found or created. The
+    fallback profile used when that fails is returned but never cached, so
+    the test user is looked up again on the next call.
+    
+    Returns:
+        UUID of the test user profile (or a fallback profile), or None if none exists
+    """
+    global _cached_test_user_id
+    if _cached_test_user_id is not None:
+        return _cached_test_user_id
+    
+    with _test_user_lock:
+        # Another thread may have resolved it while we waited
+        if _cached_test_user_id is None:
+            _cached_test_user_id = _resolve_test_user()
+        if _cached_test_user_id is not None:
+            return _cached_test_user_id
+    
+    return _fallback_profile_id()
+
+
+def _resolve_test_user() -> Optional[UUID]:
+    """
+    Look up (or create) the default test user profile.
+    
     Strategy:
     1. Check for test user by email (test_user@skillcapital.ai)
     2. If found, return its UUID
     3. If not found, try to create it using an existing auth.user ID
-    4. If creation fails, try to use any existing profile as fallback
     
     Returns:
-        UUID of the test user profile, or None if creation failed
+        UUID of the test user profile, or None if it could not be found or created
     """
     try:
         client = supabase_service.get_client()
@@ -48,41 +84,8 @@ def ensure_default_test_user() -> Optional[UUID]:
             logger.warning(f"⚠️  Error checking for test user: {str(e)}")
         
         # Step 2: Test user doesn't exist - try to create it
-        
-        # Strategy: Use SQL to create the profile using any existing auth.user ID
-        # This bypasses the need to know the auth.user ID upfront
         try:
-            # Strategy 1: Try to create via SQL using any existing auth.user ID
-            # This SQL will use any existing auth.user ID from auth.users table
-            sql_insert = f"""
-                INSERT INTO profiles (id, email, full_name, role, organization)
-                SELECT 
-                    id,
-                    '{TEST_USER_EMAIL}',
-                    '{TEST_USER_NAME}',
-                    '{TEST_USER_ROLE}',
-                    'Skill Capital'
-                FROM auth.users
-                WHERE id NOT IN (SELECT id FROM profiles WHERE id IS NOT NULL)
-                LIMIT 1
-                ON CONFLICT (id) DO UPDATE
-                SET email = EXCLUDED.email,
-                    full_name = EXCLUDED.full_name,
-                    role = EXCLUDED.role,
-                    organization = EXCLUDED.organization
-                RETURNING id;
-            """
-            
-            # Try to execute SQL via RPC (requires a custom function in Supabase)
-            # If that doesn't work, we'll try the direct insert method below
-            try:
-                # Note: This requires a custom RPC function in Supabase
-                # For now, we'll skip this and use direct insert
-                pass
-            except Exception:
-                pass
-            
-            # Strategy 2: Try to get any existing auth.user ID from existing profiles
+            # Strategy: Try to get any existing auth.user ID from existing profiles
             # Since profiles.id references auth.users.id, existing profile IDs are valid auth.user IDs
             existing_profiles = client.table("profiles").select("id").limit(1).execute()
             auth_user_id = None
@@ -114,15 +117,7 @@ def ensure_default_test_user() -> Optional[UUID]:
                         if profile_data:
                             auth_user_id = profile_data.get("id")
                             if auth_user_id:
-                                # Verify and return
-                                verify_response = client.table("profiles")\
-                                    .select("*")\
-                                    .eq("email", TEST_USER_EMAIL)\
-                                    .limit(1)\
-                                    .execute()
-                                if verify_response.data:
-                                    profile_id = verify_response.data[0].get("id")
-                                    return UUID(profile_id) if profile_id else None
+                                return UUID(auth_user_id)
                 except Exception as rpc_error:
                     # RPC function doesn't exist - that's okay, continue with SQL approach
                     auth_user_id = None
@@ -171,23 +166,10 @@ def ensure_default_test_user() -> Optional[UUID]:
             try:
                 profile_response = client.table("profiles").insert(test_profile_data).execute()
                 if profile_response.data and len(profile_response.data) > 0:
-                    profile_id = UUID(profile_response.data[0].get("id"))
-                    
-                    # Verify the creation by fetching again
-                    verify_response = client.table("profiles")\
-                        .select("*")\
-                        .eq("email", TEST_USER_EMAIL)\
-                        .limit(1)\
-                        .execute()
-                    
-                    if verify_response.data and len(verify_response.data) > 0:
-                        profile_data = verify_response.data[0]
-                        success_msg = f"✅ Default test user created successfully in Supabase"
-                        return profile_id
-                    else:
-                        logger.error("❌ Profile created but verification failed - profile not found in database")
-                        return None
-                        
+                    # The insert returns the created row, no need to re-select it
+                    logger.info(f"✅ Default test user created in Supabase: {TEST_USER_EMAIL}")
+                    return UUID(profile_response.data[0].get("id"))
+                
             except Exception as insert_error:
                 error_msg = str(insert_error).lower()
                 if "unique" in error_msg or "duplicate" in error_msg or "conflict" in error_msg or "violates unique constraint" in error_msg:
@@ -200,19 +182,34 @@ def ensure_default_test_user() -> Optional[UUID]:
                             .execute()
                         if test_user_response.data and len(test_user_response.data) > 0:
                             profile_id = test_user_response.data[0].get("id")
-                            success_msg = f"✅ Test user already exists in Supabase: {TEST_USER_EMAIL}"
                             return UUID(profile_id) if profile_id else None
                     except Exception:
                         pass
                 
                 logger.error(f"❌ Could not create test user: {str(insert_error)}")
                 logger.error(f"   Error details: {type(insert_error).__name__}: {insert_error}")
-                # Fall through to use existing profile as fallback
         except Exception as create_error:
             logger.warning(f"Could not create test user: {str(create_error)}")
-            # Fall through to use existing profile
         
-        # Fallback: Use any existing profile (if test user creation failed)
+        return None
+        
+    except Exception as e:
+        logger.exception(f"❌ Error in ensure_default_test_user: {str(e)}")
+        return None
+
+
+def _fallback_profile_id() -> Optional[UUID]:
+    """
+    Use any existing profile when the test user could not be found or created.
+    
+    Returns:
+        UUID of an existing profile, or None if the profiles table is empty
+    """
+    try:
+        client = supabase_service.get_client()
+        if not client:
+            return None
+        
         try:
             existing_profiles = client.table("profiles").select("id").limit(1).execute()
             if existing_profiles.data and len(existing_profiles.data) > 0:
@@ -233,9 +230,7 @@ def ensure_default_test_user() -> Optional[UUID]:
         return None
         
     except Exception as e:
-        logger.error(f"❌ Error in ensure_default_test_user: {str(e)}")
-        import traceback
-        logger.error(traceback.format_exc())
+        logger.exception(f"❌ Error resolving fallback profile: {str(e)}")
         return None
 
 
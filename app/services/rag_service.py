@@ -3,12 +3,302 @@ RAG (Retrieval-Augmented Generation) service
 Handles similarity search and context-aware question/answer generation
 """
 
-from typing import List, Dict, Any, Optional
-from openai import OpenAI
+from typing import AsyncIterator, Callable, Iterator, List, Dict, Any, Optional, Final, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from contextvars import ContextVar
+from hashlib import blake2b
+import asyncio
+import heapq
+import operator
+import re
+import uuid
+import orjson
 from app.config import settings
+from app.services.openai_client import get_openai_client, get_async_openai_client, retry_delay, MAX_RETRY_ATTEMPTS
 from app.services.supabase_service import supabase_service
 from app.services.embedding_service import embedding_service
+from app.services.background_writer import background_writer
+from app.utils.cache import SemanticCache
 from app.utils.logger import logger
+from app.utils.rate_limit import openai_limiter
+
+# System prompts
+_QUESTION_SYSTEM_PROMPT: Final = "You are an expert question generator. Always respond with valid JSON only."
+_ANSWER_SYSTEM_PROMPT: Final = "You are a helpful assistant that answers questions based on provided context from videos and documents."
+_QUESTION_SYSTEM_MESSAGE: Final = {"role": "system", "content": _QUESTION_SYSTEM_PROMPT}
+_ANSWER_SYSTEM_MESSAGE: Final = {"role": "system", "content": _ANSWER_SYSTEM_PROMPT}
+
+# Question generation prompts ({num}, {diff}, {ctx} are filled per call)
+_MCQ_PROMPT_TMPL: Final = """Based on the following context from videos and documents, generate {num} multiple-choice question(s) at {diff} difficulty level.
+
+Context:
+{ctx}
+
+For each question, provide:
+1. Question text
+2. Four options (A, B, C, D)
+3. Correct answer (A, B, C, or D)
+4. Brief explanation
+
+Format as JSON array with this structure:
+[
+  {{
+    "question": "Question text here",
+    "options": ["Option A", "Option B", "Option C", "Option D"],
+    "correct_answer": "A",
+    "explanation": "Brief explanation"
+  }}
+]
+"""
+
+_DESC_PROMPT_TMPL: Final = """Based on the following context from videos and documents, generate {num} descriptive/open-ended question(s) at {diff} difficulty level.
+
+Context:
+{ctx}
+
+For each question, provide:
+1. Question text
+2. Suggested answer points or rubric
+
+Format as JSON array with this structure:
+[
+  {{
+    "question": "Question text here",
+    "suggested_answer": "Key points that should be covered in the answer",
+    "rubric": {{
+      "max_points": 10,
+      "criteria": ["Criterion 1", "Criterion 2"]
+    }}
+  }}
+]
+"""
+
+_GEN_PROMPT_TMPL: Final = """Based on the following context from videos and documents, generate {num} question(s) at {diff} difficulty level.
+
+Context:
+{ctx}
+
+Format as JSON array with this structure:
+[
+  {{
+    "question": "Question text here",
+    "type": "mcq or descriptive",
+    "options": ["Option A", "Option B", "Option C", "Option D"] (if MCQ),
+    "correct_answer": "A or answer text",
+    "explanation": "Brief explanation"
+  }}
+]
+"""
+
+_PROMPT_TMPLS: Final = {
+    "mcq": _MCQ_PROMPT_TMPL,
+    "descriptive": _DESC_PROMPT_TMPL,
+    "general": _GEN_PROMPT_TMPL
+}
+
+_ANSWER_PROMPT_TMPL: Final = """Based on the following context from videos and documents, answer the user's question.
+
+Context:
+{ctx}
+
+Question: {question}
+
+Provide a comprehensive answer based on the context. If the context doesn't contain enough information, say so."""
+
+# Body of a ```json ... ``` (or bare ```) fence in an LLM response
+_JSON_FENCE_RE: Final = re.compile(r'```(?:json)?\s*([\s\S]*?)\s*```')
+
+# Context formatting: number of chunks included and per-chunk layout
+@dataclass(slots=True, frozen=True)
+class Chunk:
+    """Normalized video/PDF chunk returned by similarity search"""
+    id: Optional[str]
+    source_type: str
+    source_id: Optional[str]
+    source_name: Optional[str]
+    chunk_text: Optional[str]
+    chunk_index: Optional[int]
+    similarity: Optional[float]
+    page_number: Optional[int] = None
+    start_time: Optional[float] = None
+    end_time: Optional[float] = None
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """Dict-style field access, so callers can treat chunks and raw rows alike"""
+        return getattr(self, key, default)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to a plain dict (e.g. for JSON responses)"""
+        return asdict(self)
+
+
+# Similarity search result: a normalized Chunk, or a raw match_unified_embeddings row
+ChunkRecord = Union[Chunk, Dict[str, Any]]
+
+MAX_CONTEXT_CHUNKS: Final = 10
+MAX_CONTEXT_TOKENS: Final = 2000
+_CONTEXT_CHUNK_FORMAT: Final = "[%s - %s]\n%s"
+
+
+def _pack_context(context_chunks: List[ChunkRecord], max_tokens: int = MAX_CONTEXT_TOKENS) -> Iterator[str]:
+    """
+    Yield formatted context chunks, skipping duplicates, within a token budget
+    
+    Chunks are taken in ranking order. Chunks whose text was already seen are
+    skipped, and packing stops before the running total would exceed the
+    budget (the first chunk is always included).
+    
+    Args:
+        context_chunks: Chunks in ranking order
+        max_tokens: Approximate prompt token budget for the context
+    
+    Yields:
+        Formatted chunk strings
+    """
+    seen = set()
+    used = 0
+    packed = 0
+    for chunk in context_chunks:
+        text = chunk.get('chunk_text', '')
+        digest = blake2b(text.encode(), digest_size=8).digest()
+        if digest in seen:
+            continue
+        seen.add(digest)
+        
+        formatted = _CONTEXT_CHUNK_FORMAT % (
+            chunk.get('source_type', 'unknown').upper(),
+            chunk.get('source_name', 'source'),
+            text
+        )
+        tokens = len(formatted) // 4 + 1  # ~4 characters per token
+        if packed and used + tokens > max_tokens:
+            return
+        used += tokens
+        packed += 1
+        yield formatted
+        if packed >= MAX_CONTEXT_CHUNKS:
+            return
+
+
+def _format_context(context_chunks: List[ChunkRecord]) -> str:
+    """Join the top distinct context chunks into a single prompt section"""
+    return "\n\n".join(_pack_context(context_chunks))
+
+
+# Answer source entries: output key <- chunk field
+_SOURCE_KEYS: Final = ('type', 'id', 'name', 'similarity')
+_SOURCE_FIELDS: Final = ('source_type', 'source_id', 'source_name', 'similarity')
+_get_source_fields = operator.attrgetter(*_SOURCE_FIELDS)
+
+
+def _format_sources(context_chunks: List[ChunkRecord], limit: int = 5) -> List[Dict[str, Any]]:
+    """Build the answer's source list from the top context chunks"""
+    return [
+        dict(zip(
+            _SOURCE_KEYS,
+            _get_source_fields(c) if isinstance(c, Chunk) else tuple(map(c.get, _SOURCE_FIELDS))
+        ))
+        for c in context_chunks[:limit]
+    ]
+
+
+def _compact_vector(vector: List[float]) -> List[float]:
+    """
+    Round a query vector to float32 precision for transport
+    
+    pgvector stores float32, and 9 significant digits round-trip any float32
+    exactly; the digits dropped beyond that are discarded server-side anyway,
+    which shortens the serialized query payload sent with every similarity RPC.
+    """
+    return [float("%.9g" % x) for x in vector]
+
+
+def _parse_questions(content: str) -> List[Dict[str, Any]]:
+    """
+    Parse the JSON question payload from an LLM response
+    
+    Args:
+        content: Raw response text (may be wrapped in a markdown code block)
+    
+    Returns:
+        List of question dicts
+    
+    Raises:
+        orjson.JSONDecodeError: If the payload is not valid JSON
+    """
+    # Extract JSON from a markdown code block if present
+    fence = _JSON_FENCE_RE.search(content)
+    if fence:
+        content = fence.group(1)
+    
+    questions = orjson.loads(content)
+    
+    # Ensure it's a list
+    if not isinstance(questions, list):
+        questions = [questions]
+    return questions
+
+
+# match_documents column names: (current, legacy) for source_id, source_name, chunk_text, chunk_index
+_PDF_COLUMN_CANDIDATES: Final = (
+    ('pdf_id', 'document_id'),
+    ('pdf_title', 'document_name'),
+    ('content', 'chunk_text'),
+    ('chunk_id', 'chunk_index'),
+)
+
+
+def _pdf_row_getter(row: Dict[str, Any]) -> Callable[[Dict[str, Any]], Tuple[Any, ...]]:
+    """
+    Build a getter for the match_documents columns present in a sample row
+    
+    The RPC returns the same columns for every row, so the live schema is
+    probed once and each row is then read with a single itemgetter call.
+    
+    Args:
+        row: First row of an RPC response
+    
+    Returns:
+        Callable returning (id, source_id, source_name, chunk_text,
+        chunk_index, page_number, similarity) for a row
+    """
+    keys = (
+        'id',
+        *(current if current in row else legacy for current, legacy in _PDF_COLUMN_CANDIDATES),
+        'page_number',
+        'similarity'
+    )
+    if all(key in row for key in keys):
+        return operator.itemgetter(*keys)
+    # Some columns are absent entirely - read with defaults instead
+    return lambda c: tuple(c.get(key) for key in keys)
+
+
+# Index of the match_unified_embeddings signature that filters by source_id in SQL
+UNIFIED_SIGNATURE_FILTERED: Final = 0
+
+# Worker threads for issuing fallback RPCs concurrently
+_rpc_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rag-rpc")
+
+# Shared semantic cache for similarity search results
+search_cache = SemanticCache(
+    max_entries=settings.RAG_SEARCH_CACHE_SIZE,
+    threshold=settings.RAG_SEARCH_CACHE_THRESHOLD,
+    ttl_seconds=600  # 10 minutes
+)
+
+# (query text, embedding) computed by the most recent search in this context,
+# so store_user_query can reuse it instead of embedding the text again
+_last_query_embedding: ContextVar[Optional[Tuple[str, List[float]]]] = ContextVar(
+    "_last_query_embedding", default=None
+)
+
+# Exact-match cache for generated answers (question + top chunk ids)
+answer_cache = SemanticCache(
+    max_entries=settings.RAG_ANSWER_CACHE_SIZE,
+    ttl_seconds=settings.RAG_ANSWER_CACHE_TTL
+)
 
 
 class RAGService:
@@ -17,19 +307,20 @@ class RAGService:
     def __init__(self):
         """Initialize RAG service"""
         self.client = None
+        self.async_client = None
+        # Resolved RPC capabilities (None until the first call decides)
+        self._unified_signature: Optional[int] = None
+        self._unified_available: Optional[bool] = None
+        self._match_documents_available: Optional[bool] = None
+        self._pdf_row_getter: Optional[Callable[[Dict[str, Any]], Tuple[Any, ...]]] = None
         self._initialize_openai_client()
     
     def _initialize_openai_client(self):
-        """Initialize OpenAI client"""
-        try:
-            if settings.OPENAI_API_KEY and "your-openai" not in settings.OPENAI_API_KEY:
-                self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-            else:
-                logger.warning("OpenAI API key not configured. RAG features will not work.")
-                self.client = None
-        except Exception as e:
-            logger.error(f"Error initializing OpenAI client: {str(e)}")
-            self.client = None
+        """Attach the shared sync and async OpenAI clients"""
+        self.client = get_openai_client()
+        self.async_client = get_async_openai_client()
+        if not self.client:
+            logger.warning("OpenAI API key not configured. RAG features will not work.")
     
     def search_similar_chunks(
         self,
@@ -38,7 +329,7 @@ class RAGService:
         source_id: Optional[str] = None,  # Video ID or document ID
         match_threshold: float = 0.7,
         match_count: int = 10
-    ) -> List[Dict[str, Any]]:
+    ) -> List[ChunkRecord]:
         """
         Search for similar chunks using vector similarity
         
@@ -52,153 +343,65 @@ class RAGService:
         Returns:
             List of similar chunks with metadata
         """
+        # Repeated or near-duplicate queries with the same search parameters
+        # are served from the semantic cache (no embedding call, no RPC);
+        # the exact key ignores case and whitespace ("React" / " react ")
+        scope = f"{source_type}|{source_id}|{match_threshold}|{match_count}"
+        cache_key = search_cache.make_key(scope, " ".join(query_text.split()).casefold())
+        cached = search_cache.get_exact(cache_key)
+        if cached is not None:
+            return list(cached)
+        
         try:
             # Generate query embedding
             query_embedding = embedding_service.generate_embedding(query_text)
             if not query_embedding:
                 logger.error("Failed to generate query embedding")
                 return []
+            _last_query_embedding.set((query_text, query_embedding))
+            
+            cached = search_cache.get_similar(scope, query_embedding)
+            if cached is not None:
+                return list(cached)
+            
+            chunks = self._search_by_embedding(
+                _compact_vector(query_embedding), source_type, source_id, match_threshold, match_count
+            )
+            if chunks:
+                search_cache.set(cache_key, scope, query_embedding, chunks)
+            return chunks
             
+        except Exception as e:
+            logger.error(f"Error searching similar chunks: {str(e)}")
+            return []
+    
+    def _search_by_embedding(
+        self,
+        query_embedding: List[float],
+        source_type: Optional[str],
+        source_id: Optional[str],
+        match_threshold: float,
+        match_count: int
+    ) -> List[ChunkRecord]:
+        """Run the vector similarity RPC for an already computed query embedding"""
+        try:
             client = supabase_service.get_client()
             if not client:
                 logger.error("Supabase client not available")
                 return []
             
-            # Use unified search function
             if source_type is None:
                 # Search both video and PDF
-                # Note: Function signature may vary - try with all parameters first
-                try:
-                    response = client.rpc(
-                        'match_unified_embeddings',
-                        {
-                            'query_embedding': str(query_embedding),
-                            'match_threshold': match_threshold,
-                            'match_count': match_count,
-                            'source_type': source_type
-                        }
-                    ).execute()
-                except Exception as rpc_error:
-                    # If parameter error, try without source_type (may not be in function signature)
-                    error_msg = str(rpc_error).lower()
-                    if 'parameter' in error_msg or 'function' in error_msg or 'pgrst' in error_msg:
-                        logger.warning(f"RPC call with source_type failed, trying without: {str(rpc_error)[:100]}")
-                        try:
-                            response = client.rpc(
-                                'match_unified_embeddings',
-                                {
-                                    'query_embedding': str(query_embedding),
-                                    'match_threshold': match_threshold,
-                                    'match_count': match_count
-                                }
-                            ).execute()
-                        except Exception as rpc_error2:
-                            # Try with just required parameters (match_count, query_embedding)
-                            logger.warning(f"RPC call failed, trying minimal parameters: {str(rpc_error2)[:100]}")
-                            response = client.rpc(
-                                'match_unified_embeddings',
-                                {
-                                    'match_count': match_count,
-                                    'query_embedding': str(query_embedding),
-                                    'match_threshold': match_threshold
-                                }
-                            ).execute()
-                    else:
-                        raise
-                
-                chunks = response.data if response.data else []
-                
-                # Filter by source_id if provided
-                if source_id:
-                    chunks = [c for c in chunks if c.get('source_id') == source_id]
-                
-                return chunks
+                return self._match_both(client, query_embedding, source_id, match_threshold, match_count)
                 
             elif source_type == 'video':
                 # Search only video embeddings
-                response = client.rpc(
-                    'match_video_embeddings',
-                    {
-                        'query_embedding': str(query_embedding),
-                        'match_threshold': match_threshold,
-                        'match_count': match_count,
-                        'filter_video_id': source_id
-                    }
-                ).execute()
-                
-                chunks = response.data if response.data else []
-                
-                # Convert to unified format
-                return [{
-                    'id': c.get('id'),
-                    'source_type': 'video',
-                    'source_id': c.get('video_id'),
-                    'source_name': c.get('video_title', c.get('video_id')),
-                    'chunk_text': c.get('chunk_text'),
-                    'chunk_index': c.get('chunk_index'),
-                    'start_time': c.get('start_time'),
-                    'end_time': c.get('end_time'),
-                    'similarity': c.get('similarity')
-                } for c in chunks]
+                return self._match_video(client, query_embedding, source_id, match_threshold, match_count)
                 
             elif source_type == 'pdf':
                 # Search only PDF embeddings
                 # Note: Use pdf_id instead of document_id, and handle both column name variations
-                filter_doc_id = source_id if source_id else None
-                
-                # Try RPC function first, but fallback to direct query if RPC fails
-                try:
-                    response = client.rpc(
-                        'match_documents',
-                        {
-                            'query_embedding': str(query_embedding),
-                            'match_threshold': match_threshold,
-                            'match_count': match_count,
-                            'filter_document_id': filter_doc_id
-                        }
-                    ).execute()
-                    
-                    chunks = response.data if response.data else []
-                    
-                    # Convert to unified format - handle both old and new column names
-                    return [{
-                        'id': c.get('id'),
-                        'source_type': 'pdf',
-                        # Handle both pdf_id and document_id (RPC might return either)
-                        'source_id': c.get('pdf_id') or c.get('document_id'),
-                        # Handle both pdf_title and document_name
-                        'source_name': c.get('pdf_title') or c.get('document_name'),
-                        # Handle both content and chunk_text
-                        'chunk_text': c.get('content') or c.get('chunk_text'),
-                        'chunk_index': c.get('chunk_id') or c.get('chunk_index'),
-                        'page_number': c.get('page_number'),
-                        'similarity': c.get('similarity')
-                    } for c in chunks]
-                except Exception as rpc_error:
-                    # Fallback: Direct query to pdf_embeddings table
-                    logger.warning(f"RPC match_documents failed, using direct query: {str(rpc_error)[:100]}")
-                    query = client.table("pdf_embeddings")\
-                        .select("id, content, pdf_id, pdf_title, chunk_id, page_number")\
-                        .limit(match_count)
-                    
-                    if filter_doc_id:
-                        query = query.eq("pdf_id", filter_doc_id)
-                    
-                    response = query.execute()
-                    chunks = response.data if response.data else []
-                    
-                    # For direct query, we need to calculate similarity manually or use a simpler approach
-                    # For now, return chunks with similarity = 1.0 (we can't calculate without embedding)
-                    return [{
-                        'id': c.get('id'),
-                        'source_type': 'pdf',
-                        'source_id': c.get('pdf_id'),
-                        'source_name': c.get('pdf_title'),
-                        'chunk_text': c.get('content'),
-                        'chunk_index': c.get('chunk_id'),
-                        'page_number': c.get('page_number'),
-                        'similarity': 1.0  # Placeholder since we can't calculate without vector search
-                    } for c in chunks]
+                return self._match_pdf(client, query_embedding, source_id, match_threshold, match_count)
             
             return []
             
@@ -206,9 +409,253 @@ class RAGService:
             logger.error(f"Error searching similar chunks: {str(e)}")
             return []
     
+    def _match_both(
+        self,
+        client,
+        query_embedding: List[float],
+        source_id: Optional[str],
+        match_threshold: float,
+        match_count: int
+    ) -> List[ChunkRecord]:
+        """
+        Search video and PDF embeddings together
+        
+        match_unified_embeddings is tried first while it is available. If the
+        function is missing, the video and PDF searches run concurrently from
+        then on and their results are merged by similarity. PDF rows from the
+        direct-query fallback have no real score and only fill slots left
+        after the ranked matches.
+        """
+        if self._unified_available is not False:
+            try:
+                response = self._match_unified(client, query_embedding, source_id, match_threshold, match_count)
+                self._unified_available = True
+                chunks = response.data if response.data else []
+                
+                # Filter by source_id if the deployed function couldn't do it
+                if source_id and self._unified_signature != UNIFIED_SIGNATURE_FILTERED:
+                    chunks = [c for c in chunks if c.get('source_id') == source_id]
+                
+                return chunks
+            except Exception as rpc_error:
+                logger.warning(f"match_unified_embeddings failed, searching video and PDF separately: {str(rpc_error)[:100]}")
+                error_msg = str(rpc_error).lower()
+                if 'function' in error_msg or '404' in error_msg or 'pgrst' in error_msg:
+                    # Missing function - don't retry it on later calls
+                    self._unified_available = False
+        
+        # Video RPC on a worker thread, PDF search (which may fan out itself) on this one
+        video_future = _rpc_executor.submit(
+            self._match_video, client, query_embedding, source_id, match_threshold, match_count
+        )
+        try:
+            pdf_chunks = self._match_pdf(
+                client, query_embedding, source_id, match_threshold, match_count, unranked_similarity=None
+            )
+        except Exception as e:
+            logger.warning(f"PDF similarity search failed: {str(e)[:100]}")
+            pdf_chunks = []
+        try:
+            video_chunks = video_future.result()
+        except Exception as e:
+            logger.warning(f"Video similarity search failed: {str(e)[:100]}")
+            video_chunks = []
+        
+        ranked = [c for c in video_chunks + pdf_chunks if c.similarity is not None]
+        unranked = [c for c in pdf_chunks if c.similarity is None]
+        merged = heapq.nlargest(match_count, ranked, key=lambda c: c.similarity)
+        return merged + unranked[:match_count - len(merged)]
+    
+    def _match_video(
+        self,
+        client,
+        query_embedding: List[float],
+        source_id: Optional[str],
+        match_threshold: float,
+        match_count: int
+    ) -> List[Chunk]:
+        """Search video embeddings via match_video_embeddings"""
+        response = client.rpc(
+            'match_video_embeddings',
+            {
+                'query_embedding': query_embedding,
+                'match_threshold': match_threshold,
+                'match_count': match_count,
+                'filter_video_id': source_id
+            }
+        ).execute()
+        
+        chunks = response.data if response.data else []
+        
+        # Convert to unified format
+        return [Chunk(
+            id=c.get('id'),
+            source_type='video',
+            source_id=c.get('video_id'),
+            source_name=c.get('video_title', c.get('video_id')),
+            chunk_text=c.get('chunk_text'),
+            chunk_index=c.get('chunk_index'),
+            start_time=c.get('start_time'),
+            end_time=c.get('end_time'),
+            similarity=c.get('similarity')
+        ) for c in chunks]
+    
+    def _match_unified(
+        self,
+        client,
+        query_embedding: List[float],
+        source_id: Optional[str],
+        match_threshold: float,
+        match_count: int
+    ):
+        """
+        Call match_unified_embeddings, resolving its signature once
+        
+        The deployed function may accept filter_source_id (filtering happens
+        in SQL before ranking), only source_type, or neither. On the first
+        call all signatures are tried concurrently and the winner is
+        remembered, so later calls issue a single RPC.
+        """
+        params = {
+            'query_embedding': query_embedding,
+            'match_threshold': match_threshold,
+            'match_count': match_count
+        }
+        candidates = [
+            {**params, 'source_type': None, 'filter_source_id': source_id},
+            {**params, 'source_type': None},
+            params
+        ]
+        
+        rpc = client.rpc
+        if self._unified_signature is not None:
+            return rpc('match_unified_embeddings', candidates[self._unified_signature]).execute()
+        
+        futures = [
+            _rpc_executor.submit(lambda p=p: rpc('match_unified_embeddings', p).execute())
+            for p in candidates
+        ]
+        first_error = None
+        # Take the first success in priority order
+        for index, future in enumerate(futures):
+            try:
+                response = future.result()
+            except Exception as rpc_error:
+                logger.warning(f"match_unified_embeddings signature {index} failed: {str(rpc_error)[:100]}")
+                first_error = first_error or rpc_error
+                continue
+            self._unified_signature = index
+            return response
+        raise first_error
+    
+    def _match_pdf(
+        self,
+        client,
+        query_embedding: List[float],
+        source_id: Optional[str],
+        match_threshold: float,
+        match_count: int,
+        unranked_similarity: Optional[float] = 1.0
+    ) -> List[ChunkRecord]:
+        """
+        Search PDF embeddings via match_documents, falling back to a direct query
+        
+        Until match_documents is known to work, the RPC and the fallback query
+        run concurrently so a failing RPC doesn't add a round-trip; once the
+        RPC has succeeded (or failed) the outcome is remembered.
+        
+        Rows from the direct query aren't ranked; they get unranked_similarity
+        as a placeholder score (None lets a caller merging results sort them last).
+        """
+        filter_doc_id = source_id if source_id else None
+        
+        def rpc_call():
+            return client.rpc(
+                'match_documents',
+                {
+                    'query_embedding': query_embedding,
+                    'match_threshold': match_threshold,
+                    'match_count': match_count,
+                    'filter_document_id': filter_doc_id
+                }
+            ).execute()
+        
+        def direct_call():
+            query = client.table("pdf_embeddings")\
+                .select("id, content, pdf_id, pdf_title, chunk_id, page_number")\
+                .limit(match_count)
+            if filter_doc_id:
+                query = query.eq("pdf_id", filter_doc_id)
+            return query.execute()
+        
+        if self._match_documents_available is None:
+            rpc_future = _rpc_executor.submit(rpc_call)
+            direct_future = _rpc_executor.submit(direct_call)
+        elif self._match_documents_available:
+            rpc_future, direct_future = _rpc_executor.submit(rpc_call), None
+        else:
+            rpc_future, direct_future = None, _rpc_executor.submit(direct_call)
+        
+        if rpc_future is not None:
+            try:
+                response = rpc_future.result()
+                self._match_documents_available = True
+                if direct_future is not None:
+                    direct_future.cancel()
+                chunks = response.data if response.data else []
+                if not chunks:
+                    return []
+                
+                # Convert to unified format - old and new column names are
+                # resolved once from the first row, then reused
+                getter = self._pdf_row_getter
+                if getter is None:
+                    getter = self._pdf_row_getter = _pdf_row_getter(chunks[0])
+                try:
+                    rows = [getter(c) for c in chunks]
+                except KeyError:
+                    # Schema changed under us - re-probe
+                    getter = self._pdf_row_getter = _pdf_row_getter(chunks[0])
+                    rows = [getter(c) for c in chunks]
+                return [Chunk(
+                    id=chunk_id,
+                    source_type='pdf',
+                    source_id=pdf_id,
+                    source_name=title,
+                    chunk_text=text,
+                    chunk_index=index,
+                    page_number=page,
+                    similarity=similarity
+                ) for chunk_id, pdf_id, title, text, index, page, similarity in rows]
+            except Exception as rpc_error:
+                # Fallback: Direct query to pdf_embeddings table
+                logger.warning(f"RPC match_documents failed, using direct query: {str(rpc_error)[:100]}")
+                error_msg = str(rpc_error).lower()
+                if 'function' in error_msg or 'parameter' in error_msg or 'pgrst' in error_msg:
+                    # Missing/mismatched function - don't retry it on later calls
+                    self._match_documents_available = False
+                if direct_future is None:
+                    direct_future = _rpc_executor.submit(direct_call)
+        
+        response = direct_future.result()
+        chunks = response.data if response.data else []
+        
+        # For direct query, we can't calculate similarity without vector search,
+        # so the rows carry the caller's placeholder score
+        return [Chunk(
+            id=c.get('id'),
+            source_type='pdf',
+            source_id=c.get('pdf_id'),
+            source_name=c.get('pdf_title'),
+            chunk_text=c.get('content'),
+            chunk_index=c.get('chunk_id'),
+            page_number=c.get('page_number'),
+            similarity=unranked_similarity
+        ) for c in chunks]
+    
     def generate_question_from_context(
         self,
-        context_chunks: List[Dict[str, Any]],
+        context_chunks: List[ChunkRecord],
         question_type: str = "general",
         difficulty: str = "medium",
         num_questions: int = 1
@@ -225,8 +672,9 @@ class RAGService:
         Returns:
             List of generated questions
         """
+        client = self.client
         try:
-            if not self.client:
+            if not client:
                 logger.error("OpenAI client not initialized")
                 return []
             
@@ -234,80 +682,18 @@ class RAGService:
                 logger.warning("No context chunks provided")
                 return []
             
-            # Combine context chunks
-            context_text = "\n\n".join([
-                f"[{chunk.get('source_type', 'unknown').upper()} - {chunk.get('source_name', 'source')}]\n{chunk.get('chunk_text', '')}"
-                for chunk in context_chunks[:10]  # Limit to top 10 chunks
-            ])
+            # Combine distinct context chunks within the token budget
+            context_text = _format_context(context_chunks)
             
             # Build prompt based on question type
-            if question_type == "mcq":
-                prompt = f"""Based on the following context from videos and documents, generate {num_questions} multiple-choice question(s) at {difficulty} difficulty level.
-
-Context:
-{context_text}
-
-For each question, provide:
-1. Question text
-2. Four options (A, B, C, D)
-3. Correct answer (A, B, C, or D)
-4. Brief explanation
-
-Format as JSON array with this structure:
-[
-  {{
-    "question": "Question text here",
-    "options": ["Option A", "Option B", "Option C", "Option D"],
-    "correct_answer": "A",
-    "explanation": "Brief explanation"
-  }}
-]
-"""
-            elif question_type == "descriptive":
-                prompt = f"""Based on the following context from videos and documents, generate {num_questions} descriptive/open-ended question(s) at {difficulty} difficulty level.
-
-Context:
-{context_text}
-
-For each question, provide:
-1. Question text
-2. Suggested answer points or rubric
-
-Format as JSON array with this structure:
-[
-  {{
-    "question": "Question text here",
-    "suggested_answer": "Key points that should be covered in the answer",
-    "rubric": {{
-      "max_points": 10,
-      "criteria": ["Criterion 1", "Criterion 2"]
-    }}
-  }}
-]
-"""
-            else:
-                prompt = f"""Based on the following context from videos and documents, generate {num_questions} question(s) at {difficulty} difficulty level.
-
-Context:
-{context_text}
-
-Format as JSON array with this structure:
-[
-  {{
-    "question": "Question text here",
-    "type": "mcq or descriptive",
-    "options": ["Option A", "Option B", "Option C", "Option D"] (if MCQ),
-    "correct_answer": "A or answer text",
-    "explanation": "Brief explanation"
-  }}
-]
-"""
+            tmpl = _PROMPT_TMPLS.get(question_type, _GEN_PROMPT_TMPL)
+            prompt = tmpl.format_map({'num': num_questions, 'diff': difficulty, 'ctx': context_text})
             
             # Generate questions using OpenAI
-            response = self.client.chat.completions.create(
+            response = client.chat.completions.create(
                 model=settings.OPENAI_MODEL,
                 messages=[
-                    {"role": "system", "content": "You are an expert question generator. Always respond with valid JSON only."},
+                    _QUESTION_SYSTEM_MESSAGE,
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.7,
@@ -315,20 +701,8 @@ Format as JSON array with this structure:
             )
             
             # Parse response
-            import json
             content = response.choices[0].message.content.strip()
-            
-            # Try to extract JSON from markdown code blocks if present
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-            
-            questions = json.loads(content)
-            
-            # Ensure it's a list
-            if not isinstance(questions, list):
-                questions = [questions]
+            questions = _parse_questions(content)
             
             # Add metadata
             for question in questions:
@@ -337,7 +711,7 @@ Format as JSON array with this structure:
             
             return questions
             
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             logger.error(f"Error parsing JSON response: {str(e)}")
             logger.error(f"Response content: {content[:500]}")
             return []
@@ -345,10 +719,85 @@ Format as JSON array with this structure:
             logger.error(f"Error generating questions: {str(e)}")
             return []
     
+    async def agenerate_questions(
+        self,
+        context_chunks: List[ChunkRecord],
+        question_type: str = "general",
+        difficulty: str = "medium",
+        num_questions: int = 1,
+        max_concurrency: int = 5
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate questions concurrently, one LLM request per question
+        
+        Args:
+            context_chunks: List of relevant chunks from similarity search
+            question_type: Type of question ('mcq', 'descriptive', 'general')
+            difficulty: Difficulty level ('easy', 'medium', 'hard')
+            num_questions: Number of questions to generate
+            max_concurrency: Maximum number of in-flight requests
+        
+        Returns:
+            List of generated questions (failed requests are skipped)
+        """
+        if not self.async_client:
+            logger.error("OpenAI client not initialized")
+            return []
+        
+        if not context_chunks:
+            logger.warning("No context chunks provided")
+            return []
+        
+        # Same prompt for every request, asking for a single question each
+        context_text = _format_context(context_chunks)
+        tmpl = _PROMPT_TMPLS.get(question_type, _GEN_PROMPT_TMPL)
+        messages = [
+            _QUESTION_SYSTEM_MESSAGE,
+            {"role": "user", "content": tmpl.format_map({'num': 1, 'diff': difficulty, 'ctx': context_text})}
+        ]
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        
+        async def generate_one() -> List[Dict[str, Any]]:
+            async with semaphore:
+                for attempt in range(MAX_RETRY_ATTEMPTS):
+                    try:
+                        await openai_limiter.acquire_async()
+                        response = await self.async_client.chat.completions.create(
+                            model=settings.OPENAI_MODEL,
+                            messages=messages,
+                            temperature=0.7,
+                            max_tokens=2000
+                        )
+                        return _parse_questions(response.choices[0].message.content.strip())
+                    except Exception as e:
+                        delay = retry_delay(e, attempt)
+                        if delay is None or attempt == MAX_RETRY_ATTEMPTS - 1:
+                            raise
+                        await asyncio.sleep(delay)
+            return []
+        
+        results = await asyncio.gather(
+            *(generate_one() for _ in range(num_questions)),
+            return_exceptions=True
+        )
+        
+        source_chunks = [c.get('id') for c in context_chunks[:5]]  # Reference top 5 chunks
+        questions = []
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Error generating question: {str(result)}")
+                continue
+            for question in result:
+                question['difficulty'] = difficulty
+                question['source_chunks'] = source_chunks
+                questions.append(question)
+        
+        return questions
+    
     def generate_answer_from_context(
         self,
         question: str,
-        context_chunks: List[Dict[str, Any]]
+        context_chunks: List[ChunkRecord]
     ) -> Dict[str, Any]:
         """
         Generate answer from retrieved context chunks
@@ -360,33 +809,31 @@ Format as JSON array with this structure:
         Returns:
             Dictionary with answer and metadata
         """
+        client = self.client
         try:
-            if not self.client:
+            if not client:
                 logger.error("OpenAI client not initialized")
                 return {'error': 'OpenAI client not available'}
             
             if not context_chunks:
                 return {'error': 'No relevant context found'}
             
-            # Combine context chunks
-            context_text = "\n\n".join([
-                f"[{chunk.get('source_type', 'unknown').upper()} - {chunk.get('source_name', 'source')}]\n{chunk.get('chunk_text', '')}"
-                for chunk in context_chunks[:10]
-            ])
+            # Same question over the same top sources: reuse the previous answer
+            scope = "\x00".join(sorted(str(c.get('id', '')) for c in context_chunks[:5]))
+            cache_key = answer_cache.make_key(scope, question)
+            cached = answer_cache.get_exact(cache_key)
+            if cached is not None:
+                return {**cached, 'cache_hit': True}
             
-            prompt = f"""Based on the following context from videos and documents, answer the user's question.
-
-Context:
-{context_text}
-
-Question: {question}
-
-Provide a comprehensive answer based on the context. If the context doesn't contain enough information, say so."""
+            # Combine distinct context chunks within the token budget
+            context_text = _format_context(context_chunks)
             
-            response = self.client.chat.completions.create(
+            prompt = _ANSWER_PROMPT_TMPL.format_map({'ctx': context_text, 'question': question})
+            
+            response = client.chat.completions.create(
                 model=settings.OPENAI_MODEL,
                 messages=[
-                    {"role": "system", "content": "You are a helpful assistant that answers questions based on provided context from videos and documents."},
+                    _ANSWER_SYSTEM_MESSAGE,
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.7,
@@ -395,33 +842,78 @@ Provide a comprehensive answer based on the context. If the context doesn't cont
             
             answer = response.choices[0].message.content.strip()
             
-            return {
+            result = {
                 'answer': answer,
-                'sources': [
-                    {
-                        'type': chunk.get('source_type'),
-                        'id': chunk.get('source_id'),
-                        'name': chunk.get('source_name'),
-                        'similarity': chunk.get('similarity')
-                    }
-                    for chunk in context_chunks[:5]
-                ]
+                'sources': _format_sources(context_chunks)
             }
+            answer_cache.set(cache_key, scope, (), result)
+            return result
             
         except Exception as e:
             logger.error(f"Error generating answer: {str(e)}")
             return {'error': str(e)}
     
+    async def astream_answer(
+        self,
+        question: str,
+        context_chunks: List[ChunkRecord]
+    ) -> AsyncIterator[str]:
+        """
+        Stream an answer from retrieved context chunks as it is generated
+        
+        Args:
+            question: User's question
+            context_chunks: List of relevant chunks from similarity search
+        
+        Yields:
+            Answer text fragments (nothing if no client or context is available)
+        """
+        if not self.async_client:
+            logger.error("OpenAI client not initialized")
+            return
+        
+        if not context_chunks:
+            return
+        
+        prompt = _ANSWER_PROMPT_TMPL.format_map({'ctx': _format_context(context_chunks), 'question': question})
+        try:
+            await openai_limiter.acquire_async()
+            stream = await self.async_client.chat.completions.create(
+                model=settings.OPENAI_MODEL,
+                messages=[
+                    _ANSWER_SYSTEM_MESSAGE,
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.7,
+                max_tokens=1000,
+                stream=True
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        except Exception as e:
+            logger.error(f"Error streaming answer: {str(e)}")
+    
     def store_user_query(
         self,
         user_id: str,
         query_text: str,
         query_type: str = "general",
         source_type: Optional[str] = None,
-        source_id: Optional[str] = None
+        source_id: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None
     ) -> Optional[str]:
         """
-        Store user query in database
+        Queue user query for storage (written in the background)
+        
+        The embedding is reused from the caller or from the preceding
+        search_similar_chunks call for the same text when available;
+        otherwise it is computed on the writer thread when the batch
+        flushes, so neither the embedding call nor the insert is on the
+        request's critical path.
         
         Args:
             user_id: User ID
@@ -429,32 +921,39 @@ Provide a comprehensive answer based on the context. If the context doesn't cont
             query_type: Type of query
             source_type: Source type
             source_id: Source ID
+            query_embedding: Already computed embedding of query_text (optional)
         
         Returns:
-            Query ID or None
+            Query ID (generated client-side) or None
         """
         try:
-            # Generate query embedding
-            query_embedding = embedding_service.generate_embedding(query_text)
-            
-            client = supabase_service.get_client()
-            if not client:
-                return None
-            
+            query_id = str(uuid.uuid4())
             data = {
+                'id': query_id,
                 'user_id': user_id,
                 'query_text': query_text,
                 'query_type': query_type,
                 'source_type': source_type,
                 'source_id': source_id,
-                'embedding': str(query_embedding) if query_embedding else None
+                'embedding': None
             }
             
-            response = client.table('user_queries').insert(data).execute()
+            if query_embedding is None:
+                last = _last_query_embedding.get()
+                if last is not None and last[0] == query_text:
+                    query_embedding = last[1]
             
-            if response.data:
-                return response.data[0].get('id')
-            return None
+            if query_embedding:
+                data['embedding'] = query_embedding
+                background_writer.enqueue('user_queries', data)
+                return query_id
+            
+            def add_embedding(row: Dict[str, Any]) -> None:
+                query_embedding = embedding_service.generate_embedding(row['query_text'])
+                row['embedding'] = query_embedding or None
+            
+            background_writer.enqueue('user_queries', data, prepare=add_embedding)
+            return query_id
             
         except Exception as e:
             logger.error(f"Error storing user query: {str(e)}")
@@ -468,10 +967,10 @@ Provide a comprehensive answer based on the context. If the context doesn't cont
         message_text: str,
         source_type: Optional[str] = None,
         source_id: Optional[str] = None,
-        context_chunks: Optional[List[Dict[str, Any]]] = None
+        context_chunks: Optional[List[ChunkRecord]] = None
     ) -> Optional[str]:
         """
-        Store chat message in history
+        Queue chat message for storage in history (written in the background)
         
         Args:
             user_id: User ID
@@ -483,14 +982,12 @@ Provide a comprehensive answer based on the context. If the context doesn't cont
             context_chunks: Context chunks used
         
         Returns:
-            Message ID or None
+            Message ID (generated client-side) or None
         """
         try:
-            client = supabase_service.get_client()
-            if not client:
-                return None
-            
+            message_id = str(uuid.uuid4())
             data = {
+                'id': message_id,
                 'user_id': user_id,
                 'session_id': session_id,
                 'message_type': message_type,
@@ -500,11 +997,8 @@ Provide a comprehensive answer based on the context. If the context doesn't cont
                 'context_chunks': [c.get('id') for c in context_chunks] if context_chunks else None
             }
             
-            response = client.table('chat_history').insert(data).execute()
-            
-            if response.data:
-                return response.data[0].get('id')
-            return None
+            background_writer.enqueue('chat_history', data)
+            return message_id
             
         except Exception as e:
             logger.error(f"Error storing chat message: {str(e)}")
@@ -2,93 +2,158 @@
 Supabase service utilities for database operations, auth, and storage
 """
 
-from supabase import create_client, Client
-from typing import Optional, Dict, Any, List
+from supabase import create_client, Client, ClientOptions
+from postgrest.types import ReturnMethod
+from typing import Optional, Dict, Any, List, BinaryIO, Iterator, Union
+from dataclasses import dataclass, field
+from threading import Lock
+import asyncio
+import importlib.util
+import httpx
 from app.config import settings
-from app.utils.cache import cache
+from app.services.pg_pool import pg_pool
+from app.utils.cache import cache, CacheProfile
 from app.utils.logger import logger
+from app.utils.retry import retry_db_operation
 from uuid import UUID
 
+# Keep-alive pool shared by every PostgREST/storage call
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=40, max_connections=60, keepalive_expiry=60)
+HTTP_TIMEOUT = 30
+# Retries cover connection failures only (connect errors / resets), never HTTP error responses
+HTTP_CONNECT_RETRIES = 3
+HTTP2_ENABLED = importlib.util.find_spec("h2") is not None
+
+# Default question projection: every column except the (large) embedding vector
+QUESTION_COLUMNS = (
+    "id, assessment_id, question_text, question_type, difficulty, options, correct_answer, "
+    "explanation, rubric, tags, skill_domain, estimated_time, created_at, updated_at"
+)
+
+# Columns list_assessments accepts as equality filters
+_ASSESSMENT_FILTER_KEYS = ("status", "created_by", "skill_domain")
+
+# Chunk size for streamed storage downloads
+STORAGE_CHUNK_SIZE = 1 << 20  # 1 MiB
+
+# Rows per multi-row insert (keeps request bodies well under PostgREST limits)
+BULK_INSERT_CHUNK_SIZE = 500
+
+
+def _build_http_client() -> httpx.Client:
+    """Build the pooled HTTP client used by the Supabase client"""
+    transport = httpx.HTTPTransport(retries=HTTP_CONNECT_RETRIES, http2=HTTP2_ENABLED, limits=HTTP_LIMITS)
+    return httpx.Client(transport=transport, timeout=HTTP_TIMEOUT)
+
+
+@dataclass(slots=True)
+class AttemptBundle:
+    """Attempt with its assessment, questions and responses"""
+    attempt: Optional[Dict[str, Any]]
+    assessment: Optional[Dict[str, Any]] = None
+    questions: List[Dict[str, Any]] = field(default_factory=list)
+    responses: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def _encode_vector(vector: List[float]) -> str:
+    """
+    Encode an embedding as a pgvector text literal
+    
+    pgvector stores float32, and 9 significant digits round-trip any float32
+    exactly while producing a shorter string than str(list) (full float64 repr).
+    """
+    return "[" + ",".join(map("%.9g".__mod__, vector)) + "]"
+
+
+def _as_id(value: Any) -> str:
+    """Convert an ID (UUID or str) to its string form, skipping str() for strings"""
+    return value if value.__class__ is str else str(value)
+
 
 class SupabaseService:
     """Service for interacting with Supabase"""
     
     def __init__(self):
-        """Initialize Supabase client"""
+        """
+        Initialize service state
+        
+        The client is created lazily on the first get_client() call, so importing
+        this module (e.g. in a gunicorn --preload master or a worker that never
+        touches the database) makes no network calls.
+        """
         self.client: Optional[Client] = None
-        self._initialize_client()
+        self._http_client: Optional[httpx.Client] = None
+        self._init_lock = Lock()
+        # Settings are checked once on first use; invalid settings are never retried per call
+        self._settings_valid: Optional[bool] = None
+    
+    @staticmethod
+    def _validate_settings() -> bool:
+        """Check Supabase settings once, logging actionable errors"""
+        # Enhanced validation with clear error messages
+        # Validate that required settings are present
+        if not settings.SUPABASE_URL or not settings.SUPABASE_KEY:
+            logger.error("❌ [CRITICAL] Supabase credentials missing!")
+            logger.error("   SUPABASE_URL: " + (settings.SUPABASE_URL[:50] + "..." if settings.SUPABASE_URL else "NOT SET"))
+            logger.error("   SUPABASE_KEY: " + (settings.SUPABASE_KEY[:20] + "..." if settings.SUPABASE_KEY else "NOT SET"))
+            logger.error("   SOLUTION: Set SUPABASE_URL and SUPABASE_KEY environment variables in Vercel project settings")
+            return False
+        
+        # Check if values are placeholders
+        is_placeholder_url = (
+            "your-project" in settings.SUPABASE_URL.lower() or 
+            "placeholder" in settings.SUPABASE_URL.lower() or
+            settings.SUPABASE_URL == "https://your-project.supabase.co"
+        )
+        is_placeholder_key = (
+            "your-supabase" in settings.SUPABASE_KEY.lower() or
+            "placeholder" in settings.SUPABASE_KEY.lower() or
+            settings.SUPABASE_KEY == "your-supabase-anon-key"
+        )
+        
+        if is_placeholder_url or is_placeholder_key:
+            logger.error("❌ [CRITICAL] Supabase credentials appear to be placeholders!")
+            logger.error(f"   Current URL: {settings.SUPABASE_URL[:50]}...")
+            logger.error(f"   Current KEY: {settings.SUPABASE_KEY[:20]}...")
+            logger.error("   SOLUTION: Update environment variables in Vercel:")
+            logger.error("   1. Go to Vercel Dashboard → Your Project → Settings → Environment Variables")
+            logger.error("   2. Add SUPABASE_URL with your Supabase project URL")
+            logger.error("   3. Add SUPABASE_KEY with your Supabase anon/public key")
+            logger.error("   4. Redeploy the application")
+            return False
+        
+        # Validate URL format
+        if not settings.SUPABASE_URL.startswith("https://"):
+            logger.error(f"[WARN] Invalid SUPABASE_URL format. Must start with 'https://'. Got: {settings.SUPABASE_URL[:50]}")
+            return False
+        
+        # Validate key format (should be a long string)
+        if len(settings.SUPABASE_KEY) < 50:
+            logger.warning(f"[WARN] SUPABASE_KEY seems too short ({len(settings.SUPABASE_KEY)} chars). Please verify it's correct.")
+        
+        return True
     
     def _initialize_client(self):
         """Initialize Supabase client with configuration"""
+        if not self._settings_valid:
+            self.client = None
+            return
+        
         try:
-            # Enhanced validation with clear error messages
-            # Validate that required settings are present
-            if not settings.SUPABASE_URL or not settings.SUPABASE_KEY:
-                logger.error("❌ [CRITICAL] Supabase credentials missing!")
-                logger.error("   SUPABASE_URL: " + (settings.SUPABASE_URL[:50] + "..." if settings.SUPABASE_URL else "NOT SET"))
-                logger.error("   SUPABASE_KEY: " + (settings.SUPABASE_KEY[:20] + "..." if settings.SUPABASE_KEY else "NOT SET"))
-                logger.error("   SOLUTION: Set SUPABASE_URL and SUPABASE_KEY environment variables in Vercel project settings")
-                self.client = None
-                return
-            
-            # Check if values are placeholders
-            is_placeholder_url = (
-                "your-project" in settings.SUPABASE_URL.lower() or 
-                "placeholder" in settings.SUPABASE_URL.lower() or
-                settings.SUPABASE_URL == "https://your-project.supabase.co"
-            )
-            is_placeholder_key = (
-                "your-supabase" in settings.SUPABASE_KEY.lower() or
-                "placeholder" in settings.SUPABASE_KEY.lower() or
-                settings.SUPABASE_KEY == "your-supabase-anon-key"
-            )
-            
-            if is_placeholder_url or is_placeholder_key:
-                logger.error("❌ [CRITICAL] Supabase credentials appear to be placeholders!")
-                logger.error(f"   Current URL: {settings.SUPABASE_URL[:50]}...")
-                logger.error(f"   Current KEY: {settings.SUPABASE_KEY[:20]}...")
-                logger.error("   SOLUTION: Update environment variables in Vercel:")
-                logger.error("   1. Go to Vercel Dashboard → Your Project → Settings → Environment Variables")
-                logger.error("   2. Add SUPABASE_URL with your Supabase project URL")
-                logger.error("   3. Add SUPABASE_KEY with your Supabase anon/public key")
-                logger.error("   4. Redeploy the application")
-                self.client = None
-                return
-            
-            # Validate URL format
-            if not settings.SUPABASE_URL.startswith("https://"):
-                logger.error(f"[WARN] Invalid SUPABASE_URL format. Must start with 'https://'. Got: {settings.SUPABASE_URL[:50]}")
-                self.client = None
-                return
-            
-            # Validate key format (should be a long string)
-            if len(settings.SUPABASE_KEY) < 50:
-                logger.warning(f"[WARN] SUPABASE_KEY seems too short ({len(settings.SUPABASE_KEY)} chars). Please verify it's correct.")
-            
             # Create client
             logger.info(f"🔌 Initializing Supabase client with URL: {settings.SUPABASE_URL[:30]}...")
+            self._http_client = _build_http_client()
             self.client = create_client(
                 settings.SUPABASE_URL,
-                settings.SUPABASE_KEY
+                settings.SUPABASE_KEY,
+                options=ClientOptions(
+                    postgrest_client_timeout=HTTP_TIMEOUT,
+                    storage_client_timeout=HTTP_TIMEOUT,
+                    httpx_client=self._http_client
+                )
             )
+            # No connection test query - the first real call surfaces connectivity errors
             logger.info("✅ Supabase client created successfully")
-            
-            # Test connection with a simple query
-            try:
-                # Try to query a table that should exist (or at least check if we can connect)
-                # This is a lightweight test that doesn't require any specific table
-                _ = self.client.table("profiles").select("id").limit(0).execute()
-                logger.info("✅ Supabase connection test passed")
-            except Exception as test_error:
-                # If profiles table doesn't exist, that's okay - we just want to verify connection works
-                error_msg = str(test_error).lower()
-                if "does not exist" not in error_msg and "relation" not in error_msg:
-                    logger.warning(f"⚠️  Supabase client initialized but connection test failed: {str(test_error)}")
-                    # Check for RLS issues
-                    if "row-level security" in error_msg or "permission denied" in error_msg:
-                        logger.warning("   ⚠️  This might be a Row Level Security (RLS) issue.")
-                        logger.warning("   SOLUTION: Check RLS policies in Supabase dashboard")
-                    
         except Exception as e:
             logger.error(f"[WARN] Failed to initialize Supabase client: {str(e)}. Database features may be unavailable.")
             logger.error(f"[WARN] Please check:")
@@ -98,28 +163,80 @@ class SupabaseService:
             self.client = None
     
     def get_client(self) -> Optional[Client]:
-        """Get Supabase client instance"""
-        if not self.client:
-            self._initialize_client()
-        return self.client
+        """Get Supabase client instance, creating it on first use"""
+        client = self.client
+        if client is None and self._settings_valid is not False:
+            # Serialize initialization so concurrent callers don't each build a pool
+            with self._init_lock:
+                if self._settings_valid is None:
+                    self._settings_valid = self._validate_settings()
+                if self.client is None:
+                    self._initialize_client()
+            client = self.client
+        return client
     
     def _ensure_client(self) -> Client:
         """Ensure client is initialized and raise exception if not available"""
+        client = self.client
+        if client is not None:
+            return client
         client = self.get_client()
-        if not client:
+        if client is None:
             raise Exception("Supabase client not initialized. Please configure SUPABASE_URL and SUPABASE_KEY in .env file.")
         return client
     
+    @staticmethod
+    @retry_db_operation
+    def _execute(query):
+        """
+        Execute an idempotent query (select/update/rpc), retrying transient errors
+        
+        Inserts call execute() directly: a retry after a lost response could
+        write the row twice.
+        """
+        return query.execute()
+    
+    def _insert_bulk(self, table: str, rows: List[Dict[str, Any]], return_rows: bool = True) -> List[Dict[str, Any]]:
+        """
+        Insert rows with one request per BULK_INSERT_CHUNK_SIZE rows
+        
+        Args:
+            table: Target table name
+            rows: Rows to insert
+            return_rows: If False, ask PostgREST for return=minimal so inserted
+                rows are not serialized back (an empty list is returned)
+        """
+        client = self._ensure_client()
+        returning = ReturnMethod.representation if return_rows else ReturnMethod.minimal
+        inserted: List[Dict[str, Any]] = []
+        for start in range(0, len(rows), BULK_INSERT_CHUNK_SIZE):
+            response = client.table(table).insert(
+                rows[start:start + BULK_INSERT_CHUNK_SIZE], returning=returning
+            ).execute()
+            if return_rows:
+                inserted.extend(response.data or [])
+        return inserted
+    
     # ============================================
     # Profile Operations
     # ============================================
     
-    def get_profile(self, user_id: UUID) -> Optional[Dict[str, Any]]:
-        """Get user profile by ID"""
+    def get_profile(self, user_id: UUID, use_cache: bool = True) -> Optional[Dict[str, Any]]:
+        """Get user profile by ID with optional caching"""
+        cache_key = f"profile:{user_id}"
+        
+        # Try cache first
+        if use_cache:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         try:
             client = self._ensure_client()
-            response = client.table("profiles").select("*").eq("id", str(user_id)).execute()
+            response = self._execute(client.table("profiles").select("*").eq("id", _as_id(user_id)))
             if response.data:
+                if use_cache:
+                    cache.set(cache_key, response.data[0], profile=CacheProfile.PROFILE)
                 return response.data[0]
             return None
         except Exception as e:
@@ -131,11 +248,13 @@ class SupabaseService:
         try:
             client = self._ensure_client()
             data = {
-                "id": str(user_id),
+                "id": _as_id(user_id),
                 "email": email,
                 **kwargs
             }
             response = client.table("profiles").insert(data).execute()
+            if response.data:
+                cache.set(f"profile:{user_id}", response.data[0], profile=CacheProfile.PROFILE)
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error creating profile: {str(e)}")
@@ -157,26 +276,51 @@ class SupabaseService:
             logger.error(f"Error creating assessment: {str(e)}")
             raise
     
-    def get_assessment(self, assessment_id: UUID, use_cache: bool = True) -> Optional[Dict[str, Any]]:
-        """Get assessment by ID with optional caching"""
-        cache_key = f"assessment:{assessment_id}"
+    @staticmethod
+    def _assessment_tag(assessment_id: Any) -> str:
+        """Cache tag shared by every cached entry derived from an assessment"""
+        return f"assessment:{assessment_id}"
+    
+    def _invalidate_assessment(self, assessment_id: Any) -> None:
+        """Drop the cached assessment and everything derived from it"""
+        cache.invalidate_tag(self._assessment_tag(assessment_id))
+    
+    def get_assessment(
+        self,
+        assessment_id: UUID,
+        use_cache: bool = True,
+        columns: str = "*"
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get assessment by ID with optional caching (stale entries are served while refreshing)
         
-        # Try cache first
-        if use_cache:
-            cached = cache.get(cache_key)
-            if cached is not None:
-                return cached
+        Only full rows (columns="*") are cached; narrower projections are
+        fetched directly.
+        """
+        if columns != "*":
+            return self._fetch_assessment(assessment_id, columns)
+        if not use_cache:
+            return self._fetch_assessment(assessment_id)
+        
+        return cache.get_or_set(
+            f"assessment:{assessment_id}",
+            lambda: self._fetch_assessment(assessment_id),
+            tags=(self._assessment_tag(assessment_id),),
+            stale_while_revalidate=True,
+            profile=CacheProfile.ASSESSMENT
+        )
+    
+    def _fetch_assessment(self, assessment_id: UUID, columns: str = "*") -> Optional[Dict[str, Any]]:
+        """Fetch assessment by ID from the database"""
+        if columns == "*":
+            rows = pg_pool.fetch_json("SELECT row_to_json(a) FROM assessments a WHERE a.id = %s", (_as_id(assessment_id),))
+            if rows is not None:
+                return rows[0] if rows else None
         
         try:
             client = self._ensure_client()
-            response = client.table("assessments").select("*").eq("id", str(assessment_id)).execute()
-            result = response.data[0] if response.data else None
-            
-            # Cache result
-            if result and use_cache:
-                cache.set(cache_key, result, ttl_seconds=600)  # 10 minutes
-            
-            return result
+            response = self._execute(client.table("assessments").select(columns).eq("id", _as_id(assessment_id)))
+            return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error getting assessment: {str(e)}")
             return None
@@ -185,36 +329,35 @@ class SupabaseService:
         """Update assessment and invalidate cache"""
         try:
             client = self._ensure_client()
-            response = client.table("assessments").update(update_data).eq("id", str(assessment_id)).execute()
+            response = self._execute(client.table("assessments").update(update_data).eq("id", _as_id(assessment_id)))
             result = response.data[0] if response.data else None
             
-            # Invalidate cache
-            cache.delete(f"assessment:{assessment_id}")
+            # Invalidate the assessment and its derived entries (question lists)
+            self._invalidate_assessment(assessment_id)
             
             return result
         except Exception as e:
             logger.error(f"Error updating assessment: {str(e)}")
             raise
     
-    def list_assessments(self, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
-        """List assessments with optional filters"""
+    def list_assessments(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        columns: str = "*"
+    ) -> List[Dict[str, Any]]:
+        """List assessments with optional filters (pass columns to fetch only what is needed)"""
         try:
             client = self._ensure_client()
-            query = client.table("assessments").select("*")
+            query = client.table("assessments").select(columns)
             
-            # Optimized filter building - single pass
+            # Equality filters - single pass over the supported keys
             if filters:
-                filter_map = {
-                    "status": lambda v: query.eq("status", v),
-                    "created_by": lambda v: query.eq("created_by", v),
-                    "skill_domain": lambda v: query.eq("skill_domain", v)
-                }
-                for key, filter_func in filter_map.items():
+                for key in _ASSESSMENT_FILTER_KEYS:
                     value = filters.get(key)
                     if value:
-                        query = filter_func(value)
+                        query = query.eq(key, value)
             
-            response = query.order("created_at", desc=True).execute()
+            response = self._execute(query.order("created_at", desc=True))
             return response.data if response.data else []
         except Exception as e:
             logger.error(f"Error listing assessments: {str(e)}")
@@ -230,17 +373,84 @@ class SupabaseService:
             client = self._ensure_client()
             # Handle embedding vector
             if "embedding" in question_data and question_data["embedding"]:
-                question_data["embedding"] = str(question_data["embedding"])
+                question_data["embedding"] = _encode_vector(question_data["embedding"])
             
             response = client.table("questions").insert(question_data).execute()
-            return response.data[0] if response.data else None
+            if question_data.get("assessment_id"):
+                self._invalidate_assessment(question_data["assessment_id"])
+            if not response.data:
+                return None
+            
+            # Questions are write-once: seed the (non-expiring) cache with the new row
+            question = response.data[0]
+            if question.get("id"):
+                cache.set(
+                    f"question:{question['id']}",
+                    {key: value for key, value in question.items() if key != "embedding"},
+                    profile=CacheProfile.QUESTION
+                )
+            return question
         except Exception as e:
             logger.error(f"Error creating question: {str(e)}")
             raise
     
-    def get_question(self, question_id: UUID, use_cache: bool = True) -> Optional[Dict[str, Any]]:
-        """Get question by ID with optional caching"""
+    def create_questions_bulk(self, questions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Create multiple questions in as few requests as possible"""
+        if not questions:
+            return []
+        try:
+            rows = [
+                {**q, "embedding": _encode_vector(q["embedding"])} if q.get("embedding") else q
+                for q in questions
+            ]
+            inserted = self._insert_bulk("questions", rows)
+            for assessment_id in {q["assessment_id"] for q in questions if q.get("assessment_id")}:
+                self._invalidate_assessment(assessment_id)
+            return inserted
+        except Exception as e:
+            logger.error(f"Error creating questions in bulk: {str(e)}")
+            raise
+    
+    def update_question(self, question_id: UUID, update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Update question and drop its cached copy"""
+        try:
+            client = self._ensure_client()
+            if update_data.get("embedding"):
+                update_data = {**update_data, "embedding": _encode_vector(update_data["embedding"])}
+            response = self._execute(client.table("questions").update(update_data).eq("id", _as_id(question_id)))
+            result = response.data[0] if response.data else None
+            # Cached questions never expire, so every write must invalidate them
+            cache.delete(f"question:{question_id}")
+            if result and result.get("assessment_id"):
+                self._invalidate_assessment(result["assessment_id"])
+            return result
+        except Exception as e:
+            logger.error(f"Error updating question: {str(e)}")
+            raise
+    
+    def delete_question(self, question_id: UUID) -> bool:
+        """Delete question and drop its cached copy"""
+        try:
+            client = self._ensure_client()
+            response = self._execute(client.table("questions").delete().eq("id", _as_id(question_id)))
+            cache.delete(f"question:{question_id}")
+            for row in response.data or []:
+                if row.get("assessment_id"):
+                    self._invalidate_assessment(row["assessment_id"])
+            return bool(response.data)
+        except Exception as e:
+            logger.error(f"Error deleting question: {str(e)}")
+            raise
+    
+    def get_question(
+        self,
+        question_id: UUID,
+        use_cache: bool = True,
+        columns: str = QUESTION_COLUMNS
+    ) -> Optional[Dict[str, Any]]:
+        """Get question by ID with optional caching (the embedding is only fetched on request)"""
         cache_key = f"question:{question_id}"
+        use_cache = use_cache and columns == QUESTION_COLUMNS
         
         # Try cache first
         if use_cache:
@@ -249,57 +459,63 @@ class SupabaseService:
                 return cached
         
         try:
-            client = self._ensure_client()
-            response = client.table("questions").select("*").eq("id", str(question_id)).execute()
-            result = response.data[0] if response.data else None
+            rows = None
+            if columns == QUESTION_COLUMNS:
+                rows = pg_pool.fetch_json(
+                    "SELECT to_jsonb(q) - 'embedding' FROM questions q WHERE q.id = %s", (_as_id(question_id),)
+                )
+            if rows is not None:
+                result = rows[0] if rows else None
+            else:
+                client = self._ensure_client()
+                response = self._execute(client.table("questions").select(columns).eq("id", _as_id(question_id)))
+                result = response.data[0] if response.data else None
             
             # Cache result
             if result and use_cache:
-                cache.set(cache_key, result, ttl_seconds=600)  # 10 minutes
+                cache.set(cache_key, result, profile=CacheProfile.QUESTION)
             
             return result
         except Exception as e:
             logger.error(f"Error getting question: {str(e)}")
             return None
     
-    def get_questions_batch(self, question_ids: List[UUID], use_cache: bool = True) -> Dict[str, Dict[str, Any]]:
+    def get_questions_batch(
+        self,
+        question_ids: List[UUID],
+        use_cache: bool = True,
+        columns: str = QUESTION_COLUMNS
+    ) -> Dict[str, Dict[str, Any]]:
         """Get multiple questions by IDs in a single query - optimized batch operation"""
         if not question_ids:
             return {}
+        use_cache = use_cache and columns == QUESTION_COLUMNS
         
         try:
             client = self._ensure_client()
             
-            # Check cache for each question - optimized with dict comprehension
             questions_dict = {}
-            uncached_ids = []
+            uncached_ids = question_ids
             
             if use_cache:
-                # Optimized: single pass with dict comprehension
-                for qid in question_ids:
-                    cache_key = f"question:{qid}"
-                    cached = cache.get(cache_key)
-                    if cached is not None:
-                        questions_dict[str(qid)] = cached
-                    else:
-                        uncached_ids.append(qid)
-            else:
-                uncached_ids = question_ids
+                # One multi-get for all ids, then keep only the misses
+                keys = [f"question:{qid}" for qid in question_ids]
+                cached = cache.mget(keys)
+                if cached:
+                    questions_dict = {key[9:]: value for key, value in cached.items()}  # strip "question:"
+                    uncached_ids = [qid for qid, key in zip(question_ids, keys) if key not in cached]
             
-            # Batch fetch uncached questions - optimized list comprehension
+            # Batch fetch uncached questions
             if uncached_ids:
                 # Use Supabase's 'in' filter for batch query
-                id_strings = [str(qid) for qid in uncached_ids]
-                response = client.table("questions").select("*").in_("id", id_strings).execute()
+                response = self._execute(
+                    client.table("questions").select(columns).in_("id", tuple(map(_as_id, uncached_ids)))
+                )
                 
-                # Build dictionary and cache - optimized single pass
-                cache_ttl = 600 if use_cache else None
-                for question in (response.data or []):
-                    qid_str = str(question["id"])
-                    questions_dict[qid_str] = question
-                    
-                    if use_cache:
-                        cache.set(f"question:{qid_str}", question, ttl_seconds=cache_ttl)
+                fetched = {_as_id(question["id"]): question for question in (response.data or [])}
+                questions_dict.update(fetched)
+                if use_cache and fetched:
+                    cache.mset({f"question:{qid}": q for qid, q in fetched.items()}, profile=CacheProfile.QUESTION)
             
             return questions_dict
         except Exception as e:
@@ -310,10 +526,12 @@ class SupabaseService:
         self,
         assessment_id: UUID,
         limit: Optional[int] = None,
-        use_cache: bool = True
+        use_cache: bool = True,
+        columns: str = QUESTION_COLUMNS
     ) -> List[Dict[str, Any]]:
-        """Get questions for an assessment with optional caching"""
+        """Get questions for an assessment with optional caching (the embedding is only fetched on request)"""
         cache_key = f"assessment_questions:{assessment_id}:{limit}"
+        use_cache = use_cache and columns == QUESTION_COLUMNS
         
         # Try cache first
         if use_cache:
@@ -323,43 +541,140 @@ class SupabaseService:
         
         try:
             client = self._ensure_client()
-            query = client.table("questions").select("*").eq("assessment_id", str(assessment_id))
+            query = client.table("questions").select(columns).eq("assessment_id", _as_id(assessment_id))
             
             if limit:
                 query = query.limit(limit)
             
-            response = query.execute()
+            response = self._execute(query)
             result = response.data if response.data else []
             
             # Cache result
             if result and use_cache:
-                cache.set(cache_key, result, ttl_seconds=300)  # 5 minutes
+                cache.set(
+                    cache_key,
+                    result,
+                    tags=(self._assessment_tag(assessment_id),),
+                    profile=CacheProfile.ASSESSMENT_QUESTIONS
+                )
             
             return result
         except Exception as e:
             logger.error(f"Error getting assessment questions: {str(e)}")
             return []
     
+    def get_assessment_with_questions(
+        self,
+        assessment_id: UUID,
+        limit: Optional[int] = None,
+        use_cache: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get an assessment and its questions in a single request
+        
+        Uses PostgREST resource embedding, so the parent row comes back with
+        a "questions" list instead of needing a second round-trip.
+        
+        Args:
+            assessment_id: Assessment ID
+            limit: Maximum number of questions to include
+            use_cache: Whether to use the cache
+        
+        Returns:
+            Assessment dict with a "questions" list, or None if not found
+        """
+        cache_key = f"assessment_full:{assessment_id}:{limit}"
+        
+        # Try cache first
+        if use_cache:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        try:
+            client = self._ensure_client()
+            response = self._execute(
+                client.table("assessments").select(f"*, questions({QUESTION_COLUMNS})").eq("id", _as_id(assessment_id))
+            )
+            result = response.data[0] if response.data else None
+            if result is None:
+                return None
+            
+            if limit and len(result.get("questions") or []) > limit:
+                result["questions"] = result["questions"][:limit]
+            
+            # Cache result
+            if use_cache:
+                cache.set(
+                    cache_key,
+                    result,
+                    tags=(self._assessment_tag(assessment_id),),
+                    profile=CacheProfile.ASSESSMENT_QUESTIONS
+                )
+            
+            return result
+        except Exception as e:
+            logger.error(f"Error getting assessment with questions: {str(e)}")
+            return None
+    
     def find_similar_questions(self, embedding: List[float], threshold: float = 0.85, limit: int = 5) -> List[Dict[str, Any]]:
         """Find similar questions using vector similarity"""
         try:
             client = self._ensure_client()
             # Use pgvector cosine similarity
-            embedding_str = str(embedding)
-            response = client.rpc(
+            embedding_str = _encode_vector(embedding)
+            response = self._execute(client.rpc(
                 "match_questions",
                 {
                     "query_embedding": embedding_str,
                     "match_threshold": threshold,
                     "match_count": limit
                 }
-            ).execute()
+            ))
             
             return response.data if response.data else []
         except Exception as e:
             logger.warning(f"Vector similarity search failed: {str(e)}")
             return []
     
+    def find_similar_questions_batch(
+        self,
+        embeddings: List[List[float]],
+        threshold: float = 0.85,
+        limit: int = 5
+    ) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Find similar questions for several embeddings in one round-trip
+        
+        Args:
+            embeddings: Query embeddings
+            threshold: Minimum cosine similarity
+            limit: Maximum matches per embedding
+        
+        Returns:
+            Dict of embedding index -> matches (every index is present)
+        """
+        matches: Dict[int, List[Dict[str, Any]]] = {i: [] for i in range(len(embeddings))}
+        if not embeddings:
+            return matches
+        
+        try:
+            client = self._ensure_client()
+            response = self._execute(client.rpc(
+                "match_questions_batch",
+                {
+                    "query_embeddings": embeddings,
+                    "match_threshold": threshold,
+                    "match_count": limit
+                }
+            ))
+            for row in (response.data or []):
+                matches[row.pop("query_index")].append(row)
+            return matches
+        except Exception as e:
+            logger.warning(f"Batch vector similarity search failed, querying one by one: {str(e)}")
+            return {i: self.find_similar_questions(embedding, threshold, limit) for i, embedding in enumerate(embeddings)}
+    
     # ============================================
     # Attempt Operations
     # ============================================
@@ -378,7 +693,7 @@ class SupabaseService:
         """Get attempt by ID"""
         try:
             client = self._ensure_client()
-            response = client.table("attempts").select("*").eq("id", str(attempt_id)).execute()
+            response = self._execute(client.table("attempts").select("*").eq("id", _as_id(attempt_id)))
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error getting attempt: {str(e)}")
@@ -388,7 +703,7 @@ class SupabaseService:
         """Update attempt"""
         try:
             client = self._ensure_client()
-            response = client.table("attempts").update(update_data).eq("id", str(attempt_id)).execute()
+            response = self._execute(client.table("attempts").update(update_data).eq("id", _as_id(attempt_id)))
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error updating attempt: {str(e)}")
@@ -398,12 +713,12 @@ class SupabaseService:
         """Get attempts for a user"""
         try:
             client = self._ensure_client()
-            query = client.table("attempts").select("*").eq("user_id", str(user_id))
+            query = client.table("attempts").select("*").eq("user_id", _as_id(user_id))
             
             if assessment_id:
-                query = query.eq("assessment_id", str(assessment_id))
+                query = query.eq("assessment_id", _as_id(assessment_id))
             
-            response = query.order("created_at", desc=True).execute()
+            response = self._execute(query.order("created_at", desc=True))
             return response.data if response.data else []
         except Exception as e:
             logger.error(f"Error getting user attempts: {str(e)}")
@@ -423,11 +738,27 @@ class SupabaseService:
             logger.error(f"Error creating response: {str(e)}")
             raise
     
+    def create_responses_bulk(self, responses: List[Dict[str, Any]], return_rows: bool = True) -> List[Dict[str, Any]]:
+        """
+        Create multiple responses in as few requests as possible
+        
+        Args:
+            responses: Response rows to insert
+            return_rows: Set to False when the caller ignores the inserted rows
+        """
+        if not responses:
+            return []
+        try:
+            return self._insert_bulk("responses", responses, return_rows)
+        except Exception as e:
+            logger.error(f"Error creating responses in bulk: {str(e)}")
+            raise
+    
     def get_response(self, response_id: UUID) -> Optional[Dict[str, Any]]:
         """Get response by ID"""
         try:
             client = self._ensure_client()
-            response = client.table("responses").select("*").eq("id", str(response_id)).execute()
+            response = self._execute(client.table("responses").select("*").eq("id", _as_id(response_id)))
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error getting response: {str(e)}")
@@ -437,7 +768,7 @@ class SupabaseService:
         """Update response"""
         try:
             client = self._ensure_client()
-            response = client.table("responses").update(update_data).eq("id", str(response_id)).execute()
+            response = self._execute(client.table("responses").update(update_data).eq("id", _as_id(response_id)))
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error updating response: {str(e)}")
@@ -445,9 +776,13 @@ class SupabaseService:
     
     def get_attempt_responses(self, attempt_id: UUID) -> List[Dict[str, Any]]:
         """Get all responses for an attempt"""
+        rows = pg_pool.fetch_json("SELECT row_to_json(r) FROM responses r WHERE r.attempt_id = %s", (_as_id(attempt_id),))
+        if rows is not None:
+            return rows
+        
         try:
             client = self._ensure_client()
-            response = client.table("responses").select("*").eq("attempt_id", str(attempt_id)).execute()
+            response = self._execute(client.table("responses").select("*").eq("attempt_id", _as_id(attempt_id)))
             return response.data if response.data else []
         except Exception as e:
             logger.error(f"Error getting attempt responses: {str(e)}")
@@ -471,7 +806,7 @@ class SupabaseService:
         """Get result by attempt ID"""
         try:
             client = self._ensure_client()
-            response = client.table("results").select("*").eq("attempt_id", str(attempt_id)).execute()
+            response = self._execute(client.table("results").select("*").eq("attempt_id", _as_id(attempt_id)))
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error getting result: {str(e)}")
@@ -481,7 +816,7 @@ class SupabaseService:
         """Update result"""
         try:
             client = self._ensure_client()
-            response = client.table("results").update(update_data).eq("id", str(result_id)).execute()
+            response = self._execute(client.table("results").update(update_data).eq("id", _as_id(result_id)))
             return response.data[0] if response.data else None
         except Exception as e:
             logger.error(f"Error updating result: {str(e)}")
@@ -491,8 +826,19 @@ class SupabaseService:
     # Storage Operations
     # ============================================
     
-    def upload_file(self, bucket_name: str, file_path: str, file_content: bytes, content_type: str = "application/pdf") -> Optional[str]:
-        """Upload file to Supabase Storage"""
+    def upload_file(
+        self,
+        bucket_name: str,
+        file_path: str,
+        file_content: Union[bytes, BinaryIO],
+        content_type: str = "application/pdf"
+    ) -> Optional[str]:
+        """
+        Upload file to Supabase Storage
+        
+        Pass a file opened with open(path, "rb") instead of bytes to stream
+        the body from disk rather than holding the whole file in memory.
+        """
         try:
             client = self._ensure_client()
             # Ensure bucket exists (create if not)
@@ -520,6 +866,40 @@ class SupabaseService:
             logger.error(f"Error getting signed URL: {str(e)}")
             return None
     
+    def get_file_stream(
+        self,
+        bucket_name: str,
+        file_path: str,
+        chunk_size: int = STORAGE_CHUNK_SIZE
+    ) -> Optional[Iterator[bytes]]:
+        """
+        Stream a file from Supabase Storage in chunks
+        
+        Args:
+            bucket_name: Storage bucket
+            file_path: Path of the file in the bucket
+            chunk_size: Bytes per yielded chunk
+        
+        Returns:
+            Iterator of byte chunks (e.g. for a StreamingResponse), or None if the
+            download can't be started; errors while streaming propagate from the iterator
+        """
+        url = self.get_signed_url(bucket_name, file_path, expires_in=60)
+        if not url or self._http_client is None:
+            return None
+        
+        def chunks() -> Iterator[bytes]:
+            try:
+                with self._http_client.stream("GET", url) as response:
+                    response.raise_for_status()
+                    yield from response.iter_bytes(chunk_size)
+            except Exception as e:
+                # Re-raise so the consumer aborts instead of seeing a truncated file end cleanly
+                logger.error(f"Error streaming file: {str(e)}")
+                raise
+        
+        return chunks()
+    
     def delete_file(self, bucket_name: str, file_path: str) -> bool:
         """Delete file from Supabase Storage"""
         try:
@@ -530,6 +910,113 @@ class SupabaseService:
             logger.error(f"Error deleting file: {str(e)}")
             return False
 
+    
+    # ============================================
+    # Async Read Operations
+    # ============================================
+    # The sync client blocks, so async routes run lookups on a worker
+    # thread; independent lookups can be awaited together with asyncio.gather.
+    
+    async def aget_profile(self, user_id: UUID) -> Optional[Dict[str, Any]]:
+        """Get user profile by ID without blocking the event loop"""
+        return await asyncio.to_thread(self.get_profile, user_id)
+    
+    async def aget_assessment(
+        self,
+        assessment_id: UUID,
+        use_cache: bool = True,
+        columns: str = "*"
+    ) -> Optional[Dict[str, Any]]:
+        """Get assessment by ID without blocking the event loop"""
+        return await asyncio.to_thread(self.get_assessment, assessment_id, use_cache, columns)
+    
+    async def alist_assessments(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        columns: str = "*"
+    ) -> List[Dict[str, Any]]:
+        """List assessments without blocking the event loop"""
+        return await asyncio.to_thread(self.list_assessments, filters, columns)
+    
+    async def aget_questions_batch(
+        self,
+        question_ids: List[UUID],
+        use_cache: bool = True,
+        columns: str = QUESTION_COLUMNS
+    ) -> Dict[str, Dict[str, Any]]:
+        """Get multiple questions by IDs without blocking the event loop"""
+        return await asyncio.to_thread(self.get_questions_batch, question_ids, use_cache, columns)
+    
+    async def aget_assessment_questions(
+        self,
+        assessment_id: UUID,
+        limit: Optional[int] = None,
+        use_cache: bool = True,
+        columns: str = QUESTION_COLUMNS
+    ) -> List[Dict[str, Any]]:
+        """Get questions for an assessment without blocking the event loop"""
+        return await asyncio.to_thread(self.get_assessment_questions, assessment_id, limit, use_cache, columns)
+    
+    async def aget_assessment_with_questions(
+        self,
+        assessment_id: UUID,
+        limit: Optional[int] = None,
+        use_cache: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """Get an assessment and its questions without blocking the event loop"""
+        return await asyncio.to_thread(self.get_assessment_with_questions, assessment_id, limit, use_cache)
+    
+    async def aget_attempt(self, attempt_id: UUID) -> Optional[Dict[str, Any]]:
+        """Get attempt by ID without blocking the event loop"""
+        return await asyncio.to_thread(self.get_attempt, attempt_id)
+    
+    async def aget_attempt_responses(self, attempt_id: UUID) -> List[Dict[str, Any]]:
+        """Get all responses for an attempt without blocking the event loop"""
+        return await asyncio.to_thread(self.get_attempt_responses, attempt_id)
+    
+    async def aget_result(self, attempt_id: UUID) -> Optional[Dict[str, Any]]:
+        """Get result by attempt ID without blocking the event loop"""
+        return await asyncio.to_thread(self.get_result, attempt_id)
+
+    
+    async def get_attempt_bundle(
+        self,
+        attempt_id: UUID,
+        assessment_id: Optional[UUID] = None
+    ) -> AttemptBundle:
+        """
+        Load an attempt with its assessment, questions and responses concurrently
+        
+        Args:
+            attempt_id: Attempt ID
+            assessment_id: Assessment ID, if already known (all four lookups
+                then run at once; otherwise it is read from the attempt first)
+        
+        Returns:
+            AttemptBundle (attempt is None if not found)
+        """
+        if assessment_id is not None:
+            attempt, responses, assessment, questions = await asyncio.gather(
+                self.aget_attempt(attempt_id),
+                self.aget_attempt_responses(attempt_id),
+                self.aget_assessment(assessment_id),
+                self.aget_assessment_questions(assessment_id)
+            )
+            return AttemptBundle(attempt, assessment, questions, responses)
+        
+        attempt, responses = await asyncio.gather(
+            self.aget_attempt(attempt_id),
+            self.aget_attempt_responses(attempt_id)
+        )
+        if not attempt or not attempt.get("assessment_id"):
+            return AttemptBundle(attempt, responses=responses)
+        
+        assessment, questions = await asyncio.gather(
+            self.aget_assessment(attempt["assessment_id"]),
+            self.aget_assessment_questions(attempt["assessment_id"])
+        )
+        return AttemptBundle(attempt, assessment, questions, responses)
+
 
 # Global service instance
 supabase_service = SupabaseService()
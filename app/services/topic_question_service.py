@@ -3,35 +3,301 @@ Service for generating questions from topics using existing embeddings
 Reuses embeddings from vimeo_video_chatbot project without re-processing
 """
 
-from typing import List, Dict, Any, Optional
-from openai import OpenAI
+from typing import List, Dict, Any, Final, Iterator, Optional, Tuple
+from datetime import datetime, timezone
+from itertools import islice
 from app.config import settings
-from app.services.supabase_service import supabase_service
+from app.services.openai_client import get_openai_client, retry_delay, MAX_RETRY_ATTEMPTS
+from app.services.supabase_service import supabase_service, BULK_INSERT_CHUNK_SIZE
+from app.services.background_writer import background_writer
 from app.services.embedding_service import embedding_service
 from app.services.rag_service import rag_service
+from app.utils.cache import cache
 from app.utils.logger import logger
-import json
+from app.utils.rate_limit import openai_limiter
+import hashlib
+import time
+import uuid
+import orjson
+from postgrest.types import ReturnMethod
+
+# System message shared by every question generation request
+_QUESTION_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "You are an expert question generator for educational assessments. Always respond with valid JSON only. Do not include markdown code blocks."
+}
+
+# Structured output schema: the model must return {"questions": [...]}
+# (an object root is required by the API)
+QUESTIONS_SCHEMA: Final = {
+    "type": "object",
+    "properties": {
+        "questions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "question": {"type": "string"},
+                    "options": {"type": "array", "items": {"type": "string"}},
+                    "correct_answer": {"type": "string"},
+                    "explanation": {"type": "string"}
+                },
+                "required": ["question", "options", "correct_answer", "explanation"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["questions"],
+    "additionalProperties": False
+}
+_QUESTIONS_RESPONSE_FORMAT: Final = {
+    "type": "json_schema",
+    "json_schema": {"name": "questions", "schema": QUESTIONS_SCHEMA, "strict": True}
+}
+
+# Question generation prompts ({topic}, {num}, {diff}, {ctx} are filled per call)
+_MCQ_PROMPT_TMPL: Final = """Based on the following content about {topic}, generate exactly {num} multiple-choice questions at {diff} difficulty level.
+
+Content:
+{ctx}
+
+For each question, provide:
+1. A clear, concise question text
+2. Four options (A, B, C, D) where only one is correct
+3. The correct answer (A, B, C, or D)
+4. A brief explanation of why the answer is correct
+
+Format as a JSON object with this exact structure:
+{{
+  "questions": [
+    {{
+      "question": "Question text here",
+      "options": ["Option A text", "Option B text", "Option C text", "Option D text"],
+      "correct_answer": "A",
+      "explanation": "Brief explanation of the correct answer"
+    }}
+  ]
+}}
+
+Ensure all questions are relevant to the topic "{topic}" and based on the provided content. Questions should test understanding, not just recall."""
+
+_DESC_PROMPT_TMPL: Final = """Based on the following content about {topic}, generate exactly {num} descriptive/open-ended questions at {diff} difficulty level.
+
+Content:
+{ctx}
+
+For each question, provide:
+1. A clear, thought-provoking question text
+2. Key points that should be covered in a good answer
+
+Format as a JSON object with this exact structure:
+{{
+  "questions": [
+    {{
+      "question": "Question text here",
+      "options": [],  # Empty for descriptive questions
+      "correct_answer": "Key points that should be covered in the answer",
+      "explanation": "Additional context or rubric if needed"
+    }}
+  ]
+}}
+
+Ensure all questions are relevant to the topic "{topic}" and based on the provided content."""
+
+# Prompt limits for generation requests (template + topic + context)
+MAX_CONTEXT_CHUNKS: Final = 10
+MAX_PROMPT_TOKENS: Final = 6500
+# Chunks sharing this many leading (whitespace-normalized) characters count as duplicates
+_FINGERPRINT_CHARS: Final = 128
+
+# Columns returned when listing stored questions (skips source/assessment links)
+_STORED_QUESTION_COLUMNS: Final = "id, topic, question, options, correct_answer, explanation, difficulty, created_at"
+
+# Generated questions are reused for identical (topic, settings, chunks) requests
+GENERATED_QUESTIONS_TTL = 86400  # 24 hours
+
+# OpenAI Batch API job states that will not change any more
+_BATCH_FINAL_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+# batch_jobs.status while one poller owns the ingestion of a finished job
+_BATCH_INGESTING_STATUS = "ingesting"
+
+
+def _estimate_tokens(text: str) -> int:
+    """Approximate token count (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+# Token cost of each template's fixed text, computed once at import
+_TEMPLATE_TOKENS: Final = {
+    tmpl: _estimate_tokens(tmpl.format_map({'topic': '', 'num': '', 'diff': '', 'ctx': ''}))
+    for tmpl in (_MCQ_PROMPT_TMPL, _DESC_PROMPT_TMPL)
+}
+
+
+def _pack_chunks(chunks: List[Dict[str, Any]], max_tokens: int) -> List[str]:
+    """
+    Format context chunks for a prompt, skipping near-duplicates, within a token budget
+    
+    Overlapping embedding windows often produce chunks that start with the same
+    text; only the first (highest ranked) of those is kept. Packing stops before
+    the running total would exceed the budget (the first chunk is always kept)
+    or after MAX_CONTEXT_CHUNKS chunks.
+    
+    Args:
+        chunks: Chunks in ranking order
+        max_tokens: Approximate prompt token budget for the context
+    
+    Returns:
+        Formatted chunk strings
+    """
+    seen = set()
+    packed = []
+    used = 0
+    for chunk in chunks:
+        text = chunk.get('chunk_text', '')
+        fingerprint = " ".join(text[:_FINGERPRINT_CHARS * 2].split())[:_FINGERPRINT_CHARS]
+        if fingerprint in seen:
+            continue
+        seen.add(fingerprint)
+        
+        formatted = f"[{chunk.get('source_type', 'unknown').upper()} - {chunk.get('source_name', 'source')}]\n{text}"
+        tokens = _estimate_tokens(formatted)
+        if packed and used + tokens > max_tokens:
+            break
+        used += tokens
+        packed.append(formatted)
+        if len(packed) >= MAX_CONTEXT_CHUNKS:
+            break
+    return packed
+
+
+def _build_prompt(
+    topic: str,
+    chunks: List[Dict[str, Any]],
+    num_questions: int,
+    question_type: str,
+    difficulty: str
+) -> str:
+    """
+    Build the question generation prompt for a topic
+    
+    Args:
+        topic: Topic or subject
+        chunks: Relevant content chunks in ranking order (see _pack_chunks)
+        num_questions: Number of questions to ask for
+        question_type: Type of question ('mcq' or 'descriptive')
+        difficulty: Difficulty level ('easy', 'medium', 'hard')
+    
+    Returns:
+        User prompt text
+    """
+    tmpl = _MCQ_PROMPT_TMPL if question_type == "mcq" else _DESC_PROMPT_TMPL
+    
+    # Whatever the template and topic (used twice) leave of the budget goes to context
+    budget = MAX_PROMPT_TOKENS - _TEMPLATE_TOKENS[tmpl] - 2 * _estimate_tokens(topic)
+    context_text = "\n\n".join(_pack_chunks(chunks, budget))
+    
+    return tmpl.format_map({'topic': topic, 'num': num_questions, 'diff': difficulty, 'ctx': context_text})
+
+
+def _generation_cache_key(
+    topic: str,
+    chunks: List[Dict[str, Any]],
+    num_questions: int,
+    question_type: str,
+    difficulty: str
+) -> str:
+    """Cache key for generated questions: the prompt is fully determined by these inputs"""
+    ids = sorted(str(chunk.get('id') or chunk.get('chunk_text', '')[:64]) for chunk in chunks)
+    digest = hashlib.md5(
+        f"{topic}|{question_type}|{difficulty}|{num_questions}|{'|'.join(ids)}".encode("utf-8")
+    ).hexdigest()
+    return f"generated_questions:{digest}"
+
+
+def _question_record(question: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build a skill_assessment_questions row for a generated question
+    
+    IDs are generated here so inserts don't need to return the rows.
+    Note: source_type and source_id are not stored as per user requirements.
+    """
+    return {
+        'id': str(uuid.uuid4()),
+        'topic': question.get('topic', ''),
+        'question': question.get('question', ''),
+        'options': question.get('options', []),
+        'correct_answer': question.get('correct_answer', ''),
+        'explanation': question.get('explanation', ''),
+        'difficulty': question.get('difficulty', 'medium')
+    }
+
+
+def _parse_questions(content: str) -> List[Dict[str, Any]]:
+    """
+    Parse the questions from a structured-output LLM response
+    
+    Args:
+        content: Response text, a JSON object matching QUESTIONS_SCHEMA
+    
+    Returns:
+        List of question dicts
+    
+    Raises:
+        orjson.JSONDecodeError: If the payload is not valid JSON
+    """
+    payload = orjson.loads(content)
+    if isinstance(payload, dict):
+        payload = payload.get("questions", [payload])
+    
+    # Ensure it's a list
+    if not isinstance(payload, list):
+        payload = [payload]
+    return payload
+
+
+def _annotate_questions(
+    questions: List[Dict[str, Any]],
+    topic: str,
+    chunks: List[Dict[str, Any]],
+    question_type: str,
+    difficulty: str
+) -> List[Dict[str, Any]]:
+    """Add topic, difficulty and source metadata to generated questions in place"""
+    # Determine source type from the top chunks
+    source_types = set(chunk.get('source_type') for chunk in islice(chunks, 5))
+    source_type = 'both' if len(source_types) > 1 else (list(source_types)[0] if source_types else None)
+    
+    # Get source_id from first chunk if available
+    source_id = chunks[0].get('source_id') if chunks else None
+    
+    # Enhance questions with metadata
+    for question in questions:
+        question['topic'] = topic
+        question['difficulty'] = difficulty
+        question['source_type'] = source_type
+        question['source_id'] = source_id
+        question['question_type'] = question_type
+    
+    return questions
 
 
 class TopicQuestionService:
     """Service for generating questions from topics using existing embeddings"""
     
+    # Single long-lived instance; slots make the per-request client lookups cheaper
+    __slots__ = ("client",)
+    
     def __init__(self):
         """Initialize topic question service"""
         self.client = None
         self._initialize_openai_client()
     
     def _initialize_openai_client(self):
-        """Initialize OpenAI client"""
-        try:
-            if settings.OPENAI_API_KEY and "your-openai" not in settings.OPENAI_API_KEY:
-                self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-            else:
-                logger.warning("OpenAI API key not configured. Question generation will not work.")
-                self.client = None
-        except Exception as e:
-            logger.error(f"Error initializing OpenAI client: {str(e)}")
-            self.client = None
+        """Attach the shared OpenAI client"""
+        self.client = get_openai_client()
+        if not self.client:
+            logger.warning("OpenAI API key not configured. Question generation will not work.")
     
     def fetch_embeddings_by_topic(
         self,
@@ -54,7 +320,8 @@ class TopicQuestionService:
         """
         try:
             # Use existing RAG service to search for similar chunks
-            # This reuses existing embeddings without re-processing
+            # This reuses existing embeddings without re-processing; repeated and
+            # near-duplicate topics are served from its semantic search cache
             chunks = rag_service.search_similar_chunks(
                 query_text=topic,
                 source_type=source_type,
@@ -75,17 +342,22 @@ class TopicQuestionService:
         chunks: List[Dict[str, Any]],
         num_questions: int = 5,
         question_type: str = "mcq",
-        difficulty: str = "medium"
+        difficulty: str = "medium",
+        force_regen: bool = False
     ) -> List[Dict[str, Any]]:
         """
         Generate multiple-choice questions from retrieved content chunks
         
+        Identical requests (same topic, settings and chunks) within
+        GENERATED_QUESTIONS_TTL reuse the previous questions.
+        
         Args:
             topic: Topic or subject
             chunks: List of relevant content chunks from embeddings
             num_questions: Number of questions to generate (5-10)
             question_type: Type of question ('mcq' or 'descriptive')
             difficulty: Difficulty level ('easy', 'medium', 'hard')
+            force_regen: Skip the cache and always call OpenAI
         
         Returns:
             List of generated questions with options and answers
@@ -102,109 +374,38 @@ class TopicQuestionService:
             # Limit number of questions
             num_questions = min(max(num_questions, 5), 10)
             
-            # Combine context chunks
-            context_text = "\n\n".join([
-                f"[{chunk.get('source_type', 'unknown').upper()} - {chunk.get('source_name', 'source')}]\n{chunk.get('chunk_text', '')}"
-                for chunk in chunks[:10]  # Limit to top 10 chunks
-            ])
+            cache_key = _generation_cache_key(topic, chunks, num_questions, question_type, difficulty)
+            if not force_regen:
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    return [dict(question) for question in cached]
             
-            # Build prompt for MCQ generation
-            if question_type == "mcq":
-                prompt = f"""Based on the following content about {topic}, generate exactly {num_questions} multiple-choice questions at {difficulty} difficulty level.
-
-Content:
-{context_text}
-
-For each question, provide:
-1. A clear, concise question text
-2. Four options (A, B, C, D) where only one is correct
-3. The correct answer (A, B, C, or D)
-4. A brief explanation of why the answer is correct
-
-Format as JSON array with this exact structure:
-[
-  {{
-    "question": "Question text here",
-    "options": ["Option A text", "Option B text", "Option C text", "Option D text"],
-    "correct_answer": "A",
-    "explanation": "Brief explanation of the correct answer"
-  }}
-]
-
-Ensure all questions are relevant to the topic "{topic}" and based on the provided content. Questions should test understanding, not just recall."""
-            else:
-                # Descriptive questions
-                prompt = f"""Based on the following content about {topic}, generate exactly {num_questions} descriptive/open-ended questions at {difficulty} difficulty level.
-
-Content:
-{context_text}
-
-For each question, provide:
-1. A clear, thought-provoking question text
-2. Key points that should be covered in a good answer
-
-Format as JSON array with this exact structure:
-[
-  {{
-    "question": "Question text here",
-    "options": [],  # Empty for descriptive questions
-    "correct_answer": "Key points that should be covered in the answer",
-    "explanation": "Additional context or rubric if needed"
-  }}
-]
-
-Ensure all questions are relevant to the topic "{topic}" and based on the provided content."""
+            prompt = _build_prompt(topic, chunks, num_questions, question_type, difficulty)
             
             # Generate questions using OpenAI
-            response = self.client.chat.completions.create(
+            response = self._call_with_retry(
                 model=settings.OPENAI_MODEL,
                 messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert question generator for educational assessments. Always respond with valid JSON only. Do not include markdown code blocks."
-                    },
+                    _QUESTION_SYSTEM_MESSAGE,
                     {
                         "role": "user",
                         "content": prompt
                     }
                 ],
                 temperature=0.7,
-                max_tokens=3000
+                max_tokens=3000,
+                response_format=_QUESTIONS_RESPONSE_FORMAT
             )
             
             # Parse response
-            content = response.choices[0].message.content.strip()
-            
-            # Try to extract JSON from markdown code blocks if present
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-            
-            questions = json.loads(content)
-            
-            # Ensure it's a list
-            if not isinstance(questions, list):
-                questions = [questions]
-            
-            # Add metadata and determine source type
-            source_types = set(chunk.get('source_type') for chunk in chunks[:5])
-            source_type = 'both' if len(source_types) > 1 else (list(source_types)[0] if source_types else None)
-            
-            # Get source_id from first chunk if available
-            source_id = chunks[0].get('source_id') if chunks else None
-            
-            # Enhance questions with metadata
-            for question in questions:
-                question['topic'] = topic
-                question['difficulty'] = difficulty
-                question['source_type'] = source_type
-                question['source_id'] = source_id
-                question['question_type'] = question_type
+            content = response.choices[0].message.content
+            questions = _annotate_questions(_parse_questions(content), topic, chunks, question_type, difficulty)
             
+            if questions:
+                cache.set(cache_key, [dict(question) for question in questions], ttl_seconds=GENERATED_QUESTIONS_TTL)
             return questions
             
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             logger.error(f"Error parsing JSON response: {str(e)}")
             logger.error(f"Response content: {content[:500] if 'content' in locals() else 'N/A'}")
             return []
@@ -212,6 +413,21 @@ Ensure all questions are relevant to the topic "{topic}" and based on the provid
             logger.error(f"Error generating questions from embeddings: {str(e)}")
             return []
     
+    def _call_with_retry(self, **kwargs):
+        """Call chat.completions.create, retrying rate limits and transient errors with backoff"""
+        # Retries are handled here, so the SDK's own retries are switched off
+        client = self.client.with_options(max_retries=0)
+        for attempt in range(MAX_RETRY_ATTEMPTS):
+            try:
+                openai_limiter.acquire()
+                return client.chat.completions.create(**kwargs)
+            except Exception as e:
+                delay = retry_delay(e, attempt)
+                if delay is None or attempt == MAX_RETRY_ATTEMPTS - 1:
+                    raise
+                logger.warning(f"Question generation request failed ({str(e)}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+    
     def store_questions(
         self,
         questions: List[Dict[str, Any]]
@@ -231,45 +447,56 @@ Ensure all questions are relevant to the topic "{topic}" and based on the provid
                 return {'success': False, 'error': 'Supabase client not available'}
             
             # Prepare records for insertion
-            # Note: Do not store source_type or source_id as per user requirements
-            records = []
-            for question in questions:
-                record = {
-                    'topic': question.get('topic', ''),
-                    'question': question.get('question', ''),
-                    'options': question.get('options', []),
-                    'correct_answer': question.get('correct_answer', ''),
-                    'explanation': question.get('explanation', ''),
-                    'difficulty': question.get('difficulty', 'medium')
-                }
-                records.append(record)
+            records = [_question_record(question) for question in questions]
             
             if not records:
                 return {'success': False, 'error': 'No questions to store'}
             
-            # Insert in batches
-            batch_size = 50
+            # Insert in large batches; a failed batch is recorded and the rest still run
             inserted_ids = []
+            failed_count = 0
             
-            for i in range(0, len(records), batch_size):
-                batch = records[i:i + batch_size]
+            for i in range(0, len(records), BULK_INSERT_CHUNK_SIZE):
+                batch = records[i:i + BULK_INSERT_CHUNK_SIZE]
                 try:
-                    response = client.table('skill_assessment_questions').insert(batch).execute()
-                    if response.data:
-                        inserted_ids.extend([q.get('id') for q in response.data])
+                    client.table('skill_assessment_questions').insert(batch, returning=ReturnMethod.minimal).execute()
+                    inserted_ids.extend(record['id'] for record in batch)
                 except Exception as e:
+                    failed_count += len(batch)
                     logger.error(f"Error inserting questions batch: {str(e)}")
             
             return {
                 'success': True,
                 'inserted_count': len(inserted_ids),
-                'question_ids': inserted_ids
+                'question_ids': inserted_ids,
+                'failed_count': failed_count
             }
             
         except Exception as e:
             logger.error(f"Error storing questions: {str(e)}")
             return {'success': False, 'error': str(e)}
     
+    def enqueue_store_questions(
+        self,
+        questions: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Queue generated questions for insertion on the background writer
+        
+        The rows are written within background_writer's flush delay; failed
+        writes are logged, not reported back.
+        
+        Args:
+            questions: List of question dictionaries
+        
+        Returns:
+            The queued records, including their pre-assigned IDs
+        """
+        records = [_question_record(question) for question in questions]
+        for record in records:
+            background_writer.enqueue('skill_assessment_questions', record)
+        return records
+    
     def generate_and_store_questions(
         self,
         topic: str,
@@ -278,7 +505,8 @@ Ensure all questions are relevant to the topic "{topic}" and based on the provid
         question_type: str = "mcq",
         difficulty: str = "medium",
         match_threshold: float = 0.7,
-        match_count: int = 10
+        match_count: int = 10,
+        store_in_background: bool = False
     ) -> Dict[str, Any]:
         """
         Complete workflow: Fetch embeddings → Generate questions → Store in database
@@ -291,6 +519,11 @@ Ensure all questions are relevant to the topic "{topic}" and based on the provid
             difficulty: Difficulty level ('easy', 'medium', 'hard')
             match_threshold: Similarity threshold for retrieval
             match_count: Maximum number of chunks to retrieve
+            store_in_background: Return as soon as the questions are generated and
+                write them on the background writer; the stored rows are returned
+                under "records" with stored_pending=True. Failed background writes
+                are only logged, so don't use this when the IDs are handed to a
+                user or referenced by other rows (e.g. responses)
         
         Returns:
             Dictionary with success status and generated questions
@@ -326,6 +559,19 @@ Ensure all questions are relevant to the topic "{topic}" and based on the provid
                 }
             
             # Step 3: Store questions in database
+            if store_in_background:
+                # Keep the Supabase inserts off the caller's critical path
+                records = self.enqueue_store_questions(questions)
+                return {
+                    'success': True,
+                    'topic': topic,
+                    'questions': questions,
+                    'records': records,
+                    'stored_count': 0,
+                    'stored_pending': True,
+                    'question_ids': [record['id'] for record in records]
+                }
+            
             store_result = self.store_questions(questions)
             
             if not store_result.get('success'):
@@ -350,17 +596,212 @@ Ensure all questions are relevant to the topic "{topic}" and based on the provid
                 'error': str(e)
             }
     
+    def submit_question_batch(
+        self,
+        topic_chunk_pairs: List[Tuple[str, List[Dict[str, Any]]]],
+        num_questions: int = 5,
+        question_type: str = "mcq",
+        difficulty: str = "medium"
+    ) -> Optional[str]:
+        """
+        Submit question generation for many topics as one OpenAI Batch API job
+        
+        Batch jobs cost half as much as real-time completions and finish within
+        24h; use this for bulk seeding instead of generate_and_store_questions.
+        Finished jobs are ingested by poll_question_batches.
+        
+        Args:
+            topic_chunk_pairs: (topic, chunks) pairs, chunks as returned by
+                fetch_embeddings_by_topic
+            num_questions: Number of questions per topic (5-10)
+            question_type: Type of question ('mcq' or 'descriptive')
+            difficulty: Difficulty level ('easy', 'medium', 'hard')
+        
+        Returns:
+            OpenAI batch ID, or None if submission failed
+        """
+        try:
+            if not self.client:
+                logger.error("OpenAI client not initialized")
+                return None
+            
+            num_questions = min(max(num_questions, 5), 10)
+            lines = []
+            requests = {}
+            for i, (topic, chunks) in enumerate(topic_chunk_pairs):
+                if not chunks:
+                    logger.warning(f"No chunks for topic {topic}, skipping it in batch")
+                    continue
+                custom_id = f"q-{i}"
+                lines.append(orjson.dumps({
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": settings.OPENAI_MODEL,
+                        "messages": [
+                            _QUESTION_SYSTEM_MESSAGE,
+                            {"role": "user", "content": _build_prompt(topic, chunks, num_questions, question_type, difficulty)}
+                        ],
+                        "temperature": 0.7,
+                        "max_tokens": 3000,
+                        "response_format": _QUESTIONS_RESPONSE_FORMAT
+                    }
+                }))
+                # Metadata applied to the generated questions on ingestion
+                annotated = _annotate_questions([{}], topic, chunks, question_type, difficulty)
+                requests[custom_id] = annotated[0]
+            
+            if not lines:
+                logger.warning("No topics with content to submit")
+                return None
+            
+            input_file = self.client.files.create(
+                file=("questions_batch.jsonl", b"\n".join(lines)),
+                purpose="batch"
+            )
+            batch = self.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            
+            client = supabase_service.get_client()
+            if client:
+                client.table('batch_jobs').insert({
+                    'batch_id': batch.id,
+                    'input_file_id': input_file.id,
+                    'status': batch.status,
+                    'request_count': len(lines),
+                    'requests': requests
+                }).execute()
+            else:
+                logger.warning(f"Supabase client not available - batch {batch.id} will not be ingested automatically")
+            
+            logger.info(f"Submitted question batch {batch.id} with {len(lines)} topics")
+            return batch.id
+            
+        except Exception as e:
+            logger.error(f"Error submitting question batch: {str(e)}")
+            return None
+    
+    def poll_question_batches(self) -> Dict[str, int]:
+        """
+        Check pending batch jobs and store the questions of finished ones
+        
+        A finished job is claimed with a conditional update before its output is
+        ingested, so overlapping pollers never store the same batch twice.
+        
+        Returns:
+            Dictionary with the number of jobs still pending and finished this call
+        """
+        summary = {'pending': 0, 'finished': 0}
+        try:
+            client = supabase_service.get_client()
+            if not client or not self.client:
+                return summary
+            
+            response = client.table('batch_jobs')\
+                .select('id, batch_id, requests')\
+                .is_('completed_at', 'null')\
+                .neq('status', _BATCH_INGESTING_STATUS)\
+                .execute()
+            
+            for job in response.data or []:
+                try:
+                    batch = self.client.batches.retrieve(job['batch_id'])
+                    if batch.status not in _BATCH_FINAL_STATUSES:
+                        summary['pending'] += 1
+                        continue
+                    
+                    # Only the poller whose update matches the row ingests it
+                    claim = client.table('batch_jobs')\
+                        .update({'status': _BATCH_INGESTING_STATUS})\
+                        .eq('id', job['id'])\
+                        .is_('completed_at', 'null')\
+                        .neq('status', _BATCH_INGESTING_STATUS)\
+                        .execute()
+                    if not claim.data:
+                        continue
+                    
+                    # Expired jobs can still have partial output
+                    inserted_count = 0
+                    if batch.output_file_id:
+                        try:
+                            inserted_count = self._ingest_batch_output(batch.output_file_id, job.get('requests') or {})
+                        except Exception:
+                            # Release the claim so the next poll retries the job
+                            client.table('batch_jobs').update({'status': batch.status}).eq('id', job['id']).execute()
+                            raise
+                    
+                    client.table('batch_jobs').update({
+                        'status': batch.status,
+                        'output_file_id': batch.output_file_id,
+                        'inserted_count': inserted_count,
+                        'completed_at': datetime.now(timezone.utc).isoformat()
+                    }).eq('id', job['id']).execute()
+                    summary['finished'] += 1
+                    logger.info(f"Question batch {batch.id} {batch.status}: stored {inserted_count} questions")
+                except Exception as e:
+                    logger.error(f"Error polling question batch {job.get('batch_id')}: {str(e)}")
+            
+            return summary
+            
+        except Exception as e:
+            logger.error(f"Error polling question batches: {str(e)}")
+            return summary
+    
+    def _ingest_batch_output(self, output_file_id: str, requests: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Parse a batch output file and store the generated questions
+        
+        Args:
+            output_file_id: OpenAI file ID of the batch output
+            requests: custom_id -> question metadata recorded at submission
+        
+        Returns:
+            Number of questions stored
+        """
+        questions = []
+        # orjson parses the raw bytes, no decode step needed
+        for line in self.client.files.content(output_file_id).content.splitlines():
+            if not line.strip():
+                continue
+            try:
+                result = orjson.loads(line)
+                response = result.get('response') or {}
+                if response.get('status_code') != 200:
+                    logger.warning(f"Batch request {result.get('custom_id')} failed: {result.get('error')}")
+                    continue
+                content = response['body']['choices'][0]['message']['content']
+                metadata = requests.get(result.get('custom_id'), {})
+                for question in _parse_questions(content):
+                    question.update(metadata)
+                    questions.append(question)
+            except (orjson.JSONDecodeError, KeyError, IndexError, TypeError) as e:
+                logger.warning(f"Skipping unparseable batch result: {str(e)}")
+        
+        if not questions:
+            return 0
+        store_result = self.store_questions(questions)
+        return store_result.get('inserted_count', 0)
+    
     def get_questions_by_topic(
         self,
         topic: str,
-        limit: int = 50
+        limit: int = 50,
+        before: Optional[Tuple[str, str]] = None
     ) -> List[Dict[str, Any]]:
         """
-        Retrieve stored questions by topic
+        Retrieve one page of stored questions by topic, newest first
         
         Args:
             topic: Topic to filter by
             limit: Maximum number of questions to return
+            before: Cursor - (created_at, id) of the last row of the previous page;
+                only rows after it in (created_at desc, id desc) order are returned.
+                id breaks ties between rows inserted in the same transaction, which
+                share created_at
         
         Returns:
             List of questions
@@ -370,10 +811,18 @@ Ensure all questions are relevant to the topic "{topic}" and based on the provid
             if not client:
                 return []
             
-            response = client.table('skill_assessment_questions')\
-                .select('*')\
-                .eq('topic', topic)\
+            query = client.table('skill_assessment_questions')\
+                .select(_STORED_QUESTION_COLUMNS)\
+                .eq('topic', topic)
+            if before:
+                created_at, question_id = before
+                query = query.or_(
+                    f'created_at.lt."{created_at}",'
+                    f'and(created_at.eq."{created_at}",id.lt.{question_id})'
+                )
+            response = query\
                 .order('created_at', desc=True)\
+                .order('id', desc=True)\
                 .limit(limit)\
                 .execute()
             
@@ -382,6 +831,32 @@ Ensure all questions are relevant to the topic "{topic}" and based on the provid
         except Exception as e:
             logger.error(f"Error retrieving questions by topic: {str(e)}")
             return []
+    
+    def iter_questions_by_topic(
+        self,
+        topic: str,
+        page_size: int = 100
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream all stored questions for a topic, newest first
+        
+        Pages through get_questions_by_topic with a (created_at, id) cursor, so only
+        one page is held in memory at a time.
+        
+        Args:
+            topic: Topic to filter by
+            page_size: Rows fetched per request
+        
+        Yields:
+            Question dictionaries
+        """
+        cursor = None
+        while True:
+            page = self.get_questions_by_topic(topic, limit=page_size, before=cursor)
+            yield from page
+            if len(page) < page_size:
+                return
+            cursor = (page[-1]['created_at'], page[-1]['id'])
 
 
 # Global service instance
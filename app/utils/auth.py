@@ -7,18 +7,47 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional
 from supabase import create_client, Client
 from datetime import datetime, timedelta, timezone
+from threading import Lock
+import base64
+import hashlib
+import time
 import uuid
+import orjson
+from jose import jwt, ExpiredSignatureError, JWTError
 
 from app.config import settings
+from app.utils.cache import cache
 from app.utils.error_handler import UnauthorizedError, ForbiddenError
 from app.utils.logger import logger
 
 
 security = HTTPBearer(auto_error=False)
 
+# Verified tokens are trusted for at most this long (and never past their exp)
+JWT_CACHE_TTL = 60  # seconds
+
+# Audience Supabase Auth puts in access tokens for signed-in users
+SUPABASE_JWT_AUDIENCE = "authenticated"
+
+
+def _token_expiry(token: str) -> Optional[float]:
+    """
+    Read the exp claim from a JWT without verifying it
+    
+    Only used to bound how long an already verified token stays cached.
+    """
+    try:
+        payload = token.split(".")[1]
+        claims = orjson.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        exp = claims.get("exp")
+        return float(exp) if exp is not None else None
+    except Exception:
+        return None
+
 
 # Cache client to avoid recreation - optimized
 _cached_client: Optional[Client] = None
+_client_lock = Lock()
 
 def get_supabase_client() -> Optional[Client]:
     """Create and return Supabase client - optimized with caching"""
@@ -27,30 +56,111 @@ def get_supabase_client() -> Optional[Client]:
     if _cached_client is not None:
         return _cached_client
     
-    try:
-        if not settings.SUPABASE_URL or not settings.SUPABASE_KEY:
-            logger.warning("Supabase credentials not configured")
+    # Double-checked locking so concurrent first requests build a single client
+    with _client_lock:
+        if _cached_client is not None:
+            return _cached_client
+        try:
+            if not settings.SUPABASE_URL or not settings.SUPABASE_KEY:
+                logger.warning("Supabase credentials not configured")
+                return None
+            if "your-project" in settings.SUPABASE_URL or "your-supabase" in settings.SUPABASE_KEY:
+                logger.warning("Supabase credentials appear to be placeholders")
+                return None
+            _cached_client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+            return _cached_client
+        except Exception as e:
+            logger.error(f"Failed to create Supabase client: {str(e)}")
             return None
-        if "your-project" in settings.SUPABASE_URL or "your-supabase" in settings.SUPABASE_KEY:
-            logger.warning("Supabase credentials appear to be placeholders")
-            return None
-        _cached_client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
-        return _cached_client
-    except Exception as e:
-        logger.error(f"Failed to create Supabase client: {str(e)}")
-        return None
+
+
+def _user_from_claims(claims: dict) -> dict:
+    """
+    Map verified Supabase access token claims to the user info dict
+    
+    email_verified is only set from server-controlled claims (a top-level
+    email_confirmed_at or app_metadata.email_verified); user_metadata is
+    writable by the user and can't be trusted for it. Standard access tokens
+    carry neither, so the field is usually left unset; resolve_email_verified
+    looks it up when it is actually needed.
+    """
+    user_metadata = claims.get("user_metadata") or {}
+    user_info = {
+        "id": claims["sub"],
+        "email": claims.get("email") or "",
+        "role": user_metadata.get("role", "user")
+    }
+    
+    app_metadata = claims.get("app_metadata") or {}
+    if "email_confirmed_at" in claims:
+        user_info["email_verified"] = claims["email_confirmed_at"] is not None
+    elif "email_verified" in app_metadata:
+        user_info["email_verified"] = bool(app_metadata["email_verified"])
+    return user_info
 
 
 def verify_jwt_token(token: str) -> Optional[dict]:
     """
     Verify JWT token and extract user information
     
+    With JWT_SECRET configured the signature is checked locally (no network
+    call); tokens it can't verify, e.g. ones signed with asymmetric keys, fall
+    back to Supabase Auth. Successful remote verifications are cached for up
+    to JWT_CACHE_TTL seconds (bounded by the token's exp).
+    
+    Locally verified users may lack "email_verified" (see _user_from_claims).
+    
     Args:
         token: JWT token string
         
     Returns:
         User information dictionary or None if invalid
     """
+    if settings.JWT_SECRET:
+        try:
+            claims = jwt.decode(
+                token,
+                settings.JWT_SECRET,
+                algorithms=[settings.JWT_ALGORITHM],
+                audience=SUPABASE_JWT_AUDIENCE
+            )
+            return _user_from_claims(claims)
+        except ExpiredSignatureError:
+            logger.warning("Token has expired")
+            return None
+        except (JWTError, KeyError) as e:
+            logger.debug(f"Local JWT verification failed, falling back to Supabase Auth: {str(e)}")
+    
+    return _verify_remote(token)
+
+
+def resolve_email_verified(user: dict, token: str) -> bool:
+    """
+    Get whether the user's email is confirmed
+    
+    Uses the value from verify_jwt_token when it has one; otherwise asks
+    Supabase Auth (the result is cached with the token).
+    
+    Args:
+        user: User information from verify_jwt_token
+        token: The same JWT token string
+    
+    Returns:
+        True if the email address is confirmed
+    """
+    if "email_verified" in user:
+        return user["email_verified"]
+    remote_user = _verify_remote(token)
+    return bool(remote_user and remote_user.get("email_verified"))
+
+
+def _verify_remote(token: str) -> Optional[dict]:
+    """Verify a token with Supabase Auth, caching the user info (see verify_jwt_token)"""
+    cache_key = f"jwt:{hashlib.blake2b(token.encode(), digest_size=16).hexdigest()}"
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
         supabase = get_supabase_client()
         if not supabase:
@@ -74,12 +184,20 @@ def verify_jwt_token(token: str) -> Optional[dict]:
                     logger.warning("Token has expired")
                     return None
             
-            return {
+            user_info = {
                 "id": user.id,
                 "email": user.email or "",
                 "role": user.user_metadata.get("role", "user") if user.user_metadata else "user",
                 "email_verified": user.email_confirmed_at is not None
             }
+            
+            ttl = JWT_CACHE_TTL
+            exp = exp or _token_expiry(token)
+            if exp:
+                ttl = min(ttl, int(exp - time.time()))
+            if ttl > 0:
+                cache.set(cache_key, user_info, ttl_seconds=ttl)
+            return user_info
         
         return None
     except Exception as e:
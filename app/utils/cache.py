@@ -2,156 +2,521 @@
 In-memory caching utility with TTL support
 """
 
-from typing import Any, Optional, Callable
+from typing import Any, Optional, Callable, Iterable, Sequence, Tuple
 from datetime import datetime, timedelta, timezone
+from collections import Counter, OrderedDict
+from enum import Enum
+from itertools import islice
+from operator import mul
 import hashlib
-import json
-import asyncio
-from threading import Lock
+import math
+import random
+import time
+from threading import Lock, Thread
 
 from app.utils.logger import logger
 
 
+class CacheProfile(str, Enum):
+    """Cached entity types, each with its own TTL (see PROFILE_TTLS)"""
+    QUESTION = "question"
+    ASSESSMENT = "assessment"
+    ASSESSMENT_QUESTIONS = "assessment_questions"
+    PROFILE = "profile"
+    
+    @property
+    def ttl(self) -> Optional[int]:
+        """TTL in seconds for this entity type (None = never expires)"""
+        return PROFILE_TTLS[self]
+
+
+# Questions are write-once after authoring: they never expire and are dropped
+# explicitly by update_question/delete_question. Assessment data is also
+# invalidated on write. Tune these from the per-entity counters in Cache.stats().
+PROFILE_TTLS = {
+    CacheProfile.QUESTION: None,
+    CacheProfile.ASSESSMENT: 900,
+    CacheProfile.ASSESSMENT_QUESTIONS: 600,
+    CacheProfile.PROFILE: 1800,
+}
+
+
+def _entity(key: str) -> str:
+    """Entity name used for stats: the key prefix before the first ':'"""
+    return key.partition(":")[0]
+
+
 class CacheEntry:
-    """Cache entry with TTL"""
+    """Cache entry with TTL (None = never expires)"""
+    
+    __slots__ = ("value", "ttl_seconds", "tags", "_created", "_expires")
     
-    def __init__(self, value: Any, ttl_seconds: int = 300):
+    def __init__(self, value: Any, ttl_seconds: Optional[int] = 300, tags: Optional[Tuple[str, ...]] = None):
         self.value = value
-        self.created_at = datetime.now(timezone.utc)
         self.ttl_seconds = ttl_seconds
+        # Tags this entry is indexed under in Cache._tags (unlinked when it leaves its shard)
+        self.tags = tags
+        # Wall-clock time only for reporting; expiry uses the monotonic clock
+        self._created = time.time()
+        self._expires = None if ttl_seconds is None else time.monotonic() + ttl_seconds
     
     @property
     def is_expired(self) -> bool:
-        """Check if cache entry is expired - optimized datetime reuse"""
-        now = datetime.now(timezone.utc)
-        age = (now - self.created_at).total_seconds()
-        return age > self.ttl_seconds
+        """Check if cache entry is expired - one monotonic clock read, no allocations"""
+        expires = self._expires
+        return expires is not None and time.monotonic() > expires
+    
+    @property
+    def created_at(self) -> datetime:
+        """Creation timestamp"""
+        return datetime.fromtimestamp(self._created, timezone.utc)
     
     @property
-    def expires_at(self) -> datetime:
-        """Get expiration timestamp"""
+    def expires_at(self) -> Optional[datetime]:
+        """Get expiration timestamp, or None for entries that never expire"""
+        if self.ttl_seconds is None:
+            return None
         return self.created_at + timedelta(seconds=self.ttl_seconds)
 
 
+# Number of independently locked cache shards (power of two, see Cache._shard)
+CACHE_SHARDS = 16
+
+# Probabilistic expiry instead of a periodic full scan: roughly one store in
+# 2**EXPIRY_SAMPLE_BITS checks the shard's EXPIRY_SAMPLE_SIZE least recently used
+# entries. Expired entries are also dropped on read, and the LRU cap bounds the rest.
+EXPIRY_SAMPLE_BITS = 6
+EXPIRY_SAMPLE_SIZE = 8
+
+
+class _CacheShard:
+    """One lock-protected LRU partition of a Cache, with its own counters"""
+    
+    __slots__ = ("lock", "entries", "hits", "misses", "evictions")
+    
+    def __init__(self):
+        self.lock = Lock()
+        self.entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+        self.evictions: Counter = Counter()
+
+
 class Cache:
-    """Thread-safe in-memory cache with TTL"""
+    """
+    Thread-safe in-memory cache with TTL and LRU eviction
+    
+    Keys are spread over CACHE_SHARDS shards, each with its own lock, so
+    concurrent requests touching different keys don't contend.
+    """
     
-    def __init__(self, default_ttl: int = 300):
+    def __init__(self, default_ttl: int = 300, max_entries: int = 20000):
         """
         Initialize cache
         
         Args:
             default_ttl: Default TTL in seconds (default: 5 minutes)
+            max_entries: Approximate entry limit; least recently used entries
+                are evicted per shard beyond max_entries / CACHE_SHARDS
         """
-        self._cache: dict[str, CacheEntry] = {}
-        self._lock = Lock()
+        self._shards = tuple(_CacheShard() for _ in range(CACHE_SHARDS))
+        self._max_per_shard = max(1, max_entries // CACHE_SHARDS)
+        # tag -> keys stored with that tag (see invalidate_tag)
+        self._tags: dict[str, set[str]] = {}
+        # keys with a stale-while-revalidate refresh in flight
+        self._refreshing: set[str] = set()
+        # Guards _tags and _refreshing; taken inside shard locks, never the other way round
+        self._meta_lock = Lock()
         self.default_ttl = default_ttl
-        self._cleanup_task: Optional[asyncio.Task] = None
+    
+    def _shard(self, key: str) -> _CacheShard:
+        """Shard owning a key"""
+        return self._shards[hash(key) & (CACHE_SHARDS - 1)]
     
     def _generate_key(self, prefix: str, *args, **kwargs) -> str:
-        """Generate cache key from arguments - optimized"""
-        # Optimized: avoid dict creation if no args/kwargs
-        if not args and not kwargs:
-            return hashlib.md5(prefix.encode()).hexdigest()
-        
-        key_data = {
-            "prefix": prefix,
-            "args": args,
-            "kwargs": sorted(kwargs.items()) if kwargs else []
-        }
-        key_str = json.dumps(key_data, sort_keys=True, default=str)
-        return hashlib.md5(key_str.encode()).hexdigest()
+        """Generate cache key from arguments - hashes reprs incrementally, no serialization"""
+        h = hashlib.blake2b(prefix.encode(), digest_size=16)
+        for arg in args:
+            h.update(b"\x00")
+            h.update(repr(arg).encode())
+        for name in sorted(kwargs):
+            h.update(b"\x01")
+            h.update(name.encode())
+            h.update(b"=")
+            h.update(repr(kwargs[name]).encode())
+        return h.hexdigest()
+    
+    def _lookup(self, shard: _CacheShard, key: str) -> Optional[CacheEntry]:
+        """Get a live entry and update counters/LRU order (caller holds shard.lock)"""
+        entries = shard.entries
+        entry = entries.get(key)
+        if entry is None:
+            shard.misses[_entity(key)] += 1
+            return None
+        
+        if entry.is_expired:
+            del entries[key]
+            self._unlink_tags(key, entry)
+            entity = _entity(key)
+            shard.misses[entity] += 1
+            shard.evictions[entity] += 1
+            return None
+        
+        entries.move_to_end(key)
+        shard.hits[_entity(key)] += 1
+        return entry
+    
+    def _store(self, shard: _CacheShard, key: str, entry: CacheEntry) -> None:
+        """Insert an entry and evict least recently used ones (caller holds shard.lock)"""
+        entries = shard.entries
+        replaced = entries.get(key)
+        if replaced is not None:
+            self._unlink_tags(key, replaced)
+        entries[key] = entry
+        entries.move_to_end(key)
+        if entry.tags:
+            with self._meta_lock:
+                for tag in entry.tags:
+                    self._tags.setdefault(tag, set()).add(key)
+        while len(entries) > self._max_per_shard:
+            evicted, evicted_entry = entries.popitem(last=False)
+            self._unlink_tags(evicted, evicted_entry)
+            shard.evictions[_entity(evicted)] += 1
+        if random.getrandbits(EXPIRY_SAMPLE_BITS) == 0:
+            self._expire_sample(shard)
+    
+    def _expire_sample(self, shard: _CacheShard) -> None:
+        """Drop expired entries among the least recently used few (caller holds shard.lock)"""
+        entries = shard.entries
+        expired = [key for key, entry in islice(entries.items(), EXPIRY_SAMPLE_SIZE) if entry.is_expired]
+        for key in expired:
+            self._unlink_tags(key, entries.pop(key))
+            shard.evictions[_entity(key)] += 1
+    
+    def _unlink_tags(self, key: str, entry: CacheEntry) -> None:
+        """Remove a departing entry's key from the tag index (caller holds its shard lock)"""
+        if not entry.tags:
+            return
+        with self._meta_lock:
+            for tag in entry.tags:
+                keys = self._tags.get(tag)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._tags[tag]
     
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
-        with self._lock:
-            entry = self._cache.get(key)
-            if entry is None:
-                return None
-            
-            if entry.is_expired:
-                del self._cache[key]
-                return None
-            
-            return entry.value
+        shard = self._shard(key)
+        with shard.lock:
+            entry = self._lookup(shard, key)
+            return entry.value if entry is not None else None
     
-    def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
-        """Set value in cache"""
-        ttl = ttl_seconds if ttl_seconds is not None else self.default_ttl
+    def mget(self, keys: Iterable[str]) -> dict[str, Any]:
+        """
+        Get several values, taking each shard lock once
         
-        with self._lock:
-            self._cache[key] = CacheEntry(value, ttl)
+        Args:
+            keys: Cache keys
+        
+        Returns:
+            Dict of key -> value for keys that are present and not expired
+        """
+        by_shard: dict[int, list[str]] = {}
+        for key in keys:
+            by_shard.setdefault(hash(key) & (CACHE_SHARDS - 1), []).append(key)
+        
+        found = {}
+        for index, shard_keys in by_shard.items():
+            shard = self._shards[index]
+            with shard.lock:
+                for key in shard_keys:
+                    entry = self._lookup(shard, key)
+                    if entry is not None:
+                        found[key] = entry.value
+        return found
+    
+    def mset(
+        self,
+        items: dict[str, Any],
+        ttl_seconds: Optional[int] = None,
+        profile: Optional[CacheProfile] = None
+    ) -> None:
+        """Set several values with the same TTL, taking each shard lock once"""
+        ttl = self._resolve_ttl(ttl_seconds, profile)
+        by_shard: dict[int, list[str]] = {}
+        for key in items:
+            by_shard.setdefault(hash(key) & (CACHE_SHARDS - 1), []).append(key)
+        
+        for index, shard_keys in by_shard.items():
+            shard = self._shards[index]
+            with shard.lock:
+                for key in shard_keys:
+                    self._store(shard, key, CacheEntry(items[key], ttl))
+    
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl_seconds: Optional[int] = None,
+        tags: Optional[Iterable[str]] = None,
+        profile: Optional[CacheProfile] = None
+    ) -> None:
+        """
+        Set value in cache
+        
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl_seconds: Optional TTL override
+            tags: Optional tags; invalidate_tag(tag) drops every key stored with it
+            profile: Entity profile supplying the TTL (ignored if ttl_seconds is given)
+        """
+        ttl = self._resolve_ttl(ttl_seconds, profile)
+        
+        shard = self._shard(key)
+        with shard.lock:
+            # Tags are indexed under the shard lock, so the entry can't leave before they are
+            self._store(shard, key, CacheEntry(value, ttl, tuple(tags) if tags else None))
+    
+    def _resolve_ttl(self, ttl_seconds: Optional[int], profile: Optional[CacheProfile]) -> Optional[int]:
+        """Pick the explicit TTL, then the profile TTL, then the default (None = never expires)"""
+        if ttl_seconds is not None:
+            return ttl_seconds
+        if profile is not None:
+            return profile.ttl
+        return self.default_ttl
+    
+    def invalidate_tag(self, tag: str) -> int:
+        """
+        Delete every key stored with a tag
+        
+        Args:
+            tag: Tag to invalidate
+        
+        Returns:
+            Number of entries removed
+        """
+        with self._meta_lock:
+            keys = self._tags.pop(tag, ())
+        
+        removed = 0
+        for key in keys:
+            shard = self._shard(key)
+            with shard.lock:
+                entry = shard.entries.pop(key, None)
+                if entry is not None:
+                    # Drop the key from the entry's other tags as well
+                    self._unlink_tags(key, entry)
+                    shard.evictions[_entity(key)] += 1
+                    removed += 1
+        return removed
     
     def delete(self, key: str) -> bool:
         """Delete key from cache"""
-        with self._lock:
-            if key in self._cache:
-                del self._cache[key]
-                return True
-            return False
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.entries.pop(key, None)
+            if entry is None:
+                return False
+            self._unlink_tags(key, entry)
+            return True
     
     def clear(self) -> None:
         """Clear all cache entries"""
-        with self._lock:
-            self._cache.clear()
+        for shard in self._shards:
+            with shard.lock:
+                shard.entries.clear()
+        with self._meta_lock:
+            self._tags.clear()
     
     def get_or_set(
         self,
         key: str,
         factory: Callable[[], Any],
-        ttl_seconds: Optional[int] = None
+        ttl_seconds: Optional[int] = None,
+        tags: Optional[Iterable[str]] = None,
+        stale_while_revalidate: bool = False,
+        profile: Optional[CacheProfile] = None
     ) -> Any:
         """
         Get value from cache or set it using factory function
         
+        With stale_while_revalidate, an expired entry that has not been
+        cleaned up yet is returned immediately and refreshed on a
+        background thread. None results are not cached.
+        
         Args:
             key: Cache key
             factory: Function to generate value if not cached
             ttl_seconds: Optional TTL override
+            tags: Optional tags for invalidate_tag
+            stale_while_revalidate: Serve expired entries while refreshing
+            profile: Entity profile supplying the TTL
         
         Returns:
             Cached or newly generated value
         """
-        value = self.get(key)
-        if value is not None:
-            return value
+        ttl_seconds = self._resolve_ttl(ttl_seconds, profile)
+        if stale_while_revalidate:
+            shard = self._shard(key)
+            with shard.lock:
+                entry = shard.entries.get(key)
+                stale = entry is not None and entry.is_expired
+                counter = shard.misses if entry is None or stale else shard.hits
+                counter[_entity(key)] += 1
+                if entry is not None:
+                    shard.entries.move_to_end(key)
+            if stale:
+                with self._meta_lock:
+                    start_refresh = key not in self._refreshing
+                    if start_refresh:
+                        self._refreshing.add(key)
+                if start_refresh:
+                    Thread(
+                        target=self._refresh,
+                        args=(key, factory, ttl_seconds, tags),
+                        daemon=True
+                    ).start()
+            if entry is not None:
+                return entry.value
+        else:
+            value = self.get(key)
+            if value is not None:
+                return value
         
         value = factory()
-        self.set(key, value, ttl_seconds)
+        if value is not None:
+            self.set(key, value, ttl_seconds, tags)
         return value
     
-    async def cleanup_expired(self) -> None:
-        """Remove expired entries from cache - optimized single pass"""
-        with self._lock:
-            # Single pass - delete expired entries directly
-            expired_count = 0
-            keys_to_delete = []
-            for key, entry in self._cache.items():
-                if entry.is_expired:
-                    keys_to_delete.append(key)
-            
-            for key in keys_to_delete:
-                del self._cache[key]
-                expired_count += 1
-            
-            if expired_count > 0:
-                logger.debug(f"Cleaned up {expired_count} expired cache entries")
+    def _refresh(
+        self,
+        key: str,
+        factory: Callable[[], Any],
+        ttl_seconds: Optional[int],
+        tags: Optional[Iterable[str]]
+    ) -> None:
+        """Recompute a stale entry in the background"""
+        try:
+            value = factory()
+            if value is not None:
+                self.set(key, value, ttl_seconds, tags)
+        except Exception as e:
+            logger.warning(f"Background cache refresh failed for {key}: {str(e)}")
+        finally:
+            with self._meta_lock:
+                self._refreshing.discard(key)
     
     def stats(self) -> dict:
-        """Get cache statistics - optimized single pass"""
-        with self._lock:
-            total = len(self._cache)
-            # Optimized: single pass with generator
-            expired = sum(1 for entry in self._cache.values() if entry.is_expired)
-            active = total - expired
-            
-            return {
-                "total_entries": total,
-                "expired_entries": expired,
-                "active_entries": active
+        """Get cache statistics, merged across shards (entry counts include not-yet-dropped expired entries)"""
+        total = 0
+        hits: Counter = Counter()
+        misses: Counter = Counter()
+        evictions: Counter = Counter()
+        for shard in self._shards:
+            with shard.lock:
+                total += len(shard.entries)
+                hits.update(shard.hits)
+                misses.update(shard.misses)
+                evictions.update(shard.evictions)
+        
+        entities = {}
+        for entity in hits.keys() | misses.keys() | evictions.keys():
+            entity_hits, entity_misses = hits[entity], misses[entity]
+            entities[entity] = {
+                "hits": entity_hits,
+                "misses": entity_misses,
+                "evictions": evictions[entity],
+                "hit_rate": round(entity_hits / (entity_hits + entity_misses), 3) if entity_hits + entity_misses else None
             }
+        
+        return {
+            "total_entries": total,
+            "entities": entities
+        }
 
 
 # Global cache instance
-cache = Cache(default_ttl=300)  # 5 minutes default TTL
+cache = Cache(default_ttl=300, max_entries=20000)  # 5 minutes default TTL
 
+
+class SemanticCache:
+    """
+    LRU cache keyed on exact text, with a nearest-neighbour fallback over
+    normalized query embeddings (cosine similarity >= threshold).
+    
+    Entries are partitioned by a scope string (e.g. search parameters) so
+    only comparable lookups can match each other.
+    """
+    
+    def __init__(self, max_entries: int = 256, threshold: float = 0.95, ttl_seconds: int = 600):
+        """
+        Initialize semantic cache
+        
+        Args:
+            max_entries: Maximum number of cached entries (LRU-evicted)
+            threshold: Minimum cosine similarity for a semantic hit
+            ttl_seconds: Entry lifetime in seconds
+        """
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        # key -> (scope, normalized vector, value, expires_at)
+        self._entries: "OrderedDict[str, Tuple[str, Tuple[float, ...], Any, float]]" = OrderedDict()
+        self._lock = Lock()
+    
+    @staticmethod
+    def make_key(scope: str, text: str) -> str:
+        """Build exact-match key from scope and text"""
+        return hashlib.sha256(f"{scope}\x00{text}".encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> Tuple[float, ...]:
+        """Scale vector to unit length so dot product equals cosine similarity"""
+        norm = math.sqrt(sum(map(mul, vector, vector))) or 1.0
+        return tuple(v / norm for v in vector)
+    
+    def get_exact(self, key: str) -> Optional[Any]:
+        """Get value for an exact key"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[3] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+    
+    def get_similar(self, scope: str, vector: Sequence[float]) -> Optional[Any]:
+        """Get value of the most similar entry in scope, if above the threshold"""
+        query = self._normalize(vector)
+        now = time.monotonic()
+        best_key = None
+        best_sim = self.threshold
+        with self._lock:
+            for key, (entry_scope, entry_vec, _, expires_at) in self._entries.items():
+                if entry_scope != scope or expires_at < now:
+                    continue
+                sim = sum(map(mul, query, entry_vec))
+                if sim >= best_sim:
+                    best_key, best_sim = key, sim
+            if best_key is None:
+                return None
+            self._entries.move_to_end(best_key)
+            return self._entries[best_key][2]
+    
+    def set(self, key: str, scope: str, vector: Sequence[float], value: Any) -> None:
+        """Store value under exact key with its query embedding"""
+        entry = (scope, self._normalize(vector), value, time.monotonic() + self.ttl_seconds)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Clear all entries"""
+        with self._lock:
+            self._entries.clear()
@@ -1,5 +1,6 @@
 """
 Rate limiting middleware using sliding window algorithm
+Token bucket limiter for outbound OpenAI requests
 """
 
 from fastapi import Request, status
@@ -7,9 +8,11 @@ from fastapi.responses import JSONResponse
 from typing import Dict, Tuple, Optional
 from datetime import datetime, timedelta
 from collections import defaultdict, deque
+import asyncio
 import time
 from threading import Lock
 
+from app.config import settings
 from app.utils.error_handler import RateLimitError, create_error_response
 from app.utils.logger import logger
 
@@ -132,6 +135,55 @@ class RateLimiter:
 rate_limiter = RateLimiter()
 
 
+class TokenBucket:
+    """Thread-safe token bucket for throttling outbound API calls (sync and async)"""
+    
+    def __init__(self, max_rate: int, time_period: float = 60.0):
+        """
+        Initialize token bucket
+        
+        Args:
+            max_rate: Maximum number of acquisitions per time period
+            time_period: Length of the period in seconds
+        """
+        self.capacity = float(max(1, max_rate))
+        self._refill_per_second = self.capacity / time_period
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = Lock()
+    
+    def _try_acquire(self) -> float:
+        """Take a token if available; otherwise return seconds until one is"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self._refill_per_second)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self._refill_per_second
+    
+    def acquire(self) -> None:
+        """Block until a token is available"""
+        while True:
+            wait = self._try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+    
+    async def acquire_async(self) -> None:
+        """Wait (without blocking the event loop) until a token is available"""
+        while True:
+            wait = self._try_acquire()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+# Shared limiter for all OpenAI requests (embeddings and chat completions)
+openai_limiter = TokenBucket(max_rate=settings.OPENAI_MAX_REQUESTS_PER_MINUTE, time_period=60)
+
+
 def rate_limit(max_requests: int = 60, window_seconds: int = 60):
     """
     Decorator for rate limiting endpoints
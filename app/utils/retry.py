@@ -0,0 +1,74 @@
+"""
+Retry helpers for transient database errors
+Exponential backoff with jitter for Supabase/PostgREST calls
+"""
+
+from functools import wraps
+from typing import Any, Callable, TypeVar
+import random
+import time
+
+import httpx
+from postgrest.exceptions import APIError
+
+from app.utils.logger import logger
+
+# Retry policy for transient database failures
+DB_MAX_ATTEMPTS = 6
+DB_BASE_DELAY = 0.2  # seconds
+DB_MAX_DELAY = 10.0  # seconds
+
+# PostgREST reports gateway/rate-limit failures with the HTTP status as the error code
+RETRYABLE_STATUS_CODES = frozenset({"429", "500", "502", "503", "504"})
+
+T = TypeVar("T")
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    Check whether a database error is transient and worth retrying
+    
+    Args:
+        error: Exception raised by a Supabase call
+    
+    Returns:
+        True for connection failures, rate limiting and gateway errors
+    """
+    if "does not exist" in str(error).lower():
+        # Missing table/function/column - retrying won't help
+        return False
+    if isinstance(error, httpx.TransportError):
+        # Connect/read timeouts, dropped connections, protocol errors
+        return True
+    if isinstance(error, APIError):
+        return str(error.code) in RETRYABLE_STATUS_CODES
+    return False
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter for a zero-based attempt number"""
+    return random.uniform(0, min(DB_MAX_DELAY, DB_BASE_DELAY * (2 ** attempt)))
+
+
+def retry_db_operation(func: Callable[..., T]) -> Callable[..., T]:
+    """
+    Retry a database operation on transient errors
+    
+    Non-retryable errors, and the last retryable one, are re-raised so the
+    caller's own error handling still applies.
+    """
+    @wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> T:
+        for attempt in range(DB_MAX_ATTEMPTS):
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if attempt == DB_MAX_ATTEMPTS - 1 or not is_retryable_error(e):
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning(
+                    f"Transient database error in {func.__name__} "
+                    f"(attempt {attempt + 1}/{DB_MAX_ATTEMPTS}), retrying in {delay:.2f}s: {str(e)[:100]}"
+                )
+                time.sleep(delay)
+    return wrapper